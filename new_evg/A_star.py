@@ -27,30 +27,51 @@ def heuristic_3d(a, b, k1=1, k2=1):
 
     return total_cost
 
-# A* 搜索算法
-def a_star_search_3d(start, goal, nodes, edges, k1=1, k2=1):
+# 启发式函数的批量版本：一次计算所有节点到 goal 的启发值
+def heuristic_3d_table(points, goal, k1=1, k2=1):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    horizontal_distance = np.sqrt((goal[0] - points[:, 0])**2 + (goal[1] - points[:, 1])**2)
+    vertical_distance = np.abs(goal[2] - points[:, 2])
+
+    # 计算时间代价
+    vertical_speed = np.where(goal[2] > points[:, 2], ascent_speed, descent_speed)
+    time_cost = horizontal_distance / horizontal_speed + vertical_distance / vertical_speed
+
+    # 计算能量代价
+    energy_cost = vertical_distance * vertical_energy_cost + horizontal_distance * horizontal_energy_cost
+
+    return k1 * time_cost + k2 * energy_cost
+
+# A* 搜索算法，heuristic 为按节点编号给出的启发值（例如 cost_to_go 的结果），默认由 heuristic_3d_table 计算
+def a_star_search_3d(start, goal, graph, k1=1, k2=1, heuristic=None):
+    s, g = graph.index_of(start), graph.index_of(goal)
+    if heuristic is None:
+        heuristic = heuristic_3d_table(graph.coords, goal, k1, k2)
+    heuristic = np.asarray(heuristic, dtype=float).tolist()
+
     open_heap = []
-    heapq.heappush(open_heap, (heuristic_3d(start, goal, k1, k2), start))
+    heapq.heappush(open_heap, (heuristic[s], s))
     came_from = {}
-    cost_so_far = {start: 0}
+    cost_so_far = {s: 0}
 
     while open_heap:
         _, current = heapq.heappop(open_heap)
 
-        if current == goal:
+        if current == g:
             path = []
             while current in came_from:
-                path.append(current)
+                path.append(graph.node(current))
                 current = came_from[current]
-            path.append(start)
+            path.append(graph.node(s))
             path.reverse()
             return path
 
-        for neighbor, cost in edges[current]:
+        neighbors, costs = graph.neighbors(current)
+        for neighbor, cost in zip(neighbors.tolist(), costs.tolist()):
             new_cost = cost_so_far[current] + cost
             if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
                 cost_so_far[neighbor] = new_cost
-                priority = new_cost + heuristic_3d(neighbor, goal, k1, k2)
+                priority = new_cost + heuristic[neighbor]
                 heapq.heappush(open_heap, (priority, neighbor))
                 came_from[neighbor] = current
 
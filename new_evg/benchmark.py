@@ -0,0 +1,208 @@
+'''
+    本文件是建图与搜索的基准测试：用固定种子的 generate_obstacles_fast 生成不同规模、间距的地图，
+    在不同切割平面数下分别计时 choosing_obstacles、obstacle_expansion、顶点生成、compute_visibility_edges 和 A* 搜索，
+    记录各阶段的峰值内存（tracemalloc，单独运行一遍，不影响计时）、节点数、边数和路径代价，
+    结果写入 JSON 与 CSV，用 --compare 与之前的结果比较，列出变慢的配置。
+    运行: python benchmark.py                                  完整扫描（20 -> 5000 个障碍物）
+          python benchmark.py --counts 20 100 --planes 5      部分配置
+          python benchmark.py --compare old.json              与之前的结果比较
+'''
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from obstacles import generate_obstacles_fast, ob_length_high
+from choose_obs import choosing_obstacles, obstacle_expansion
+from build_graph import compute_visibility_edges, generate_vertices
+from calculate_search import a_star_search_3d, path_cost
+
+STAGES = ('choose', 'expand', 'vertices', 'visibility', 'search')
+DEFAULT_COUNTS = (20, 50, 100, 200, 500, 1000, 2000, 5000)
+DEFAULT_DISTANCES = (14, 30)
+DEFAULT_PLANES = (3, 5, 9)
+# 默认结果文件与本文件放在同一目录（已在 .gitignore 中忽略），不随运行时的当前目录变化
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results')
+
+
+def map_length(num_obstacles, min_distance):
+    """
+    地图边长：每个障碍物平均占用边长为 (最大边长 + min_distance) 的正方形，
+    40 个障碍物、间距 14 时约为 total_length（720），生成时不会因放不下而长时间重试。
+    """
+    return math.sqrt(num_obstacles) * (ob_length_high + min_distance)
+
+
+def run_pipeline(obstacles, start, goal, cut_planes, expansion=2, workers=None, memory=False):
+    """
+    按 build_evg_graph 的步骤运行一次建图与搜索，分别记录每个阶段的耗时（秒）。
+    memory=True 时改为用 tracemalloc 记录每个阶段的峰值内存增量（MB），此时耗时不准确。
+
+    返回:
+        stats: dict，{阶段: 耗时或峰值内存}
+        result: dict，selected 筛选后的障碍物数，nodes、edges 节点数与边数，path_cost 路径代价（不可达为 None）
+    """
+    stats = {}
+
+    def stage(name, func, *args, **kwargs):
+        if memory:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            value = func(*args, **kwargs)
+            stats[name] = (tracemalloc.get_traced_memory()[1] - current) / 2**20
+        else:
+            t = time.perf_counter()
+            value = func(*args, **kwargs)
+            stats[name] = time.perf_counter() - t
+        return value
+
+    if memory:
+        tracemalloc.start()
+    try:
+        selected = stage('choose', choosing_obstacles, start, goal, obstacles)
+        expanded = stage('expand', obstacle_expansion, selected, expansion)
+        owners = stage('vertices', generate_vertices, expanded, cut_planes)
+        nodes = set(owners) | {start, goal}
+        graph = stage('visibility', compute_visibility_edges, nodes, expanded, start, goal,
+                      owners=owners, workers=workers)
+        path = stage('search', a_star_search_3d, start, goal, graph)
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    result = {
+        'selected': len(selected),
+        'nodes': graph.num_nodes,
+        'edges': graph.num_edges,
+        'path_cost': None if path is None else path_cost(graph, path),
+    }
+    return stats, result
+
+
+def run_benchmark(counts=DEFAULT_COUNTS, distances=DEFAULT_DISTANCES, planes=DEFAULT_PLANES, repeat=1,
+                  expansion=2, workers=None, memory=True, seed=0):
+    """
+    扫描 (障碍物数, 间距, 切割平面数) 的所有组合。每个组合运行 repeat 次，各阶段耗时取最小值。
+
+    返回:
+        list of dict，每个组合一条记录
+    """
+    records = []
+    for num in counts:
+        for min_distance in distances:
+            length = map_length(num, min_distance)
+            t = time.perf_counter()
+            obstacles = generate_obstacles_fast(num, min_distance, seed=seed, length=length)
+            generate_time = time.perf_counter() - t
+            start, goal = (0.0, 0.0, 2.0), (length + 60, length + 60, 20.0)
+
+            for n_planes in planes:
+                cut_planes = np.linspace(10, 50, n_planes).tolist()
+                times = {name: math.inf for name in STAGES}
+                for _ in range(repeat):
+                    stats, result = run_pipeline(obstacles, start, goal, cut_planes, expansion, workers)
+                    times = {name: min(times[name], stats[name]) for name in STAGES}
+
+                record = {'obstacles': num, 'min_distance': min_distance, 'planes': n_planes,
+                          'length': round(length, 1), 'generate_s': generate_time, **result}
+                record.update({f'{name}_s': times[name] for name in STAGES})
+                record['total_s'] = sum(times.values())
+                if memory:
+                    peaks, _ = run_pipeline(obstacles, start, goal, cut_planes, expansion, workers, memory=True)
+                    record.update({f'{name}_mb': peaks[name] for name in STAGES})
+                    record['peak_mb'] = max(peaks.values())
+                records.append(record)
+
+                print(f"obstacles={num:5d} min_distance={min_distance:3g} planes={n_planes} "
+                      f"selected={result['selected']:4d} nodes={result['nodes']:6d} edges={result['edges']:8d} "
+                      f"total={record['total_s']:.3f}s "
+                      + ' '.join(f"{name}={times[name]:.3f}" for name in STAGES)
+                      + (f" peak={record['peak_mb']:.1f}MB" if memory else ''))
+    return records
+
+
+def environment():
+    """
+    记录运行环境，便于比较不同版本的结果。
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def save_results(records, output, params):
+    """
+    将结果写入 output.json（包括运行环境与参数）和 output.csv（每个组合一行）。
+    """
+    with open(output + '.json', 'w') as f:
+        json.dump({'environment': environment(), 'params': params, 'results': records}, f, indent=2)
+    if records:
+        with open(output + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def compare_results(old_file, records, threshold=1.2):
+    """
+    与之前保存的 JSON 结果逐个组合比较总耗时，列出耗时比超过 threshold 的组合以及节点数、边数或路径代价不同的组合。
+
+    返回:
+        int，变慢或结果不同的组合数
+    """
+    with open(old_file) as f:
+        old = {(r['obstacles'], r['min_distance'], r['planes']): r for r in json.load(f)['results']}
+
+    problems = 0
+    for record in records:
+        previous = old.get((record['obstacles'], record['min_distance'], record['planes']))
+        if previous is None:
+            continue
+        ratio = record['total_s'] / max(previous['total_s'], 1e-9)
+        changed = [key for key in ('nodes', 'edges', 'path_cost') if previous.get(key) != record.get(key)]
+        if ratio > threshold or changed:
+            problems += 1
+            slow = ', '.join(f"{name} x{record[f'{name}_s'] / max(previous[f'{name}_s'], 1e-9):.2f}" for name in STAGES)
+            print(f"obstacles={record['obstacles']} min_distance={record['min_distance']} planes={record['planes']}: "
+                  f"total x{ratio:.2f} ({slow})" + (f" 结果不同: {', '.join(changed)}" if changed else ''))
+    print("没有变慢或结果不同的组合" if problems == 0 else f"{problems} 个组合变慢或结果不同")
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='建图与搜索的基准测试')
+    parser.add_argument('--counts', type=int, nargs='+', default=list(DEFAULT_COUNTS), help='障碍物数量')
+    parser.add_argument('--distances', type=float, nargs='+', default=list(DEFAULT_DISTANCES), help='障碍物最小间距')
+    parser.add_argument('--planes', type=int, nargs='+', default=list(DEFAULT_PLANES), help='切割平面数')
+    parser.add_argument('--repeat', type=int, default=1, help='每个组合的重复次数，耗时取最小值')
+    parser.add_argument('--workers', type=int, default=None, help='计算可视性边的进程数')
+    parser.add_argument('--seed', type=int, default=0, help='生成障碍物的随机数种子')
+    parser.add_argument('--no-memory', action='store_true', help='不测量峰值内存')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果文件名（不含扩展名），默认写在本文件所在目录')
+    parser.add_argument('--compare', default=None, help='之前保存的 JSON 结果')
+    args = parser.parse_args()
+
+    params = {'counts': args.counts, 'distances': args.distances, 'planes': args.planes, 'repeat': args.repeat,
+              'workers': args.workers, 'seed': args.seed}
+    records = run_benchmark(args.counts, args.distances, args.planes, args.repeat, workers=args.workers,
+                            memory=not args.no_memory, seed=args.seed)
+    save_results(records, args.output, params)
+    print(f"结果已写入 {args.output}.json、{args.output}.csv")
+    if args.compare:
+        compare_results(args.compare, records)
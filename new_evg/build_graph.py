@@ -1,64 +1,203 @@
-from shapely.geometry import LineString, Polygon, Point
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from corner_plot import create_corners_3d
-from interact import get_obstacle_xy_polygon, line_intersects_box
-from calculate_search import calculate_cost
+from interact import get_obstacle_xy_polygon, segments_intersect_boxes, segment_box_hits
+from calculate_search import calculate_costs, get_uav_model
+from spatial_index import ObstacleGrid, grouped_arange
+from visibility_graph import VisibilityGraph
+from sweep_visibility import sweep_cut_pairs
+import profiling
 
 load, vel= 10, 12
 
 
-def build_evg_graph(obstacles, start, goal):
+def build_evg_graph(obstacles, start, goal, workers=None, cut_planes=None, prune_corners=False, tangent_only=False,
+                    method='pairs'):
     """
     参数:
         obstacles: list of tuple，障碍物信息 (x_min, y_min, z_min, x_max, y_max, z_max)
         start: tuple, 起点 (x, y, z)
         goal: tuple, 终点 (x, y, z)
+        workers: int，并行计算可视性边的进程数，默认单进程
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        prune_corners: bool，是否去掉不可能出现在绕行路径上的角点（见 prune_cut_nodes）
+        tangent_only: bool，是否只保留切线边（见 wedge_blocked），被排除的节点对数记录在 graph.pruned_edges
+        method: str，cut_nodes 间可视性的计算方法（见 visible_cut_pairs）
 
     返回:
-        nodes: set of tuple，顶点集合
-        edges: dict, 每个节点的邻接边，格式为 {node: [(neighbor, weight), ...]}
+        graph: VisibilityGraph，可视图（节点坐标与 CSR 邻接表）
     """
-    # 初始化
-    nodes = {start, goal}
-    edges = {start: [], goal: []}
+    profile = profiling.current()
 
     # Step 1: 定义切割平面
-    cut_planes = define_cut_planes(obstacles)
+    if cut_planes is None:
+        cut_planes = define_cut_planes(obstacles)
 
-    # Step 2: 生成顶点集合
-    for obstacle in obstacles:
-        corners = create_corners_3d(*obstacle)
-        for z in cut_planes:
-            if obstacle[2] <= z <= obstacle[5]:  # 检查切割平面是否与障碍物相交
-                cut_nodes = generate_cut_nodes(corners, z)
-                nodes.update(cut_nodes)
+    # Step 2: 生成顶点集合，并记录每个顶点由哪些障碍物生成
+    with profile.timer('build.vertices'):
+        owners = generate_vertices(obstacles, cut_planes, prune_corners)
+    nodes = set(owners) | {start, goal}
 
     # Step 3: 计算可视性边
-    edges = compute_visibility_edges(nodes, obstacles, start, goal)
+    with profile.timer('build.visibility'):
+        graph = compute_visibility_edges(nodes, obstacles, start, goal, owners=owners, workers=workers,
+                                         tangent_only=tangent_only, method=method)
 
-    return nodes, edges
+    return graph
 
 
-def define_cut_planes(obstacles):
+@profiling.timed('build.cut_planes')
+def define_cut_planes(obstacles, start=None, goal=None, strategy='fixed', max_nodes=None, levels=3):
     """
     定义切割平面高度。
 
     参数:
         obstacles: list of tuple，障碍物信息
+        start, goal: tuple，起点、终点 (x, y, z)；给出时 'quantile'、'budget' 在其高度上也放置切割平面，
+                     使起降段可以在该高度绕行而不必先爬升
+        strategy: str，
+            'fixed'    固定高度 [10, 20, 30, 40, 50]（默认，与原先一致）
+            'quantile' z0 = 10 与障碍物顶面高度的 25%、50%、75% 分位数（略高于顶面）
+            'budget'   按优先级依次加入起点、终点高度以及逐层细分的顶面高度分位数（50%；25%、75%；12.5%…），
+                       直到 levels 层或节点数超过 max_nodes
+        max_nodes: int，'budget' 的节点数上限（按每个切割平面上 4 × 与之相交的障碍物数估计）；
+                   可视性检测的节点对数约为 max_nodes² / 2
+        levels: int，'budget' 使用的分位数细分层数
 
     返回:
+        cut_planes: list of float, 切割平面高度列表（升序）
+    """
+    if strategy == 'fixed':
+        return [10, 20, 30, 40, 50]
+
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    heights = np.sort(boxes[:, 5])
+    terminals = [float(p[2]) for p in (start, goal) if p is not None]
+
+    def quantile(q):
+        return float(heights[int(q * len(heights))]) + 0.01
+
+    if strategy == 'quantile':
+        z0 = 10
+        planes = [z0] + ([quantile(q) for q in (0.25, 0.50, 0.75)] if len(heights) else []) + terminals
+        return sorted(set(planes))
+
+    if strategy != 'budget':
+        raise ValueError(f"未知的切割平面策略: {strategy}")
+
+    # 候选高度按优先级排列：起点、终点高度，然后是逐层细分的分位数
+    candidates = list(terminals)
+    if len(heights):
+        for level in range(1, levels + 1):
+            candidates += [quantile(k / 2**level) for k in range(1, 2**level, 2)]
+
+    planes, total = [], 0
+    for z in candidates:
+        if any(abs(z - p) < 0.5 for p in planes):
+            continue
+        nodes = 4 * int(np.count_nonzero((boxes[:, 2] <= z) & (z <= boxes[:, 5])))
+        if nodes == 0 or (max_nodes is not None and total + nodes > max_nodes):
+            continue
+        planes.append(z)
+        total += nodes
+    return sorted(planes)
+
+
+def generate_vertices(obstacles, cut_planes, prune=False, index=None):
+    """
+    生成所有切割平面上的障碍物角点，同时记录每个节点所属的障碍物。
+
+    参数:
+        obstacles: list of tuple 或 np.ndarray (M, 6)，障碍物信息
         cut_planes: list of float, 切割平面高度列表
+        prune: bool，是否用 prune_cut_nodes 去掉凹角、直墙上和被其他障碍物包住的角点
+        index: ObstacleGrid，prune 时使用的空间索引
+
+    返回:
+        owners: dict，{node: tuple of int}，节点及生成它的障碍物编号；
+                相互接触的障碍物共享的角点同时属于多个障碍物
     """
-    z0 = 10
-    heights = [obs[5] for obs in obstacles]
-    heights.sort()
-    
-    z_25 = heights[int(0.25 * len(heights))] + 0.01
-    z_50 = heights[int(0.50 * len(heights))] + 0.01
-    z_75 = heights[int(0.75 * len(heights))] + 0.01
-    
-    # return [z0, z_25, z_50, z_75]
-    return [10, 20, 30, 40, 50]
+    owners = {}
+    # 统一转换为 Python float，节点坐标与输入是列表还是 float32/float64 数组无关
+    for k, obstacle in enumerate(np.asarray(obstacles, dtype=float).reshape(-1, 6).tolist()):
+        corners = create_corners_3d(*obstacle)
+        for z in cut_planes:
+            if obstacle[2] <= z <= obstacle[5]:  # 检查切割平面是否与障碍物相交
+                for node in generate_cut_nodes(corners, z):
+                    ids = owners.setdefault(node, [])
+                    if k not in ids:
+                        ids.append(k)
+
+    owners = {node: tuple(ids) for node, ids in owners.items()}
+    if prune:
+        owners = prune_cut_nodes(owners, obstacles, index)
+    return owners
+
+
+def prune_cut_nodes(owners, obstacles, index=None, eps=0.001):
+    """
+    去掉不可能出现在绕行路径上的角点：检查节点所在高度上、节点周围四个象限（偏移 eps）被障碍物占据的情况。
+    - 只占据一个象限：凸角，保留；
+    - 占据两个对角象限：两个障碍物在角点处相接，路径可能从中穿过，保留；
+    - 占据两个相邻象限（相接障碍物形成的直墙）、三个象限（凹角）或四个象限（被其他障碍物包住）：
+      最短路径在这里转弯不会比直接经过更短，去掉。
+
+    参数:
+        owners: dict，{node: tuple of int}，generate_vertices 的结果
+        obstacles: list of tuple，障碍物信息
+        index: ObstacleGrid，障碍物空间索引，默认根据 obstacles 新建
+        eps: float，象限检测的偏移量
+
+    返回:
+        dict，保留的节点及其所属障碍物
+    """
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    if index is None:
+        index = ObstacleGrid(boxes)
+    offsets = np.array([[1, 1], [-1, 1], [-1, -1], [1, -1]], dtype=float) * eps
+
+    kept = {}
+    for node, ids in owners.items():
+        near = boxes[index.query_point(node, 2 * eps)]
+        near = near[(near[:, 2] <= node[2]) & (node[2] <= near[:, 5])]
+        probes = np.asarray(node[:2], dtype=float) + offsets
+        inside = ((near[None, :, 0] < probes[:, None, 0]) & (probes[:, None, 0] < near[None, :, 3]) &
+                  (near[None, :, 1] < probes[:, None, 1]) & (probes[:, None, 1] < near[None, :, 4]))
+        occupied = inside.any(axis=1)
+        count = int(occupied.sum())
+        if count == 1 or (count == 2 and occupied[0] == occupied[2]):
+            kept[node] = ids
+    return kept
+
+
+def shrink_footprints(obstacles, margin=0.0001):
+    """
+    计算障碍物向内收缩 margin 后的 xy 投影矩形。
+
+    参数:
+        obstacles: list of tuple，障碍物信息
+        margin: float，收缩量
+
+    返回:
+        footprints: np.ndarray (M, 4)，每行为 (x_min, y_min, x_max, y_max)
+    """
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    return np.column_stack([boxes[:, 0] + margin, boxes[:, 1] + margin,
+                            boxes[:, 3] - margin, boxes[:, 4] - margin])
+
+
+def owner_matrix(node_list, owners):
+    """
+    将节点所属障碍物编号整理为 (N, K) 数组，K 为单个节点的最大障碍物数，不足处填 -1。
+    owners 中没有记录的节点（如 start、goal）不属于任何障碍物。
+    """
+    node_owners = [owners.get(node, ()) for node in node_list]
+    width = max([len(ids) for ids in node_owners], default=0)
+    matrix = np.full((len(node_list), max(width, 1)), -1, dtype=np.int64)
+    for row, ids in enumerate(node_owners):
+        matrix[row, :len(ids)] = ids
+    return matrix
 
 
 def generate_cut_nodes(corners, z):
@@ -96,7 +235,8 @@ def extend_node(node1, node2):
     return x2_new, y2_new
 
 
-def compute_visibility_edges(nodes, obstacles, start, goal):
+def compute_visibility_edges(nodes, obstacles, start, goal, index=None, owners=None, workers=None,
+                             tangent_only=False, method='pairs'):
     """
     计算节点之间的可视性边。
 
@@ -105,75 +245,465 @@ def compute_visibility_edges(nodes, obstacles, start, goal):
         obstacles: list of tuple，障碍物信息
         start: tuple，起点
         goal: tuple，终点
+        index: ObstacleGrid，障碍物空间索引，默认根据 obstacles 新建
+        owners: dict，{node: tuple of int}，cut_nodes 所属的障碍物编号（见 generate_vertices），
+                默认按坐标在 obstacles 中查找
+        workers: int，并行计算 cut_nodes 间可视性的进程数，默认单进程
+        tangent_only: bool，是否只保留切线边
+        method: str，cut_nodes 间可视性的计算方法（见 visible_cut_pairs）
 
     返回:
-        edges: dict，节点的邻接边集合，格式为 {node: [(neighbor, weight), ...]}
+        graph: VisibilityGraph，节点依次为按坐标排序的 cut_nodes、start、goal
     """
-    # 初始化边集
-    edges = {node: [] for node in nodes}
+    if index is None:
+        index = ObstacleGrid(obstacles)
 
-    # 提取 cut_nodes，不包含 start 和 goal
-    cut_nodes = nodes - {start, goal}
+    # 提取 cut_nodes，不包含 start 和 goal；按坐标排序，使结果与集合的遍历顺序无关
+    cut_node_list = sorted(set(nodes) - {start, goal})
+    n_cut = len(cut_node_list)
+    if owners is None:
+        owners = {node: find_node_owners(node, obstacles, index=index) for node in cut_node_list}
 
-    # 将 cut_nodes 转为列表进行遍历
-    cut_node_list = list(cut_nodes)
+    coords = np.array(cut_node_list + [start, goal], dtype=float)
+    checker = VisibilityChecker(coords, owner_matrix(cut_node_list + [start, goal], owners),
+                                obstacles, n_cut, index=index, tangent_only=tangent_only)
 
-    # 1. 处理 cut_nodes 间的可视性边
-    for i, node1 in enumerate(cut_node_list):
-        for j in range(i + 1, len(cut_node_list)):
-            node2 = cut_node_list[j]
+    profile = profiling.current()
 
-            # 延长线段：分别对 node1 和 node2 进行延长
-            x2_new, y2_new = extend_node(node1, node2)
+    # 1. cut_nodes 间的可视性边
+    with profile.timer('visibility.cut_pairs'):
+        i, j = visible_cut_pairs(checker, workers, method)
 
-            # 检查延长后的线段是否与障碍物相交
-            line = LineString([node1[:2], (x2_new, y2_new)])
-            polygon1 = find_polygon_for_node(node1, obstacles)
-            polygon2 = find_polygon_for_node(node2, obstacles)
-            polygon2 = polygon2.buffer(-0.0001)
+    # 2. 处理 start 和 goal 的连接
+    with profile.timer('visibility.terminals'):
+        cut_ids = np.arange(n_cut)
+        si = np.concatenate([np.full(n_cut, n_cut), np.full(n_cut, n_cut + 1)])
+        sj = np.concatenate([cut_ids, cut_ids])
+        visible = checker.visible(si, sj)
+        i = np.concatenate([i, si[visible]])
+        j = np.concatenate([j, sj[visible]])
 
-            if polygon1 == polygon2:
-                continue
+    # 计算权重（所有边一次完成）
+    weights = calculate_costs(coords[i], coords[j], load, vel)
 
-            if line.intersects(polygon2):
-                continue
+    graph = VisibilityGraph.from_pairs(coords, i, j, weights, get_uav_model(load, vel))
+    graph.pruned_edges = checker.pruned
+    return graph
 
-            # 检查3D可视性
-            if line_intersects_box(node1, node2, obstacles):
-                continue
 
-            # 计算权重并添加边
-            weight = calculate_cost(node1, node2, load, vel)
-            edges[node1].append((node2, weight))
-            edges[node2].append((node1, weight))  # 无向图
+def build_evg_nodes(obstacles, start, goal, cut_planes=None, prune_corners=False, tangent_only=False):
+    """
+    只生成可视图的节点而不计算可视性边，边在搜索时按需检查（见 calculate_search.lazy_a_star_search_3d）。
 
-    # 2. 处理 start 和 goal 的连接
-    for special_node in [start, goal]:
-        for node in cut_node_list:
-            # 延长线段：分别对 special_node 和 node 进行延长
-            x2_new, y2_new = extend_node(special_node, node)
+    参数:
+        obstacles: list of tuple，障碍物信息 (x_min, y_min, z_min, x_max, y_max, z_max)
+        start: tuple, 起点 (x, y, z)
+        goal: tuple, 终点 (x, y, z)
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        prune_corners: bool，是否去掉不可能出现在绕行路径上的角点
+        tangent_only: bool，是否只保留切线边
+
+    返回:
+        coords: np.ndarray (N, 3)，节点依次为按坐标排序的 cut_nodes、start、goal
+        checker: VisibilityChecker，判断节点对之间是否存在可视性边
+
+    示例:
+        coords, checker = build_evg_nodes(obstacles, start, goal)
+        path = lazy_a_star_search_3d(start, goal, coords, checker)
+    """
+    if cut_planes is None:
+        cut_planes = define_cut_planes(obstacles)
+    owners = generate_vertices(obstacles, cut_planes, prune_corners)
+    cut_node_list = sorted(set(owners) - {start, goal})
+
+    coords = np.array(cut_node_list + [start, goal], dtype=float)
+    checker = VisibilityChecker(coords, owner_matrix(cut_node_list + [start, goal], owners),
+                                obstacles, len(cut_node_list), tangent_only=tangent_only)
+    return coords, checker
+
+
+def build_cut_graph(obstacles, cut_planes=None, index=None, workers=None, prune_corners=False, tangent_only=False,
+                    method='pairs'):
+    """
+    只包含 cut_nodes 的静态可视图，用于同一组障碍物上的多次查询（见 planner.Planner）：
+    每次查询用 connect_terminal 插入起点和终点，搜索结束后调用 graph.detach() 移除。
+
+    参数:
+        obstacles: list of tuple，障碍物信息
+        cut_planes: list of float, 切割平面高度列表，默认由 define_cut_planes 给出
+        index: ObstacleGrid，障碍物空间索引，默认根据 obstacles 新建
+        workers: int，并行计算可视性边的进程数，默认单进程
+        prune_corners: bool，是否去掉不可能出现在绕行路径上的角点
+        tangent_only: bool，是否只保留切线边
+        method: str，cut_nodes 间可视性的计算方法（见 visible_cut_pairs）
+
+    返回:
+        graph: VisibilityGraph，节点为按坐标排序的 cut_nodes
+        checker: VisibilityChecker，连接起点、终点时使用
+    """
+    if cut_planes is None:
+        cut_planes = define_cut_planes(obstacles)
+
+    profile = profiling.current()
+    if index is None:
+        index = ObstacleGrid(obstacles)
+    with profile.timer('build.vertices'):
+        owners = generate_vertices(obstacles, cut_planes, prune_corners, index)
+    cut_node_list = sorted(owners)
+    n_cut = len(cut_node_list)
+
+    coords = np.array(cut_node_list, dtype=float).reshape(-1, 3)
+    checker = VisibilityChecker(coords, owner_matrix(cut_node_list, owners), obstacles, n_cut, index=index,
+                                tangent_only=tangent_only)
+
+    with profile.timer('visibility.cut_pairs'):
+        i, j = visible_cut_pairs(checker, workers, method)
+
+    # 计算权重（所有边一次完成）
+    weights = calculate_costs(coords[i], coords[j], load, vel)
+
+    graph = VisibilityGraph.from_pairs(coords, i, j, weights, get_uav_model(load, vel))
+    graph.pruned_edges = checker.pruned
+    return graph, checker
+
+
+def row_pairs(lo, hi, n):
+    """
+    返回第 lo..hi-1 行的上三角节点对 (i, j)，i < j < n，按行优先排列（与 np.triu_indices 一致）。
+    """
+    rows = np.arange(lo, hi)
+    counts = n - 1 - rows
+    i = np.repeat(rows, counts)
+    j = i + 1 + grouped_arange(counts)
+    return i, j
+
+
+def visible_cut_pairs(checker, workers=None, method='pairs'):
+    """
+    计算 cut_nodes 之间所有可见的节点对 (i < j)，结果按行优先排列。
+
+    workers > 1 时将上三角的行划分为若干块交给进程池并行计算：节点与障碍物数组通过共享内存
+    在每个进程初始化时传递一次，各块结果按行顺序拼接，与单进程结果完全相同。
 
-            # 检查延长后的线段是否与障碍物相交
-            line = LineString([special_node[:2], (x2_new, y2_new)])
-            polygon2 = find_polygon_for_node(node, obstacles)
-            polygon2 = polygon2.buffer(-0.0001)
+    参数:
+        checker: VisibilityChecker
+        workers: int，进程数，默认单进程
+        method: str，'pairs' 对所有节点对做相交检测；'sweep' 对同一切割平面上的节点对
+                使用旋转扫描（见 sweep_visibility，单进程），两者结果相同。不同平面之间的节点对两者相同，
+                同一平面的部分扫描在 80 个以上障碍物的地图上约快一倍，小地图上两者相当（见 sweep_check.py）
 
-            if line.intersects(polygon2):
-                continue
+    返回:
+        i, j: np.ndarray，可见节点对的编号
+    """
+    if method == 'sweep':
+        return sweep_cut_pairs(checker)
+    if method != 'pairs':
+        raise ValueError(f"未知的可视性计算方法: {method}")
+
+    n = checker.n_cut
+    if not workers or workers <= 1 or n < 2:
+        i, j = np.triu_indices(n, k=1)
+        visible = checker.visible(i, j)
+        return i[visible], j[visible]
+
+    # 按节点对数量均匀划分行块，块数多于进程数以平衡负载
+    pairs_per_row = n - 1 - np.arange(n)
+    cumulative = np.cumsum(pairs_per_row)
+    n_blocks = min(n, workers * 4)
+    bounds = np.searchsorted(cumulative, np.linspace(0, cumulative[-1], n_blocks + 1)[1:-1])
+    bounds = np.unique(np.concatenate(([0], bounds + 1, [n])))
+    lows, highs = bounds[:-1].tolist(), bounds[1:].tolist()
+
+    arrays = {
+        'coords': checker.coords,
+        'owner_ids': checker.owner_ids,
+        'obstacles': np.asarray(checker.obstacles, dtype=float).reshape(-1, 6),
+    }
+    blocks = [shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1)) for a in arrays.values()]
+    try:
+        specs = {}
+        for (name, array), block in zip(arrays.items(), blocks):
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            specs[name] = (block.name, array.shape, array.dtype.str)
+
+        profile = profiling.current()
+        initargs = (specs, n, checker.tangent_only, profile.enabled)
+        with ProcessPoolExecutor(workers, initializer=_init_visibility_worker, initargs=initargs) as pool:
+            results = list(pool.map(_visible_rows, lows, highs))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    i = np.concatenate([r[0] for r in results])
+    j = np.concatenate([r[1] for r in results])
+    checker.pruned += sum(r[2] for r in results)
+    for r in results:
+        if r[3] is not None:
+            profile.merge(r[3])
+    return i, j
+
+
+# 并行计算时每个工作进程持有的共享内存与 VisibilityChecker
+_worker_blocks = []
+_worker_checker = None
+_worker_profile = False
+
+
+def _init_visibility_worker(specs, n_cut, tangent_only=False, profile=False):
+    global _worker_checker, _worker_profile
+    _worker_profile = profile
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _worker_checker = VisibilityChecker(arrays['coords'], arrays['owner_ids'], arrays['obstacles'], n_cut,
+                                        tangent_only=tangent_only)
+
+
+def _visible_rows(lo, hi):
+    i, j = row_pairs(lo, hi, _worker_checker.n_cut)
+    pruned = _worker_checker.pruned
+    if not _worker_profile:
+        visible = _worker_checker.visible(i, j)
+        return i[visible], j[visible], _worker_checker.pruned - pruned, None
+
+    # 工作进程中的记录随结果返回，由主进程合并
+    with profiling.profiling() as profile:
+        visible = _worker_checker.visible(i, j)
+    return i[visible], j[visible], _worker_checker.pruned - pruned, profile.report()
+
+
+def connect_terminal(graph, checker, point):
+    """
+    将起点或终点临时插入 build_cut_graph 得到的可视图，并连接到所有可见的 cut_nodes。
 
-            # 检查3D可视性
-            if line_intersects_box(special_node, node, obstacles):
-                continue
+    参数:
+        graph: VisibilityGraph，cut_nodes 可视图
+        checker: VisibilityChecker，与 graph 一同由 build_cut_graph 返回
+        point: tuple，起点或终点 (x, y, z)
+
+    返回:
+        int，插入节点的编号
+    """
+    neighbors = np.flatnonzero(checker.visible_from(point))
+    weights = calculate_costs([point], checker.coords[neighbors], load, vel)
+    return graph.attach(point, neighbors, weights)
 
-            # 计算权重并添加边
-            weight = calculate_cost(special_node, node, load, vel)
-            edges[special_node].append((node, weight))
-            edges[node].append((special_node, weight))  # 无向图
 
-    return edges
+class VisibilityChecker:
+    """
+    判断节点对之间是否存在可视性边，一次性建图与 lazy 搜索共用同一套规则：
+    只连接 cut_node 与 cut_node、start/goal 与 cut_node；线段先在较后（start/goal 连线时为 cut_node）
+    一端延长做 2D 投影检查，再做 3D 检查。
+    tangent_only=True 时在这之前先做切线检查（见 wedge_blocked），两端 cut_node 处都不是切线的节点对直接排除，
+    排除的节点对数累计在 pruned 中。
 
+    参数:
+        coords: np.ndarray (N, 3)，节点坐标，前 n_cut 个为 cut_nodes，其后为 start、goal
+        owner_ids: np.ndarray (N, K)，节点所属障碍物编号（见 owner_matrix）
+        obstacles: list of tuple 或 np.ndarray (M, 6)，障碍物信息
+        n_cut: int，cut_nodes 的数量
+        index: ObstacleGrid，障碍物空间索引，默认根据 obstacles 新建
+        tangent_only: bool，是否只保留切线边
+    """
 
-def find_polygon_for_node(node, obstacles, epsilon=0.0001):
+    def __init__(self, coords, owner_ids, obstacles, n_cut, index=None, tangent_only=False):
+        self.coords = coords
+        self.owner_ids = owner_ids
+        # 转换一次为数组，避免每次检测时重复转换
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+        self.n_cut = n_cut
+        self.index = ObstacleGrid(obstacles) if index is None else index
+        self.footprints = shrink_footprints(obstacles)
+        self.tangent_only = tangent_only
+        self.pruned = 0
+
+    def is_visible(self, i, j):
+        """
+        判断单个节点对 (i, j) 之间是否可见。
+        """
+        return bool(self.visible([i], [j])[0])
+
+    def visible(self, i, j):
+        """
+        批量判断节点对 (i, j) 之间是否可见。
+
+        参数:
+            i, j: array-like (E,)，节点编号
+
+        返回:
+            np.ndarray (E,) bool
+        """
+        src, dst = self.orient(i, j)
+        visible = (dst < self.n_cut) & (src != dst)
+        candidates = np.flatnonzero(visible)
+        visible[candidates] = self._segments_visible(self.coords[src[candidates]], dst[candidates],
+                                                     self.owner_ids[src[candidates]])
+        return visible
+
+    def orient(self, i, j):
+        """
+        节点对的方向 (src, dst)：cut_node 之间编号较小者为 src，与 start/goal 相连时 start/goal 为 src。
+        可视性检查在 dst 一端延长；可视图中每条边只存一个权重，按 src -> dst 计算（见 compute_visibility_edges、
+        connect_terminal），lazy 搜索也按这一方向计算边代价。
+
+        参数:
+            i, j: array-like (E,)，节点编号
+
+        返回:
+            src, dst: np.ndarray (E,)
+        """
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        both_cut = (i < self.n_cut) & (j < self.n_cut)
+        src = np.where(both_cut, np.minimum(i, j), np.maximum(i, j))
+        dst = np.where(both_cut, np.maximum(i, j), np.minimum(i, j))
+        return src, dst
+
+    def visible_from(self, point):
+        """
+        判断任意一点（起点或终点）与每个 cut_node 之间是否可见。
+
+        返回:
+            np.ndarray (n_cut,) bool
+        """
+        targets = np.arange(self.n_cut)
+        origin = np.tile(np.asarray(point, dtype=float), (self.n_cut, 1))
+        return self._segments_visible(origin, targets)
+
+    def local_visible(self, i, j):
+        """
+        只做不需要相交检测的局部检查（切线检查与 dst 一端的 2D 投影检查），节点对规则与 visible 相同。
+        用于 3D 检查由其他方法完成的情况（见 sweep_visibility）。
+        """
+        src, dst = self.orient(i, j)
+        visible = (dst < self.n_cut) & (src != dst)
+        candidates = np.flatnonzero(visible)
+        visible[candidates] = self._locally_visible(self.coords[src[candidates]], dst[candidates],
+                                                    self.owner_ids[src[candidates]])
+        return visible
+
+    def _segments_visible(self, P1, dst, src_owner_ids=None):
+        """
+        判断从 P1 到 cut_node dst 的线段是否可见：先在 dst 一端延长做 2D 检查，再做 3D 检查。
+        src_owner_ids 为 P1 所属障碍物编号（P1 为 cut_node 时给出），用于切线检查。
+        """
+        profile = profiling.current()
+        P2 = self.coords[dst]
+        with profile.timer('visibility.local'):
+            visible = self._locally_visible(P1, dst, src_owner_ids)
+        candidates = np.flatnonzero(visible)
+
+        # 检查3D可视性（所有候选线段一次完成）
+        with profile.timer('visibility.3d'):
+            blocked = segments_intersect_boxes(P1[candidates], P2[candidates], self.obstacles, index=self.index)
+        visible[candidates[blocked]] = False
+        profile.count('visibility.rejects_3d', blocked.sum())
+        return visible
+
+    def _locally_visible(self, P1, dst, src_owner_ids=None):
+        profile = profiling.current()
+        profile.count('visibility.tests', len(P1))
+        P2 = self.coords[dst]
+        visible = np.ones(len(P1), dtype=bool)
+        if self.tangent_only:
+            wedge = wedge_blocked(P1, P2, self.owner_ids[dst], self.obstacles)
+            if src_owner_ids is not None:
+                wedge |= wedge_blocked(P2, P1, src_owner_ids, self.obstacles)
+            self.pruned += int(wedge.sum())
+            profile.count('visibility.rejects_tangent', wedge.sum())
+            visible = ~wedge
+
+        candidates = np.flatnonzero(visible)
+        blocked = footprint_blocked(P1[candidates], P2[candidates], self.owner_ids[dst[candidates]], self.footprints)
+        visible[candidates] = ~blocked
+        profile.count('visibility.rejects_2d', blocked.sum())
+        return visible
+
+
+def wedge_blocked(P1, P2, owner_ids, obstacles):
+    """
+    切线检查：P2 为所属障碍物的角点，判断直线 P1->P2 越过 P2 后是否进入障碍物在该角点处所占的象限。
+    进入时路径在 P2 处背离障碍物转弯，不可能比直接连线更短，这样的边不会出现在最短路径上。
+    只用到坐标的符号比较，不做相交检测。
+
+    参数:
+        P1, P2: np.ndarray (N, 3)，线段端点
+        owner_ids: np.ndarray (N, K)，P2 所属障碍物编号，-1 表示无
+        obstacles: np.ndarray (M, 6)，障碍物
+
+    返回:
+        np.ndarray (N,) bool，越过 P2 后进入任一所属障碍物的象限时为 True
+    """
+    d = P2[:, :2] - P1[:, :2]
+    blocked = np.zeros(len(P1), dtype=bool)
+    for k in range(owner_ids.shape[1]):
+        owner = owner_ids[:, k]
+        box = obstacles[owner]
+        # 障碍物相对角点所在的象限
+        quadrant = np.sign((box[:, :2] + box[:, 3:5]) / 2 - P2[:, :2])
+        blocked |= (owner >= 0) & np.all(quadrant * d > 0, axis=1)
+
+    return blocked
+
+
+def footprint_blocked(P1, P2, owner_ids, footprints):
+    """
+    2D 检查：将线段 P1->P2 在 P2 一端延长后，判断其是否进入 P2 所属障碍物的（收缩后的）投影。
+
+    参数:
+        P1, P2: np.ndarray (N, 3)，线段端点
+        owner_ids: np.ndarray (N, K)，P2 所属障碍物编号，-1 表示无
+        footprints: np.ndarray (M, 4)，收缩后的障碍物投影（见 shrink_footprints）
+
+    返回:
+        np.ndarray (N,) bool，线段进入任一所属障碍物的投影时为 True
+    """
+    # 延长线段：将 P2 沿方向向量移动 1%（与 extend_node 一致）
+    start_xy = P1[:, :2]
+    end_xy = P2[:, :2] + .01 * (P2[:, :2] - P1[:, :2])
+
+    blocked = np.zeros(len(P1), dtype=bool)
+    for k in range(owner_ids.shape[1]):
+        owner = owner_ids[:, k]
+        rect = footprints[owner]
+        hits = segment_box_hits(start_xy, end_xy, rect[:, :2], rect[:, 2:], strict=False)
+        blocked |= (owner >= 0) & hits
+
+    return blocked
+
+
+@profiling.timed('find_node_owners')
+def find_node_owners(node, obstacles, epsilon=0.0001, index=None):
+    """
+    查找以节点为角点、且在节点高度上存在的所有障碍物（与 generate_vertices 的记录规则一致）。
+
+    参数:
+        node: tuple，节点坐标 (x, y, z)
+        obstacles: list of tuple，障碍物信息
+        epsilon: 浮动容差，用于坐标匹配
+        index: ObstacleGrid，障碍物空间索引
+
+    返回:
+        tuple of int，障碍物编号
+    """
+    candidates = index.query_point(node, epsilon) if index is not None else range(len(obstacles))
+    ids = []
+    for k in candidates:
+        x_min, y_min, z_min, x_max, y_max, z_max = obstacles[k]
+        if not z_min <= node[2] <= z_max:
+            continue
+        near_x = min(abs(node[0] - x_min), abs(node[0] - x_max)) < epsilon
+        near_y = min(abs(node[1] - y_min), abs(node[1] - y_max)) < epsilon
+        if near_x and near_y:
+            ids.append(int(k))
+    return tuple(ids)
+
+
+@profiling.timed('find_polygon_for_node')
+def find_polygon_for_node(node, obstacles, epsilon=0.0001, index=None):
     """
     根据节点坐标找到其所属的凸多边形。
 
@@ -181,11 +711,17 @@ def find_polygon_for_node(node, obstacles, epsilon=0.0001):
         node: tuple，节点坐标 (x, y, z)
         obstacles: list of tuple，障碍物信息
         epsilon: 浮动容差，用于坐标匹配
+        index: ObstacleGrid，障碍物空间索引；给出时只检查节点附近的障碍物
 
     返回:
         polygon: Polygon，节点所属的凸多边形，如果未找到，返回 None。
     """
-    for obstacle in obstacles:
+    if index is not None:
+        candidates = [obstacles[k] for k in index.query_point(node, epsilon)]
+    else:
+        candidates = obstacles
+
+    for obstacle in candidates:
         polygon = get_obstacle_xy_polygon(obstacle)  # 获取障碍物的投影多边形
         
         # 遍历多边形的顶点
@@ -198,4 +734,3 @@ def find_polygon_for_node(node, obstacles, epsilon=0.0001):
                 return polygon
 
     return None
-
@@ -1,31 +1,164 @@
 import numpy as np
 import heapq
+import math
+import time
+from functools import lru_cache
+import profiling
 
-def calculate_cost(node1, node2, load = 0, vel = 12, k1 = 1 , k2 = 1):
+
+class UAVModel:
+    """
+    无人机能耗模型。与载重、速度有关的常量（质量、机身阻力、空气阻力功率等）在构造时预先计算，
+    cost / costs 只计算与航段有关的部分。爬升角的正弦 sin(arcsin(dz / distance)) 直接取 dz / distance，
+    单个计算与批量计算只用到四则运算和开方，两者结果逐位相同。
+
+    参数:
+        load: float，载重
+        vel: float，飞行速度
+        k1: float，能耗权重
+        k2: float，距离权重
+    """
     c_air = 0.3
     kappa = 1.15
-    mass = 50 + load
+    w = 5
     area = 1.59 * 1.9 + 4 * 3.14 * 0.3**2
-    w =  5
-    distancex = node2[0] - node1[0]
-    distancey = node2[1] - node1[1]
-    distancez = node2[2] - node1[2]
-    distance = np.sqrt(distancex**2 + distancey**2 + distancez**2)
-    theta = np.arcsin(distancez / distance) if distance != 0 else 0
-    time = distance / vel
-    P_climbing = max(mass *9.8 *vel * np.sin(theta), 0)
-    D_body = 0.5 * 1.225 * (vel**2) * area * c_air
-
-    # 计算推力 T
-    thrust = np.sqrt((mass * 9.8)**2 + D_body**2 + 2 * D_body * P_climbing)
-    
-    P_air_resistance = 0.5 * 1.225 * area * c_air *(vel**3)
-    P_downwash = kappa * w * thrust
-    P_uav = P_air_resistance + P_downwash + P_climbing
-    energy = P_uav * time
-    distance = np.sqrt(distancex**2 + distancey**2 + distancez**2)
-
-    return k1 * energy + k2 * distance
+
+    def __init__(self, load=0, vel=12, k1=1, k2=1):
+        self.load, self.vel, self.k1, self.k2 = load, vel, k1, k2
+        self.mass = 50 + load
+
+        # 以下常量的运算顺序与逐项计算时一致，保证数值完全相同
+        self.climb_coef = self.mass * 9.8 * vel
+        self.D_body = 0.5 * 1.225 * (vel**2) * self.area * self.c_air
+        self.thrust_base = (self.mass * 9.8)**2 + self.D_body**2
+        self.thrust_coef = 2 * self.D_body
+        self.P_air_resistance = 0.5 * 1.225 * self.area * self.c_air * (vel**3)
+        self.downwash_coef = self.kappa * self.w
+
+        # 平飞或下降时单位距离的代价，是任意航段单位距离代价的下界
+        level_power = self.P_air_resistance + self.downwash_coef * math.sqrt(self.thrust_base)
+        self.cost_rate = k1 * level_power / vel + k2
+
+    def cost(self, node1, node2):
+        """
+        计算单个航段 node1 -> node2 的代价。
+        """
+        distancex = node2[0] - node1[0]
+        distancey = node2[1] - node1[1]
+        distancez = node2[2] - node1[2]
+        distance = math.sqrt(distancex * distancex + distancey * distancey + distancez * distancez)
+        sin_theta = distancez / distance if distance != 0 else 0
+        time = distance / self.vel
+        P_climbing = max(self.climb_coef * sin_theta, 0)
+
+        # 计算推力 T
+        thrust = math.sqrt(self.thrust_base + self.thrust_coef * P_climbing)
+
+        P_downwash = self.downwash_coef * thrust
+        P_uav = self.P_air_resistance + P_downwash + P_climbing
+        energy = P_uav * time
+
+        return self.k1 * energy + self.k2 * distance
+
+    def costs(self, P1, P2):
+        """
+        批量计算航段 P1[i] -> P2[i] 的代价。
+
+        参数:
+            P1, P2: array-like (N, 3)，航段起点和终点
+
+        返回:
+            np.ndarray (N,)
+        """
+        P1 = np.asarray(P1, dtype=float).reshape(-1, 3)
+        P2 = np.asarray(P2, dtype=float).reshape(-1, 3)
+        distancex = P2[:, 0] - P1[:, 0]
+        distancey = P2[:, 1] - P1[:, 1]
+        distancez = P2[:, 2] - P1[:, 2]
+        distance = np.sqrt(distancex * distancex + distancey * distancey + distancez * distancez)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sin_theta = np.where(distance != 0, distancez / distance, 0.0)
+        time = distance / self.vel
+        P_climbing = np.maximum(self.climb_coef * sin_theta, 0)
+
+        # 计算推力 T
+        thrust = np.sqrt(self.thrust_base + self.thrust_coef * P_climbing)
+
+        P_downwash = self.downwash_coef * thrust
+        P_uav = self.P_air_resistance + P_downwash + P_climbing
+        energy = P_uav * time
+
+        return self.k1 * energy + self.k2 * distance
+
+    def lower_bounds(self, P, goal):
+        """
+        从 P[i] 到 goal 的代价下界，用作 A* 的启发函数，可一次计算所有节点。
+
+        平飞和下降航段的代价恰为 cost_rate * distance，爬升只会增加推力和爬升功率。
+        可视图中一条边的两个方向共用同一个权重，因此下界不计爬升项：对任意方向的边都有
+        w(u, v) >= cost_rate * |uv| >= h(u) - h(v)，启发函数可采纳且一致。
+
+        参数:
+            P: array-like (N, 3)，节点坐标
+            goal: tuple，终点 (x, y, z)
+
+        返回:
+            np.ndarray (N,)
+        """
+        P = np.asarray(P, dtype=float).reshape(-1, 3)
+        d = P - np.asarray(goal, dtype=float)
+        distance = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] + d[:, 2] * d[:, 2])
+
+        # 略微缩小，避免舍入误差使平飞边上的下界超过边权重
+        return self.cost_rate * (1 - 1e-12) * distance
+
+
+@lru_cache(maxsize=None)
+def get_uav_model(load=0, vel=12, k1=1, k2=1):
+    """
+    返回给定参数的 UAVModel，相同参数共用一个对象。
+    """
+    return UAVModel(load, vel, k1, k2)
+
+
+@profiling.timed('calculate_cost')
+def calculate_cost(node1, node2, load = 0, vel = 12, k1 = 1 , k2 = 1):
+    return get_uav_model(load, vel, k1, k2).cost(node1, node2)
+
+
+@profiling.timed('calculate_costs')
+def calculate_costs(P1, P2, load=0, vel=12, k1=1, k2=1):
+    """
+    calculate_cost 的批量版本。
+
+    参数:
+        P1, P2: array-like (N, 3)，航段起点和终点
+        load, vel, k1, k2: 同 calculate_cost
+
+    返回:
+        np.ndarray (N,)，每个航段的代价
+    """
+    costs = get_uav_model(load, vel, k1, k2).costs(P1, P2)
+    profiling.current().count('cost.segments', len(costs))
+    return costs
+
+
+def path_cost(graph, path):
+    """
+    按可视图的边权重计算路径代价，路径上相邻的两个节点必须在 graph 中相连。
+
+    参数:
+        graph: VisibilityGraph，可视图
+        path: list of tuple，路径节点
+
+    返回:
+        float，路径代价
+    """
+    total = 0.0
+    for a, b in zip(path, path[1:]):
+        neighbors, weights = graph.neighbors(graph.index_of(a))
+        total += float(weights[np.flatnonzero(neighbors == graph.index_of(b))[0]])
+    return total
 
 
 def heuristic_3d(a, b):
@@ -36,32 +169,472 @@ def heuristic_3d(a, b):
     return np.sqrt(dx**2 + dy**2 + dz**2)
 
 
-def a_star_search_3d(start, goal, nodes, edges):
-    open_heap = []
-    heapq.heappush(open_heap, (calculate_cost(start, goal), start))
+def cost_to_go(graph, goal):
+    """
+    从终点出发做一次反向 Dijkstra，得到每个节点到 goal 的最小代价。
+    可视图中一条边的两个方向权重相同，因此反向搜索的结果就是正向的真实剩余代价，
+    用作启发函数时 A* 只扩展最优路径上的节点。同一终点的多次查询可以共用这张表。
+
+    参数:
+        graph: VisibilityGraph，可视图，需包含 goal
+        goal: tuple，终点 (x, y, z)
+
+    返回:
+        np.ndarray (N,)，按节点编号排列的剩余代价，不可达的节点为 inf
+    """
+    g = graph.index_of(goal)
+    dist = np.full(graph.num_nodes, np.inf)
+    dist[g] = 0.0
+    done = np.zeros(graph.num_nodes, dtype=bool)
+    open_heap = [(0.0, g)]
+
+    while open_heap:
+        cost, current = heapq.heappop(open_heap)
+        if done[current]:
+            continue
+        done[current] = True
+
+        # 一次松弛当前节点的所有邻居
+        neighbors, costs = graph.neighbors(current)
+        new_costs = cost + costs
+        better = new_costs < dist[neighbors]
+        neighbors, new_costs = neighbors[better], new_costs[better]
+        dist[neighbors] = new_costs
+        for neighbor, new_cost in zip(neighbors.tolist(), new_costs.tolist()):
+            heapq.heappush(open_heap, (new_cost, neighbor))
+
+    return dist
+
+
+def dijkstra_csr(indptr, indices, weights, source, targets=None, transit=None):
+    """
+    在 CSR 数组表示的图上做单源 Dijkstra。给出 targets 时，所有目标节点出队（代价确定）后立即停止。
+
+    参数:
+        indptr, indices, weights: CSR 邻接表（见 VisibilityGraph）
+        source: int，起点编号
+        targets: array-like，目标节点编号，默认搜索整张图
+        transit: array-like (N,) bool，节点能否作为路径的中间节点，默认都可以；
+                 不能中转的节点只会作为路径终点，不会从它继续扩展
+
+    返回:
+        dist: np.ndarray (N,)，起点到各节点的代价，未确定的节点为 inf
+        pred: np.ndarray (N,)，最短路径树中的父节点编号，起点和未到达的节点为 -1
+    """
+    n = len(indptr) - 1
+    dist = np.full(n, np.inf)
+    pred = np.full(n, -1, dtype=np.int64)
+    done = np.zeros(n, dtype=bool)
+    dist[source] = 0.0
+
+    remaining = None
+    if targets is not None:
+        remaining = set(int(t) for t in targets) - {source}
+    open_heap = [(0.0, source)]
+
+    while open_heap:
+        cost, current = heapq.heappop(open_heap)
+        if done[current]:
+            continue
+        done[current] = True
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        if transit is not None and current != source and not transit[current]:
+            continue
+
+        # 一次松弛当前节点的所有邻居
+        lo, hi = indptr[current], indptr[current + 1]
+        neighbors = indices[lo:hi]
+        new_costs = cost + weights[lo:hi]
+        better = new_costs < dist[neighbors]
+        neighbors, new_costs = neighbors[better], new_costs[better]
+        dist[neighbors] = new_costs
+        pred[neighbors] = current
+        for neighbor, new_cost in zip(neighbors.tolist(), new_costs.tolist()):
+            heapq.heappush(open_heap, (new_cost, neighbor))
+
+    # 未出队的节点代价不一定最小
+    dist[~done] = np.inf
+    pred[~done] = -1
+    return dist, pred
+
+
+@profiling.timed('search.a_star')
+def a_star_search_3d(start, goal, graph, weight=1.0, heuristic=None):
+    """
+    在可视图上用 A* 搜索能耗最小路径。启发函数默认为 UAVModel.lower_bounds，
+    所用模型参数与建图时的边权重一致（graph.model），搜索开始前对所有节点一次算出。
+    堆中被更优代价取代的旧元素出队时直接跳过，每个节点最多扩展一次。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        graph: VisibilityGraph，可视图
+        weight: float，启发函数的权重；大于 1 时为 weighted A*，
+                搜索更快，返回路径的代价不超过最优代价的 weight 倍
+        heuristic: array-like (N,)，按节点编号给出的启发值，例如 cost_to_go 的结果；
+                   默认由 graph.model 计算
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None
+    """
+    s, g = graph.index_of(start), graph.index_of(goal)
+    heuristic = _heuristic_list(graph, goal, heuristic)
+
+    # 堆中元素为 (f, g, 节点)
+    open_heap = [(weight * heuristic[s], 0.0, s)]
     came_from = {}
-    cost_so_far = {start: 0}
+    cost_so_far = {s: 0.0}
+    closed = [False] * graph.num_nodes
+    profile = profiling.current()
+    pushes, stale = 1, 0
 
     while open_heap:
-        _, current = heapq.heappop(open_heap)
+        _, cost, current = heapq.heappop(open_heap)
+        if closed[current] or cost > cost_so_far[current]:
+            stale += 1
+            continue
+        closed[current] = True
+
+        if current == g:
+            _count_search(profile, [closed], pushes, stale)
+            return _reconstruct(graph, came_from, s, g)
 
-        if current == goal:
-            path = []
+        neighbors, costs = graph.neighbors(current)
+        for neighbor, edge_cost in zip(neighbors.tolist(), costs.tolist()):
+            if closed[neighbor]:
+                continue
+            new_cost = cost + edge_cost
+            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
+                cost_so_far[neighbor] = new_cost
+                came_from[neighbor] = current
+                heapq.heappush(open_heap, (new_cost + weight * heuristic[neighbor], new_cost, neighbor))
+                pushes += 1
+
+    _count_search(profile, [closed], pushes, stale)
+    return None
+
+
+@profiling.timed('search.bidirectional')
+def bidirectional_a_star_search_3d(start, goal, graph, heuristic=None, start_heuristic=None):
+    """
+    双向 A*：从起点和终点同时搜索，每次扩展队首 f 值较小的一侧。可视图是无向图，反向搜索直接使用同一邻接表。
+
+    两侧使用平均势函数 p(v) = (h_goal(v) - h_start(v)) / 2，正向 f = g + p，反向 f = g - p。
+    h_goal、h_start 一致时两侧的约化边权重都非负且相同，当两侧队首 f 值之和不小于已找到的最短路径代价时
+    即可停止，返回的路径是最优的。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        graph: VisibilityGraph，可视图
+        heuristic: array-like (N,)，按节点编号给出的到 goal 的启发值，默认由 graph.model 计算
+        start_heuristic: array-like (N,)，到 start 的启发值，默认由 graph.model 计算
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None
+    """
+    s, g = graph.index_of(start), graph.index_of(goal)
+    h_goal = np.asarray(_heuristic_list(graph, goal, heuristic))
+    h_start = np.asarray(_heuristic_list(graph, start, start_heuristic))
+    # 不可达节点的启发值为 inf 时势函数没有意义，这些节点不会出现在路径上
+    potential = np.where(np.isfinite(h_goal) & np.isfinite(h_start), (h_goal - h_start) / 2, 0.0)
+    potentials = (potential.tolist(), (-potential).tolist())
+
+    n = graph.num_nodes
+    dist = (np.full(n, np.inf), np.full(n, np.inf))
+    closed = ([False] * n, [False] * n)
+    came_from = ({}, {})
+    heaps = ([(potentials[0][s], 0.0, s)], [(potentials[1][g], 0.0, g)])
+    dist[0][s] = dist[1][g] = 0.0
+    best, meet = (0.0, s) if s == g else (np.inf, -1)
+    pushes, stale = 2, 0
+
+    while heaps[0] and heaps[1]:
+        # 清除两侧堆顶的过期元素
+        for side in (0, 1):
+            heap = heaps[side]
+            while heap and (closed[side][heap[0][2]] or heap[0][1] > dist[side][heap[0][2]]):
+                heapq.heappop(heap)
+                stale += 1
+        if not heaps[0] or not heaps[1] or heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        _, cost, current = heapq.heappop(heaps[side])
+        closed[side][current] = True
+
+        neighbors, costs = graph.neighbors(current)
+        new_costs = cost + costs
+
+        # 经过边 (current, neighbor) 连接两侧搜索的路径
+        through = new_costs + dist[1 - side][neighbors]
+        if len(through) and through.min() < best:
+            k = int(np.argmin(through))
+            best = float(through[k])
+            meet = (current, int(neighbors[k])) if side == 0 else (int(neighbors[k]), current)
+
+        better = new_costs < dist[side][neighbors]
+        neighbors, new_costs = neighbors[better], new_costs[better]
+        dist[side][neighbors] = new_costs
+        p = potentials[side]
+        for neighbor, new_cost in zip(neighbors.tolist(), new_costs.tolist()):
+            came_from[side][neighbor] = current
+            heapq.heappush(heaps[side], (new_cost + p[neighbor], new_cost, neighbor))
+        pushes += len(neighbors)
+
+    _count_search(profiling.current(), closed, pushes, stale)
+    if not np.isfinite(best):
+        return None
+    if s == g:
+        return [graph.node(s)]
+
+    # 正向部分 start -> u，反向部分 v -> goal
+    u, v = meet
+    forward = _reconstruct(graph, came_from[0], s, u)
+    backward = _reconstruct(graph, came_from[1], g, v)
+    return forward + backward[::-1]
+
+
+def ara_star_iter(start, goal, graph, weight=3.0, step=0.5, time_limit=None, heuristic=None):
+    """
+    ARA*（Anytime Repairing A*）：先用较大的权重 weight 做 weighted A* 快速得到一条路径，
+    再逐步把权重减小 step 直到 1，每一轮复用上一轮的搜索结果（g 值与 INCONS 列表），只修复需要改进的部分。
+    每找到一条更好的路径就产出一次；最后一轮（权重为 1）完成时得到最优路径。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        graph: VisibilityGraph，可视图
+        weight: float，初始权重，>= 1
+        step: float，每轮减小的权重
+        time_limit: float，时间限制（秒），从调用开始计算；超时后不再产出新路径，默认不限时。
+                    第一轮（权重为 weight）不受时间限制，终点可达时总会产出第一条路径
+        heuristic: array-like (N,)，按节点编号给出的启发值，默认由 graph.model 计算
+
+    产出:
+        path: list of tuple，路径节点
+        cost: float，路径代价
+        bound: float，代价不超过最优代价的 bound 倍
+
+    示例:
+        for path, cost, bound in ara_star_iter(start, goal, graph, time_limit=0.05):
+            dispatch(path)
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    s, g = graph.index_of(start), graph.index_of(goal)
+    h = _heuristic_list(graph, goal, heuristic)
+
+    n = graph.num_nodes
+    dist = [math.inf] * n
+    dist[s] = 0.0
+    came_from = {}
+    # OPEN 中的节点，每轮结束时由它计算次优界、重建堆，不需要遍历所有节点
+    open_set = {s}
+    incons = set()
+    best = math.inf
+    eps = max(weight, 1.0)
+
+    open_heap = [(eps * h[s], 0.0, s)]
+    while True:
+        closed = set()
+        # ImprovePath：直到终点的 g 值不大于队首的 f 值
+        while open_heap:
+            key, cost, current = open_heap[0]
+            if current not in open_set or cost > dist[current]:
+                heapq.heappop(open_heap)
+                continue
+            if key >= dist[g]:
+                break
+            # 找到第一条路径之后才检查时间限制
+            if deadline is not None and best < math.inf and time.perf_counter() > deadline:
+                return
+            heapq.heappop(open_heap)
+            open_set.discard(current)
+            closed.add(current)
+
+            neighbors, costs = graph.neighbors(current)
+            for neighbor, edge_cost in zip(neighbors.tolist(), costs.tolist()):
+                new_cost = cost + edge_cost
+                if new_cost < dist[neighbor]:
+                    dist[neighbor] = new_cost
+                    came_from[neighbor] = current
+                    if neighbor in closed:
+                        incons.add(neighbor)
+                    else:
+                        open_set.add(neighbor)
+                        heapq.heappush(open_heap, (new_cost + eps * h[neighbor], new_cost, neighbor))
+
+        # 次优界：终点代价与 OPEN、INCONS 中最小的 g + h 之比
+        lower = min((dist[k] + h[k] for k in open_set | incons), default=dist[g])
+        if dist[g] < best:
+            best = dist[g]
+            bound = min(eps, dist[g] / lower) if lower > 0 else eps
+            yield _reconstruct(graph, came_from, s, g), best, max(bound, 1.0)
+        if eps <= 1.0 or not math.isfinite(dist[g]):
+            return
+
+        # 减小权重，INCONS 中的节点移回 OPEN，按新的权重重建堆
+        eps = max(eps - step, 1.0)
+        open_set |= incons
+        incons = set()
+        open_heap = [(dist[k] + eps * h[k], dist[k], k) for k in open_set]
+        heapq.heapify(open_heap)
+
+
+def ara_star_search_3d(start, goal, graph, weight=3.0, step=0.5, time_limit=None, heuristic=None):
+    """
+    ARA* 的函数形式：返回时间限制内找到的最好路径，可作为 Planner.plan 的 search 参数
+    （例如 functools.partial(ara_star_search_3d, time_limit=0.05)）。参数同 ara_star_iter。
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None。第一条路径不受时间限制，
+              超时后返回已找到的最好路径
+    """
+    path = None
+    for path, _, _ in ara_star_iter(start, goal, graph, weight, step, time_limit, heuristic):
+        pass
+    return path
+
+
+def _count_search(profile, closed, pushes, stale, visibility=None):
+    """
+    记录一次搜索扩展的节点数（closed 为各方向的关闭标记）、入堆次数、跳过的过期元素数，
+    以及 lazy 搜索检查可视性的边数与其中不可见的边数（visibility 为 (检查数, 不可见数)）。未开启记录时直接返回。
+    """
+    if not profile.enabled:
+        return
+    profile.count('search.expanded', sum(np.count_nonzero(c) for c in closed))
+    profile.count('search.pushes', pushes)
+    profile.count('search.stale_pops', stale)
+    if visibility is not None:
+        checks, rejects = visibility
+        profile.count('search.edge_checks', checks)
+        profile.count('search.edge_rejects', rejects)
+
+
+def _heuristic_list(graph, goal, heuristic=None):
+    """
+    按节点编号返回到 goal 的启发值列表，默认由 graph.model 计算。
+    """
+    if heuristic is None:
+        model = graph.model if graph.model is not None else get_uav_model()
+        heuristic = model.lower_bounds(graph.coords, goal)
+    return np.asarray(heuristic, dtype=float).tolist()
+
+
+def _reconstruct(graph, came_from, s, current):
+    """
+    由父节点表回溯出 s -> current 的路径。
+    """
+    path = []
+    while current != s:
+        path.append(graph.node(current))
+        current = came_from[current]
+    path.append(graph.node(s))
+    path.reverse()
+    return path
+
+
+# lazy A* 检查一条边时，同一组候选中一并检查的个数
+LAZY_LOOKAHEAD = 32
+
+
+@profiling.timed('search.lazy')
+def lazy_a_star_search_3d(start, goal, coords, checker, load=10, vel=12, heuristic=None):
+    """
+    Lazy A*：图中只有节点坐标，任意两节点之间都视为候选边。扩展节点时只计算到未关闭节点的边代价，
+    候选不检查可视性直接入队；某个候选出队、要以这条边确定节点的父节点时才检查这一条边的可视性，
+    不可见则丢弃该候选，由同一节点的其他候选继续竞争。检查结果按节点对缓存，同一对节点只检查一次。
+
+    每次扩展的候选按 f 值排序后作为一组，堆中每组只放当前最小的一个，出队后再放入该组的下一个，
+    堆的大小与扩展次数相同，而不是与候选总数相同。
+
+    边代价与 compute_visibility_edges 建出的可视图一致：每条边按 checker.orient 给出的方向计算一个权重，
+    两个方向共用，因此两种模式在同一张地图上得到的最优代价相同。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        coords: np.ndarray (N, 3)，节点坐标，需包含 start 和 goal
+        checker: VisibilityChecker（见 build_evg_nodes），visible(i, j) 批量判断可视性，orient(i, j) 给出边的方向
+        load: float，载重，与建图时的边权重一致
+        vel: float，速度，与建图时的边权重一致
+        heuristic: array-like (N,)，按节点编号给出的启发值，默认为 UAVModel.lower_bounds
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None
+    """
+    coords = np.asarray(coords, dtype=float)
+    points = [tuple(p) for p in coords.tolist()]
+    s, g = points.index(tuple(map(float, start))), points.index(tuple(map(float, goal)))
+
+    if heuristic is None:
+        heuristic = get_uav_model(load, vel).lower_bounds(coords, goal)
+    heuristic = np.asarray(heuristic, dtype=float)
+    closed = np.zeros(len(points), dtype=bool)
+    came_from = {}
+    # {(较小编号, 较大编号): 是否可见}
+    visible = {}
+    # 每次扩展产生的一组候选：(f 值, g 值, 节点) 三个按 f 值排序的列表，以及父节点
+    batches = []
+
+    open_heap = [(heuristic[s], 0.0, s, -1, -1, 0)]
+    profile = profiling.current()
+    pushes, stale, checks, rejects = 1, 0, 0, 0
+
+    while open_heap:
+        _, cost, current, parent, batch, pos = heapq.heappop(open_heap)
+        if batch >= 0 and pos + 1 < len(batches[batch][2]):
+            f_values, g_values, nodes, _ = batches[batch]
+            heapq.heappush(open_heap, (f_values[pos + 1], g_values[pos + 1], nodes[pos + 1], parent, batch, pos + 1))
+            pushes += 1
+        if closed[current]:
+            stale += 1
+            continue
+
+        # 要以 parent -> current 确定父节点时才检查这条边；同一组中紧随其后的 LAZY_LOOKAHEAD 个未关闭候选
+        # 一并检查（很可能也要出队），减少逐条调用 checker.visible 的开销
+        if parent >= 0:
+            pair = (min(parent, current), max(parent, current))
+            if pair not in visible:
+                ahead = [k for k in batches[batch][2][pos:pos + LAZY_LOOKAHEAD]
+                         if not closed[k] and (min(parent, k), max(parent, k)) not in visible]
+                result = checker.visible(np.full(len(ahead), parent), ahead).tolist()
+                for k, v in zip(ahead, result):
+                    visible[min(parent, k), max(parent, k)] = v
+                checks += len(ahead)
+                rejects += len(ahead) - sum(result)
+            if not visible[pair]:
+                continue
+            came_from[current] = parent
+        closed[current] = True
+
+        if current == g:
+            _count_search(profile, [closed], pushes, stale, (checks, rejects))
+            path = [points[current]]
             while current in came_from:
-                path.append(current)
                 current = came_from[current]
-            path.append(start)
+                path.append(points[current])
             path.reverse()
             return path
 
-        for neighbor, cost in edges[current]:
-            new_cost = cost_so_far[current] + cost
-            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                cost_so_far[neighbor] = new_cost
-                priority = new_cost + calculate_cost(neighbor, goal)
-                heapq.heappush(open_heap, (priority, neighbor))
-                came_from[neighbor] = current
+        # 扩展：计算到所有未关闭节点的边代价，按 f 值排序后作为一组候选
+        candidates = np.flatnonzero(~closed)
+        if len(candidates) == 0:
+            continue
+        src, dst = checker.orient(np.full(len(candidates), current), candidates)
+        new_costs = cost + calculate_costs(coords[src], coords[dst], load, vel)
+        f_values = new_costs + heuristic[candidates]
+        order = np.argsort(f_values, kind='stable')
+        batches.append((f_values[order].tolist(), new_costs[order].tolist(), candidates[order].tolist(), current))
+        f_values, g_values, nodes, _ = batches[-1]
+        heapq.heappush(open_heap, (f_values[0], g_values[0], nodes[0], current, len(batches) - 1, 0))
+        pushes += 1
 
+    _count_search(profile, [closed], pushes, stale, (checks, rejects))
     return None
 
 
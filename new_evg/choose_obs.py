@@ -1,7 +1,10 @@
+import numpy as np
 from shapely.geometry import MultiPoint, Polygon
-from interact import line_intersects_2d
+from interact import segment_box_hits
+import profiling
 
-def choosing_obstacles(start, goal, obstacles):
+@profiling.timed('choose')
+def choosing_obstacles(start, goal, obstacles, index=None):
     """
     二阶段选择障碍物的主函数。
     阶段 1: 找到初始线段与障碍物投影相交的障碍物集合。
@@ -10,28 +13,117 @@ def choosing_obstacles(start, goal, obstacles):
     参数:
         start: tuple, 起点 (x, y, z)
         goal: tuple, 终点 (x, y, z)
-        obstacles: list of tuple, 障碍物 (x_min, y_min, z_min, x_max, y_max, z_max, expansion_value)
+        obstacles: list of tuple 或 np.ndarray (M, 6), 障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        index: ObstacleGrid, 基于 obstacles 建立的空间索引，给出时只检测附近的障碍物
 
     返回:
-        list of tuple: 最终筛选出的障碍物，格式与输入相同。
+        list of tuple: 最终筛选出的障碍物，格式与输入相同；输入为数组时返回数组。
     """
-    # 阶段 1: 找到与线段相交的障碍物
-    obstacles1_2D = line_intersects_2d(start, goal, obstacles)
-    
-    # 获取障碍物对应的二维投影的原始数据
-    obstacles1_original = [
-        obs for obs in obstacles
-        if get_obstacle_xy_polygon(obs) in obstacles1_2D
-    ]
-    
-    # 阶段 2: 根据第一阶段结果创建凸包并寻找与凸包相交的障碍物
-    convex_hull = create_convex_hull(obstacles1_2D)
-    obstacles2_original = [
-        obs for obs in obstacles
-        if convex_hull.intersects(get_obstacle_xy_polygon(obs))
-    ]
-    
-    return obstacles2_original
+    selected = select_corridor(start, goal, obstacles, index)
+
+    # 输入为数组时返回数组
+    if isinstance(obstacles, np.ndarray):
+        return obstacles[selected]
+    return [obstacles[k] for k in selected]
+
+def select_corridor(start, goal, obstacles, index=None):
+    """
+    choosing_obstacles 的向量化实现，直接在 (M, 6) 数组上计算，返回障碍物编号。
+    两个阶段的相交判断均按闭集计算（接触即相交），与 Shapely 的 intersects 一致：
+    阶段 1 用 slab 算法检测线段与矩形投影，阶段 2 用分离轴定理检测凸包与矩形投影。
+
+    参数:
+        start: tuple, 起点 (x, y, z)
+        goal: tuple, 终点 (x, y, z)
+        obstacles: list of tuple 或 np.ndarray (M, 6), 障碍物
+        index: ObstacleGrid, 基于 obstacles 建立的空间索引
+
+    返回:
+        np.ndarray: 按升序排列的障碍物编号
+    """
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    rect_min, rect_max = boxes[:, [0, 1]], boxes[:, [3, 4]]
+    p1 = np.array(start[:2], dtype=float)
+    p2 = np.array(goal[:2], dtype=float)
+
+    # 阶段 1: 与线段相交的障碍物投影
+    if index is not None:
+        candidates = index.query_box(np.append(np.minimum(p1, p2), -np.inf), np.append(np.maximum(p1, p2), np.inf))
+    else:
+        candidates = np.arange(len(boxes))
+    hits = segment_box_hits(p1, p2, rect_min[candidates], rect_max[candidates], strict=False)
+    first = candidates[hits]
+    if len(first) == 0:
+        return first
+
+    # 阶段 2: 第一阶段投影角点的凸包，及与凸包相交的障碍物投影
+    corners = np.concatenate([rect_min[first], rect_max[first],
+                              np.column_stack([rect_min[first, 0], rect_max[first, 1]]),
+                              np.column_stack([rect_max[first, 0], rect_min[first, 1]])])
+    hull = convex_hull_2d(corners)
+    if index is not None:
+        candidates = index.query_box(np.append(hull.min(axis=0), -np.inf), np.append(hull.max(axis=0), np.inf))
+    else:
+        candidates = np.arange(len(boxes))
+    return candidates[hull_overlaps_rects(hull, rect_min[candidates], rect_max[candidates])]
+
+def convex_hull_2d(points):
+    """
+    Andrew 单调链算法求二维点集的凸包。
+
+    返回:
+        np.ndarray (H, 2): 按逆时针排列的凸包顶点（共线点除外）
+    """
+    points = np.unique(np.asarray(points, dtype=float).reshape(-1, 2), axis=0)
+    if len(points) <= 2:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    pts = points.tolist()
+    lower, upper = [], []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+def hull_overlaps_rects(hull, rect_min, rect_max, max_pairs=1_000_000):
+    """
+    分离轴定理：判断凸多边形 hull 与每个轴对齐矩形是否相交（闭集，接触即相交）。
+    分离轴为 x、y 轴及凸包各边的法向量。
+
+    参数:
+        hull: np.ndarray (H, 2)，凸多边形顶点（按顺序排列）
+        rect_min, rect_max: np.ndarray (M, 2)，矩形的最小/最大角点
+
+    返回:
+        np.ndarray (M,) bool
+    """
+    # x、y 轴：比较包围盒
+    overlap = np.all((rect_min <= hull.max(axis=0)) & (hull.min(axis=0) <= rect_max), axis=1)
+    if len(hull) < 2:
+        return overlap
+
+    edges = np.roll(hull, -1, axis=0) - hull
+    normals = np.column_stack([-edges[:, 1], edges[:, 0]])
+    hull_proj = hull @ normals.T
+    hull_lo, hull_hi = hull_proj.min(axis=0), hull_proj.max(axis=0)
+
+    # 矩形在法向量上的投影为 中心·n ± 半边长·|n|
+    center = (rect_min + rect_max) / 2
+    half = (rect_max - rect_min) / 2
+    step = max(1, max_pairs // len(normals))
+    for s in range(0, len(center), step):
+        c = center[s:s + step] @ normals.T
+        r = half[s:s + step] @ np.abs(normals).T
+        overlap[s:s + step] &= np.all((c - r <= hull_hi) & (hull_lo <= c + r), axis=1)
+    return overlap
 
 def get_obstacle_xy_polygon(obstacle):
     """
@@ -59,17 +151,22 @@ def create_convex_hull(obstacles_2D):
     convex_hull = MultiPoint(all_points).convex_hull
     return convex_hull
 
+@profiling.timed('expand')
 def obstacle_expansion(obstacles, expansion):
     """
     对障碍物进行扩展。
 
     参数:
-        obstacles: list of tuple, 障碍物 (x_min, y_min, z_min, x_max, y_max, z_max, expansion_value)
+        obstacles: list of tuple 或 np.ndarray (M, 6), 障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
         expansion: float, 扩展值
 
     返回:
-        list of tuple: 扩展后的障碍物，格式与输入相同。
+        list of tuple: 扩展后的障碍物，格式与输入相同；输入为数组时返回 np.ndarray (M, 6)（float64）。
     """
+    if isinstance(obstacles, np.ndarray):
+        offset = np.array([-expansion, -expansion, 0, expansion, expansion, expansion], dtype=float)
+        return np.asarray(obstacles, dtype=float).reshape(-1, 6) + offset
+
     expanded_obstacles = []
     for obstacle in obstacles:
         x_min, y_min, z_min, x_max, y_max, z_max = obstacle
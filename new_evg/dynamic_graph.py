@@ -0,0 +1,362 @@
+'''
+    本文件实现了可增量更新的 cut_node 可视图 DynamicCutGraph：障碍物增加、删除或移动时，
+    只增删该障碍物的 cut_nodes，并只重新检测受它影响的节点对，结果与用 build_cut_graph 重新建图完全相同。
+    - 增加障碍物：只会挡住已有的边。已有的边登记在线段网格索引 SegmentGrid 中，只对经过新障碍物
+      所在网格的边做相交检测，另外重新检测端点归属发生变化的边；新节点与所有节点之间的节点对完整检测。
+    - 删除障碍物：只会放开原来不可见的节点对。每个不可见的节点对记录一个挡住它的障碍物
+      （只被节点对规则或端点所属障碍物的 2D 检查排除时记为 -1），只重新检测被删障碍物挡住的、或端点曾属于它的节点对。
+      记录在建图时与可视性检测一同得到（给出已建好的图时在构造时补建），之后随每次更新维护，
+      因此第一次删除也是增量的。
+'''
+import numpy as np
+from build_graph import (VisibilityChecker, build_cut_graph, define_cut_planes, generate_vertices,
+                         owner_matrix, row_pairs, load, vel)
+from calculate_search import calculate_costs, get_uav_model
+from interact import segment_box_hits, segments_intersect_boxes
+from spatial_index import ObstacleGrid, SegmentGrid
+from visibility_graph import VisibilityGraph
+
+# pair_blockers 中可见节点对的标记
+VISIBLE = -2
+
+
+class DynamicCutGraph:
+    """
+    支持增量更新的 cut_node 可视图。graph、checker 与 build_cut_graph(obstacles, cut_planes) 的结果一致，
+    每次更新生成新的 VisibilityGraph，不修改原有对象，因此可以安全地与 planner 的缓存共用。
+
+    参数:
+        obstacles: list of tuple，障碍物信息 (x_min, y_min, z_min, x_max, y_max, z_max)
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出；更新时保持不变
+        graph: VisibilityGraph，已建好的 cut_node 可视图，与 checker 一同给出时直接使用
+        checker: VisibilityChecker，与 graph 一同由 build_cut_graph 返回
+        workers: int，初次建图时并行计算可视性边的进程数（单进程时建图与不可见节点对的记录在同一遍检测中完成）
+
+    示例:
+        dynamic = DynamicCutGraph(obstacles)
+        k = dynamic.add_obstacle((100, 100, 0, 140, 130, 35))
+        dynamic.update_obstacle(k, (110, 100, 0, 150, 130, 35))
+        dynamic.remove_obstacle(k)
+    """
+
+    def __init__(self, obstacles, cut_planes=None, graph=None, checker=None, workers=None):
+        self.obstacles = [tuple(obs) for obs in np.asarray(obstacles, dtype=float).reshape(-1, 6).tolist()]
+        self.cut_planes = define_cut_planes(self.obstacles) if cut_planes is None else list(cut_planes)
+
+        # 节点坐标 -> 永久编号，边在 SegmentGrid 中的键由两端的永久编号组成，不随节点重新编号而改变
+        self._uids = {}
+        self._segments = None
+        # 不可见节点对 (a < b) 的键 a * N + b（升序）及挡住它的障碍物编号
+        self._blocked_keys = None
+        self._blockers = None
+
+        if graph is None and (workers is None or workers <= 1):
+            self._build()
+            return
+        if graph is None or checker is None:
+            graph, checker = build_cut_graph(self.obstacles, self.cut_planes, workers=workers)
+
+        # 由 checker 中记录的节点归属恢复 owners
+        self.owners = {node: tuple(int(k) for k in ids if k >= 0)
+                       for node, ids in zip(map(tuple, graph.base_coords.tolist()), checker.owner_ids)}
+        self.graph = graph
+        self.checker = checker
+        self._number_nodes()
+        self._index_edges()
+        self._init_blocked()
+
+    def add_obstacle(self, obstacle):
+        """
+        增加一个障碍物，编号为当前障碍物数量。
+
+        参数:
+            obstacle: tuple，(x_min, y_min, z_min, x_max, y_max, z_max)
+
+        返回:
+            int，新障碍物的编号
+        """
+        k = len(self.obstacles)
+        self._insert(k, tuple(obstacle))
+        return k
+
+    def remove_obstacle(self, k):
+        """
+        删除编号为 k 的障碍物，其后障碍物的编号依次减 1（与从列表中删除后重新建图一致）。
+        """
+        self._remove(k)
+
+    def update_obstacle(self, k, obstacle):
+        """
+        将编号为 k 的障碍物替换为 obstacle（例如移动或改变大小），编号不变。
+        """
+        self._remove(k)
+        self._insert(k, tuple(obstacle))
+
+    def _insert(self, k, box):
+        """
+        在编号 k 处插入障碍物 box，原编号 >= k 的障碍物编号加 1。
+        """
+        old_nodes = list(map(tuple, self.graph.base_coords.tolist()))
+        i_old, j_old, w_old = self.graph.edge_pairs()
+
+        owners = {node: tuple(x + (x >= k) for x in ids) for node, ids in self.owners.items()}
+        changed = set()
+        for node in generate_vertices([box], self.cut_planes):
+            changed.add(node)
+            owners[node] = tuple(sorted(owners.get(node, ()) + (k,)))
+        obstacles = self.obstacles[:k] + [box] + self.obstacles[k:]
+
+        checker, node_list = self._make_checker(obstacles, owners)
+        position = {node: n for n, node in enumerate(node_list)}
+        remap = np.array([position[node] for node in old_nodes], dtype=np.int64).reshape(-1)
+        is_new = np.ones(len(node_list), dtype=bool)
+        is_new[remap] = False
+        is_changed = np.zeros(len(node_list), dtype=bool)
+        is_changed[[position[node] for node in changed]] = True
+
+        # 1. 已有的边：节点的相对顺序不变，i < j 仍然成立，权重保持不变。
+        #    只有经过新障碍物所在网格的边可能被它挡住
+        i, j = remap[i_old], remap[j_old]
+        coords = checker.coords
+        keep = np.ones(len(i), dtype=bool)
+        crossing = self._edges_near(box, i_old, j_old)
+        keep[crossing] = ~segments_intersect_boxes(coords[i[crossing]], coords[j[crossing]], [box])
+        # 端点新增了所属障碍物的边需要重新做 2D 检查
+        retest = np.flatnonzero(keep & (is_changed[i] | is_changed[j]))
+        keep[retest] = checker.visible(i[retest], j[retest])
+        dropped_i, dropped_j = i[~keep], j[~keep]
+        i, j, w = i[keep], j[keep], w_old[keep]
+
+        # 2. 新节点与所有节点之间的节点对
+        new_ids = np.flatnonzero(is_new)
+        a = np.repeat(new_ids, len(node_list))
+        b = np.tile(np.arange(len(node_list)), len(new_ids))
+        pair = (a != b) & (~is_new[b] | (a < b))
+        a, b = np.minimum(a[pair], b[pair]), np.maximum(a[pair], b[pair])
+        new_blockers = pair_blockers(checker, a, b)
+        visible = new_blockers == VISIBLE
+
+        # 原来不可见的节点对仍然不可见，障碍物编号 >= k 的加 1；新增不可见的节点对记录挡住它的障碍物
+        n = len(node_list)
+        keys, blockers = self._remap_blocked(remap, len(old_nodes), n)
+        blockers = blockers + (blockers >= k)
+        self._store_blocked(np.concatenate([keys, dropped_i * n + dropped_j, a[~visible] * n + b[~visible]]),
+                            np.concatenate([blockers, first_blockers(checker, dropped_i, dropped_j),
+                                            new_blockers[~visible]]))
+
+        self._commit(obstacles, owners, checker, i, j, w, a[visible], b[visible])
+
+    def _remove(self, k):
+        """
+        删除编号为 k 的障碍物，原编号 > k 的障碍物编号减 1。
+        """
+        old_nodes = list(map(tuple, self.graph.base_coords.tolist()))
+        i_old, j_old, w_old = self.graph.edge_pairs()
+
+        owners = {}
+        changed = set()
+        for node, ids in self.owners.items():
+            if k in ids:
+                changed.add(node)
+            rest = tuple(x - (x > k) for x in ids if x != k)
+            if rest:
+                owners[node] = rest
+        obstacles = self.obstacles[:k] + self.obstacles[k + 1:]
+
+        checker, node_list = self._make_checker(obstacles, owners)
+        position = {node: n for n, node in enumerate(node_list)}
+        remap = np.array([position.get(node, -1) for node in old_nodes], dtype=np.int64).reshape(-1)
+
+        # 1. 已有的边：两端节点都保留时仍然可见
+        i, j = remap[i_old], remap[j_old]
+        keep = (i >= 0) & (j >= 0)
+        i, j, w = i[keep], j[keep], w_old[keep]
+
+        # 2. 不可见的节点对中，被删障碍物挡住的或端点曾属于它的，重新检测
+        n = len(node_list)
+        is_changed = np.zeros(n, dtype=bool)
+        is_changed[[position[node] for node in changed if node in position]] = True
+        keys, blockers = self._remap_blocked(remap, len(old_nodes), n)
+        a, b = keys // n, keys % n
+        retest = (blockers == k) | is_changed[a] | is_changed[b]
+        blockers = blockers - (blockers > k)
+
+        a, b = a[retest], b[retest]
+        new_blockers = pair_blockers(checker, a, b)
+        visible = new_blockers == VISIBLE
+        self._store_blocked(np.concatenate([keys[~retest], keys[retest][~visible]]),
+                            np.concatenate([blockers[~retest], new_blockers[~visible]]))
+        self._commit(obstacles, owners, checker, i, j, w, a[visible], b[visible])
+
+    def _build(self):
+        """
+        建立 cut_node 可视图（与 build_cut_graph 单进程的结果相同），按行分块检测所有节点对，
+        同时记录每个不可见节点对的障碍物，不需要再为记录单独检测一遍。
+        """
+        index = ObstacleGrid(self.obstacles)
+        owners = generate_vertices(self.obstacles, self.cut_planes, index=index)
+        checker, node_list = self._make_checker(self.obstacles, owners, index)
+        n = len(node_list)
+
+        edges_i, edges_j, keys, blockers = [], [], [], []
+        rows_per_block = max(1, 1_000_000 // max(n, 1))
+        for lo in range(0, n, rows_per_block):
+            a, b = row_pairs(lo, min(lo + rows_per_block, n), n)
+            block = pair_blockers(checker, a, b)
+            visible = block == VISIBLE
+            edges_i.append(a[visible])
+            edges_j.append(b[visible])
+            keys.append(a[~visible] * n + b[~visible])
+            blockers.append(block[~visible])
+
+        empty = np.zeros(0, dtype=np.int64)
+        self._store_blocked(np.concatenate(keys + [empty]), np.concatenate(blockers + [empty]))
+        self._commit(self.obstacles, owners, checker, empty, empty, np.zeros(0),
+                     np.concatenate(edges_i + [empty]), np.concatenate(edges_j + [empty]))
+
+    def _init_blocked(self):
+        """
+        为给定可视图中所有不可见的节点对记录挡住它的障碍物（按行分块，限制中间数组的内存）。
+        """
+        checker = self.checker
+        n = len(checker.coords)
+        i, j, _ = self.graph.edge_pairs()
+        edge_keys = np.sort(i * n + j)
+
+        keys, blockers = [], []
+        rows_per_block = max(1, 1_000_000 // max(n, 1))
+        for lo in range(0, n, rows_per_block):
+            a, b = row_pairs(lo, min(lo + rows_per_block, n), n)
+            block_keys = a * n + b
+            pos = np.minimum(np.searchsorted(edge_keys, block_keys), max(len(edge_keys) - 1, 0))
+            unknown = edge_keys[pos] != block_keys if len(edge_keys) else np.ones(len(block_keys), dtype=bool)
+            keys.append(block_keys[unknown])
+            blockers.append(first_blockers(checker, a[unknown], b[unknown]))
+        self._store_blocked(np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64),
+                            np.concatenate(blockers) if blockers else np.zeros(0, dtype=np.int64))
+
+    def _remap_blocked(self, remap, n_old, n):
+        """
+        将不可见节点对的记录换算到新的节点编号，去掉端点已删除的节点对。节点的相对顺序不变，键仍然升序。
+        """
+        a, b = remap[self._blocked_keys // n_old], remap[self._blocked_keys % n_old]
+        keep = (a >= 0) & (b >= 0)
+        return a[keep] * n + b[keep], self._blockers[keep]
+
+    def _store_blocked(self, keys, blockers):
+        order = np.argsort(keys, kind='stable')
+        self._blocked_keys = keys[order]
+        self._blockers = blockers[order]
+
+    def _make_checker(self, obstacles, owners, index=None):
+        """
+        为新的障碍物列表和节点归属建立 VisibilityChecker，节点按坐标排序（与 build_cut_graph 一致）。
+        """
+        node_list = sorted(owners)
+        coords = np.array(node_list, dtype=float).reshape(-1, 3)
+        checker = VisibilityChecker(coords, owner_matrix(node_list, owners), obstacles, len(node_list),
+                                    index=ObstacleGrid(obstacles) if index is None else index)
+        return checker, node_list
+
+    def _commit(self, obstacles, owners, checker, i, j, w, a, b):
+        """
+        合并保留的边 (i, j, w) 与新检测到的边 (a, b)，生成新的可视图，并将新边登记到线段索引中。
+        """
+        coords = checker.coords
+        weights = np.concatenate([w, calculate_costs(coords[a], coords[b], load, vel)])
+        self.graph = VisibilityGraph.from_pairs(coords, np.concatenate([i, a]), np.concatenate([j, b]),
+                                                weights, get_uav_model(load, vel))
+        self.checker = checker
+        self.obstacles = obstacles
+        self.owners = owners
+
+        self._number_nodes()
+        n_edges = len(i) + len(a)
+        if self._segments is None or self._segments.size > 2 * n_edges + 1024 or not self._segments.contains(coords):
+            self._index_edges()
+        else:
+            self._segments.add(coords[a], coords[b], self._edge_keys(a, b))
+
+    def _number_nodes(self):
+        """
+        为当前的节点分配永久编号（坐标相同的节点编号相同），并建立永久编号到当前节点编号的映射。
+        """
+        nodes = map(tuple, self.checker.coords.tolist())
+        self._node_uids = np.array([self._uids.setdefault(node, len(self._uids)) for node in nodes],
+                                   dtype=np.int64).reshape(-1)
+        self._uid_index = np.full(len(self._uids), -1, dtype=np.int64)
+        self._uid_index[self._node_uids] = np.arange(len(self._node_uids))
+
+    def _edge_keys(self, a, b):
+        """
+        节点对 (a, b) 在 SegmentGrid 中的键：两端永久编号（较小者在前）组成的整数。
+        """
+        ua, ub = self._node_uids[a], self._node_uids[b]
+        return np.minimum(ua, ub) << 32 | np.maximum(ua, ub)
+
+    def _index_edges(self):
+        """
+        重建线段索引，登记当前可视图的所有边。网格覆盖全部节点，网格边长与障碍物索引相同。
+        """
+        coords = self.checker.coords
+        lo, hi = (coords[:, :2].min(axis=0), coords[:, :2].max(axis=0)) if len(coords) else (np.zeros(2), np.zeros(2))
+        self._segments = SegmentGrid(lo, hi, self.checker.index.cell_size)
+        i, j, _ = self.graph.edge_pairs()
+        self._segments.add(coords[i], coords[j], self._edge_keys(i, j))
+
+    def _edges_near(self, box, i, j):
+        """
+        返回当前可视图的边 (i, j)（edge_pairs 的结果，按 (i, j) 升序）中经过 box 所在网格的边的位置。
+        """
+        keys = self._segments.query_box(box[:3], box[3:])
+        a, b = self._uid_index[keys >> 32], self._uid_index[keys & 0xFFFFFFFF]
+        alive = (a >= 0) & (b >= 0)
+        a, b = np.minimum(a[alive], b[alive]), np.maximum(a[alive], b[alive])
+
+        # 已经删除的边不在当前的边中
+        n = self.graph.num_base_nodes
+        edge_keys = i * n + j
+        query = a * n + b
+        pos = np.minimum(np.searchsorted(edge_keys, query), max(len(edge_keys) - 1, 0))
+        found = edge_keys[pos] == query if len(edge_keys) else np.zeros(len(query), dtype=bool)
+        return pos[found]
+
+
+def pair_blockers(checker, a, b):
+    """
+    对节点对 (a, b)（a < b）做与 checker.visible 相同的检查，同时给出不可见的原因：
+    可见时为 VISIBLE，被节点对规则或端点所属障碍物的局部检查排除时为 -1，否则为挡住线段的一个障碍物编号。
+
+    返回:
+        np.ndarray (E,) int64
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    blockers = np.full(len(a), -1, dtype=np.int64)
+    local = np.flatnonzero(checker.local_visible(a, b))
+    hits = first_blockers(checker, a[local], b[local])
+    blockers[local] = np.where(hits >= 0, hits, VISIBLE)
+    return blockers
+
+
+def first_blockers(checker, a, b, max_pairs=1_000_000):
+    """
+    对节点对 (a, b) 的线段各找出一个与之相交的障碍物（与 segments_intersect_boxes 的判断相同），
+    没有时为 -1（节点对只被端点所属障碍物的 2D 检查排除）。
+
+    返回:
+        np.ndarray (E,) int64
+    """
+    blockers = np.full(len(a), -1, dtype=np.int64)
+    if len(a) == 0:
+        return blockers
+    P1, P2 = checker.coords[a], checker.coords[b]
+    box_min, box_max = checker.obstacles[:, :3] + 1e-6, checker.obstacles[:, 3:] - 1e-6
+    # 与 segments_intersect_boxes 相同，分批查询空间索引，限制中间数组的大小
+    step = max(1, max_pairs // 64)
+    for s in range(0, len(a), step):
+        seg_ids, obs_ids = checker.index.query_segments(P1[s:s + step], P2[s:s + step])
+        seg_ids += s
+        hits = segment_box_hits(P1[seg_ids], P2[seg_ids], box_min[obs_ids], box_max[obs_ids])
+        blockers[seg_ids[hits]] = obs_ids[hits]
+    return blockers
@@ -0,0 +1,193 @@
+'''
+    本文件实现了可视图的磁盘缓存：建好的可视图（节点坐标、CSR 邻接表、边权重、节点归属）
+    以 .npy 文件保存在以缓存键命名的目录中，建图参数保存在 meta.json 中。
+    缓存键由障碍物文件内容的哈希与调用参数（扩展量、给定的切割平面、载重、速度、起点、终点）共同决定，
+    任一项改变都会得到新的键，因此命中时不需要先读取障碍物文件。再次加载时用 np.load(mmap_mode='r')
+    直接映射文件（包括扩展后的障碍物与空间索引），不需要重新解析、扩展障碍物或重新建图。
+'''
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from obstacles import load_obstacles_array
+from choose_obs import choosing_obstacles, obstacle_expansion
+from spatial_index import ObstacleGrid
+from build_graph import VisibilityChecker, build_cut_graph, build_evg_graph, define_cut_planes, load, vel
+from calculate_search import get_uav_model
+from visibility_graph import VisibilityGraph
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'graph_cache')
+
+# 建图规则或文件格式改变时加 1，使旧缓存失效
+CACHE_VERSION = 2
+
+
+def file_hash(filename):
+    """
+    返回文件内容的 SHA-256 哈希（十六进制）。
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(obstacle_hash, **params):
+    """
+    由障碍物哈希和建图参数计算缓存键。
+
+    参数:
+        obstacle_hash: str，障碍物文件内容的哈希（见 file_hash）
+        params: 建图参数，需可序列化为 JSON
+
+    返回:
+        str，缓存键（同时作为缓存目录名）
+    """
+    text = json.dumps({'version': CACHE_VERSION, 'obstacles': obstacle_hash, **params}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def save_graph(path, graph, owner_ids=None, obstacles=None, meta=None, index=None):
+    """
+    将可视图保存到目录 path。先写入临时目录再改名，写入中断时不会留下不完整的缓存。
+
+    参数:
+        path: str，缓存目录
+        graph: VisibilityGraph，可视图（只保存 CSR 部分，不包括临时插入的节点）
+        owner_ids: np.ndarray (N, K)，节点所属障碍物编号，用于恢复 VisibilityChecker
+        obstacles: list of tuple，建图所用的（扩展后的）障碍物
+        meta: dict，建图参数，保存为 meta.json
+        index: ObstacleGrid，基于 obstacles 建立的空间索引
+    """
+    arrays = {
+        'coords': graph.base_coords,
+        'indptr': graph.indptr,
+        'indices': graph.indices,
+        'weights': graph.weights,
+    }
+    if owner_ids is not None:
+        arrays['owner_ids'] = np.asarray(owner_ids, dtype=np.int64)
+    if obstacles is not None:
+        arrays['obstacles'] = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    if index is not None:
+        arrays.update(index.to_arrays())
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name + '.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta or {}, f, indent=2)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_graph(path, mmap=True):
+    """
+    从目录 path 加载 save_graph 保存的可视图。
+
+    参数:
+        path: str，缓存目录
+        mmap: bool，是否以只读内存映射方式加载数组
+
+    返回:
+        graph: VisibilityGraph
+        arrays: dict，其余数组（owner_ids、obstacles、空间索引，保存时给出才有）
+        meta: dict，建图参数
+    """
+    mode = 'r' if mmap else None
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    arrays = {}
+    for name in ('coords', 'indptr', 'indices', 'weights', 'owner_ids', 'obstacles',
+                 'grid_params', 'grid_start', 'grid_items'):
+        filename = os.path.join(path, name + '.npy')
+        if os.path.exists(filename):
+            arrays[name] = np.load(filename, mmap_mode=mode)
+
+    model = get_uav_model(meta['load'], meta['vel']) if 'load' in meta else None
+    graph = VisibilityGraph(arrays.pop('coords'), arrays.pop('indptr'), arrays.pop('indices'),
+                            arrays.pop('weights'), model)
+    return graph, arrays, meta
+
+
+def cached_cut_graph(filename, expansion=2, cut_planes=None, workers=None, cache_dir=CACHE_DIR):
+    """
+    带磁盘缓存的 build_cut_graph：缓存中有相同文件内容和参数的图时，直接映射缓存中扩展后的障碍物、
+    空间索引与可视图；没有时才读取障碍物文件、扩展并建图。
+
+    参数:
+        filename: str，障碍物文件（文本或二进制格式，见 obstacles.load_obstacles_array）
+        expansion: float，障碍物扩展值
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        workers: int，需要建图时并行计算可视性边的进程数
+        cache_dir: str，缓存根目录
+
+    返回:
+        obstacles_expanded: np.ndarray (M, 6)，扩展后的障碍物
+        graph: VisibilityGraph，cut_node 可视图
+        checker: VisibilityChecker，连接起点、终点时使用
+    """
+    # 默认切割平面由扩展后的障碍物决定，键中只记录“默认”，命中时不必先读取障碍物
+    params = {'kind': 'cut', 'expansion': float(expansion),
+              'cut_planes': None if cut_planes is None else [float(z) for z in cut_planes], 'load': load, 'vel': vel}
+    path = os.path.join(cache_dir, cache_key(file_hash(filename), **params))
+
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        graph, arrays, _ = load_graph(path)
+        obstacles_expanded = arrays['obstacles']
+        index = ObstacleGrid.from_arrays(obstacles_expanded, arrays)
+        checker = VisibilityChecker(graph.base_coords, arrays['owner_ids'], obstacles_expanded, graph.num_base_nodes,
+                                    index=index)
+        return obstacles_expanded, graph, checker
+
+    obstacles_expanded = obstacle_expansion(load_obstacles_array(filename), expansion)
+    if cut_planes is None:
+        cut_planes = define_cut_planes(obstacles_expanded)
+    index = ObstacleGrid(obstacles_expanded)
+    graph, checker = build_cut_graph(obstacles_expanded, cut_planes, index=index, workers=workers)
+    meta = {**params, 'cut_planes': [float(z) for z in cut_planes]}
+    save_graph(path, graph, checker.owner_ids, obstacles_expanded, meta, index=index)
+    return obstacles_expanded, graph, checker
+
+
+def cached_evg_graph(filename, start, goal, expansion=2, cache_dir=CACHE_DIR):
+    """
+    带磁盘缓存的 main.py 建图流程：读取障碍物文件，按起点、终点筛选障碍物并扩展，再建立可视图。
+    缓存命中时直接映射缓存中筛选并扩展后的障碍物与可视图，不读取障碍物文件。
+
+    参数:
+        filename: str，障碍物文件（文本或二进制格式）
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        expansion: float，障碍物扩展值
+        cache_dir: str，缓存根目录
+
+    返回:
+        obstacles_final: np.ndarray (M, 6)，筛选并扩展后的障碍物
+        graph: VisibilityGraph，可视图
+    """
+    params = {'kind': 'evg', 'expansion': float(expansion),
+              'start': [float(c) for c in start], 'goal': [float(c) for c in goal], 'load': load, 'vel': vel}
+    path = os.path.join(cache_dir, cache_key(file_hash(filename), **params))
+
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        graph, arrays, _ = load_graph(path)
+        return arrays['obstacles'], graph
+
+    obstacles = load_obstacles_array(filename)
+    obstacles_final = obstacle_expansion(choosing_obstacles(start, goal, obstacles), expansion)
+    meta = {**params, 'cut_planes': [float(z) for z in define_cut_planes(obstacles_final)]}
+    graph = build_evg_graph(obstacles_final, start, goal)
+    save_graph(path, graph, obstacles=obstacles_final, meta=meta)
+    return obstacles_final, graph
@@ -0,0 +1,145 @@
+'''
+    本文件是 A* 启发函数的检查脚本：在随机地图上建图，验证 UAVModel.lower_bounds 对每条边满足
+    h(u) <= w(u, v) + h(v)（一致性），并比较 A*、weighted A*、以 cost_to_go 为启发函数的 A*、
+    双向 A*、ARA*、lazy A*（build_evg_nodes）与 Dijkstra（weight=0）得到的路径代价；
+    另外验证 Planner.cost_matrix 的代价与路径的代价（按可视图的边权重）等于逐对调用 Planner.plan 所得路径的代价。
+    运行: python heuristic_check.py
+'''
+import random
+import numpy as np
+from obstacles import generate_obstacles, total_length
+from choose_obs import obstacle_expansion
+from build_graph import build_evg_graph, build_evg_nodes
+from calculate_search import (a_star_search_3d, ara_star_iter, ara_star_search_3d, bidirectional_a_star_search_3d,
+                              cost_to_go, lazy_a_star_search_3d, path_cost)
+from planner import Planner
+
+
+def check_heuristic_consistency(graph, goal, model=None, rtol=1e-9):
+    """
+    检查启发函数在可视图的每条边（两个方向）上是否一致。
+
+    参数:
+        graph: VisibilityGraph，可视图
+        goal: tuple，终点 (x, y, z)
+        model: UAVModel，默认使用 graph.model
+        rtol: float，相对容差
+
+    返回:
+        dict: edges 检查的有向边数，violations 不满足一致性的边数，max_excess 最大超出量
+    """
+    model = graph.model if model is None else model
+    h = model.lower_bounds(graph.coords, goal)
+    i, j, w = graph.edge_pairs()
+
+    src = np.concatenate([i, j])
+    dst = np.concatenate([j, i])
+    w = np.concatenate([w, w])
+    excess = h[src] - w - h[dst]
+    bad = excess > rtol * np.maximum(w, 1)
+
+    return {
+        'edges': len(w),
+        'violations': int(bad.sum()),
+        'max_excess': float(excess.max()) if len(w) else 0.0,
+        'goal_h': float(h[graph.index_of(goal)]),
+    }
+
+
+def plan_costs(planner, start, goal, other=None):
+    """
+    调用 planner.plan(start, goal)，在起点、终点仍插入可视图时按可视图的边权重计算所得路径
+    以及路径 other（端点相同）的代价，不可达时为 inf。
+
+    返回:
+        tuple: (plan 所得路径的代价, other 的代价)
+    """
+    costs = []
+
+    def search(s, g, graph):
+        path = a_star_search_3d(s, g, graph)
+        costs.extend(np.inf if p is None else path_cost(graph, p) for p in (path, other))
+        return path
+
+    planner.plan(start, goal, search=search)
+    return tuple(costs)
+
+
+def check_cost_matrix(n_maps=3, n_points=5, num_obstacles=20, min_distance=14, expansion=2, seed=0):
+    """
+    在 n_maps 张随机地图上检查 Planner.cost_matrix：costs[a, b] 与 paths[a, b] 的代价（按可视图的边权重）
+    都等于 Planner.plan(points[a], points[b]) 所得路径的代价，矩阵对称、对角线为 0。
+    """
+    random.seed(seed)
+    failures = 0
+    for k in range(n_maps):
+        planner = Planner(generate_obstacles(num_obstacles, min_distance, expansion), expansion)
+        points = [(round(random.uniform(-20, total_length + 60), 1), round(random.uniform(-20, total_length + 60), 1),
+                   round(random.uniform(2, 30), 1)) for _ in range(n_points)]
+        costs, paths = planner.cost_matrix(points)
+
+        ok = np.array_equal(costs, costs.T) and not np.diag(costs).any()
+        for a in range(n_points):
+            for b in range(n_points):
+                if a != b:
+                    expected, table_cost = plan_costs(planner, points[a], points[b], paths[a, b])
+                    ok = ok and np.isclose(costs[a, b], expected, rtol=1e-9) and np.isclose(table_cost, expected, rtol=1e-9)
+        failures += not ok
+        print(f"cost_matrix map {k}: reachable={int(np.isfinite(costs).sum()) - n_points} {'OK' if ok else 'FAIL'}")
+    return failures
+
+
+def run_random_maps(n_maps=10, num_obstacles=20, min_distance=14, expansion=2, weight=1.5, seed=0):
+    """
+    在 n_maps 张随机地图上检查一致性，并验证：
+    A*、以 cost_to_go 为启发函数的 A*、双向 A* 和 lazy A* 的路径代价（按可视图的边权重）等于 Dijkstra 的最优代价；
+    weighted A* 的代价不超过最优代价的 weight 倍；ARA* 每次产出的路径代价逐次下降、
+    不超过最优代价的 bound 倍，最后一条路径是最优的；时间限制为 0 时 ARA* 仍返回第一轮的路径。
+    """
+    random.seed(seed)
+    failures = 0
+    for k in range(n_maps):
+        obstacles = obstacle_expansion(generate_obstacles(num_obstacles, min_distance, expansion), expansion)
+        start = (round(random.uniform(-20, 0), 1), round(random.uniform(-20, 0), 1), round(random.uniform(2, 30), 1))
+        goal = (round(random.uniform(total_length, total_length + 60), 1),
+                round(random.uniform(total_length, total_length + 60), 1), round(random.uniform(2, 30), 1))
+
+        graph = build_evg_graph(obstacles, start, goal)
+        report = check_heuristic_consistency(graph, goal)
+
+        optimal = a_star_search_3d(start, goal, graph, weight=0)
+        astar = a_star_search_3d(start, goal, graph)
+        weighted = a_star_search_3d(start, goal, graph, weight=weight)
+        exact = a_star_search_3d(start, goal, graph, heuristic=cost_to_go(graph, goal))
+        bidirectional = bidirectional_a_star_search_3d(start, goal, graph)
+        anytime = list(ara_star_iter(start, goal, graph))
+        first = ara_star_search_3d(start, goal, graph, time_limit=0)
+        lazy = lazy_a_star_search_3d(start, goal, *build_evg_nodes(obstacles, start, goal))
+        if optimal is None:
+            ok = (report['violations'] == 0 and astar is None and weighted is None and exact is None
+                  and bidirectional is None and not anytime and first is None and lazy is None)
+            costs = ()
+        else:
+            costs = tuple(path_cost(graph, p) for p in (optimal, astar, weighted, exact, bidirectional, lazy))
+            ok = (report['violations'] == 0 and np.isclose(costs[1], costs[0], rtol=1e-12)
+                  and costs[2] <= weight * costs[0] * (1 + 1e-12)
+                  and np.isclose(costs[3], costs[0], rtol=1e-12)
+                  and np.isclose(costs[4], costs[0], rtol=1e-12)
+                  and np.isclose(costs[5], costs[0], rtol=1e-12)
+                  and all(np.isclose(path_cost(graph, p), c) and c <= bound * costs[0] * (1 + 1e-12)
+                          for p, c, bound in anytime)
+                  and all(a[1] > b[1] for a, b in zip(anytime, anytime[1:]))
+                  and np.isclose(anytime[-1][1], costs[0], rtol=1e-12)
+                  and first == anytime[0][0])
+        failures += not ok
+
+        print(f"map {k}: edges={report['edges']} violations={report['violations']} "
+              f"max_excess={report['max_excess']:.3g} costs={[round(c, 1) for c in costs]} {'OK' if ok else 'FAIL'}")
+
+    failures += check_cost_matrix(seed=seed)
+    print("全部通过" if failures == 0 else f"{failures} 张地图未通过")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    run_random_maps()
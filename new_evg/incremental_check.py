@@ -0,0 +1,85 @@
+'''
+    本文件是增量更新的检查脚本：在随机地图上随机增加、删除、移动障碍物，
+    每一步都将 DynamicCutGraph 的结果与 build_cut_graph 重新建图的结果逐项比较（节点坐标、邻接表、权重）。
+    运行: python incremental_check.py
+'''
+import random
+import time
+import numpy as np
+from obstacles import generate_obstacles, total_length, ob_length_low, ob_length_high
+from choose_obs import obstacle_expansion
+from build_graph import build_cut_graph
+from dynamic_graph import DynamicCutGraph
+
+
+def graphs_equal(graph1, graph2):
+    """
+    判断两个可视图的节点坐标、CSR 邻接表和边权重是否完全相同。
+    """
+    return (np.array_equal(graph1.base_coords, graph2.base_coords)
+            and np.array_equal(graph1.indptr, graph2.indptr)
+            and np.array_equal(graph1.indices, graph2.indices)
+            and np.array_equal(graph1.weights, graph2.weights))
+
+
+def random_box():
+    """
+    随机生成一个与 generate_obstacles 尺寸范围相同的障碍物（不检查间距，可能与其他障碍物重叠或接触）。
+    """
+    x_min = round(random.uniform(0, total_length), 1)
+    y_min = round(random.uniform(0, total_length), 1)
+    return (x_min, y_min, 0,
+            round(x_min + random.uniform(ob_length_low, ob_length_high), 1),
+            round(y_min + random.uniform(ob_length_low, ob_length_high), 1),
+            round(random.uniform(10, 50), 1))
+
+
+def run_random_updates(n_steps=30, num_obstacles=20, min_distance=14, expansion=2, seed=0):
+    """
+    随机执行 n_steps 次增加、删除、移动操作，每次与重新建图的结果比较。
+    除随机位置外，也会生成与已有障碍物共享角点的障碍物，检查节点归属的更新。
+    """
+    random.seed(seed)
+    obstacles = obstacle_expansion(generate_obstacles(num_obstacles, min_distance, expansion), expansion)
+    dynamic = DynamicCutGraph(obstacles)
+
+    failures = 0
+    incremental_time = rebuild_time = 0.0
+    for step in range(n_steps):
+        op = random.choice(['add', 'remove', 'update'])
+        if op == 'add' or len(dynamic.obstacles) < 2:
+            op = 'add'
+            box = random_box()
+            if random.random() < 0.3:
+                # 与已有障碍物共享一个角点
+                other = random.choice(dynamic.obstacles)
+                box = (other[3], other[4], 0, other[3] + 40, other[4] + 40, other[5])
+            t = time.perf_counter()
+            dynamic.add_obstacle(box)
+        elif op == 'remove':
+            t = time.perf_counter()
+            dynamic.remove_obstacle(random.randrange(len(dynamic.obstacles)))
+        else:
+            k = random.randrange(len(dynamic.obstacles))
+            x_min, y_min, z_min, x_max, y_max, z_max = dynamic.obstacles[k]
+            dx, dy = random.uniform(-30, 30), random.uniform(-30, 30)
+            t = time.perf_counter()
+            dynamic.update_obstacle(k, (x_min + dx, y_min + dy, z_min, x_max + dx, y_max + dy, z_max))
+        incremental_time += time.perf_counter() - t
+
+        t = time.perf_counter()
+        graph, _ = build_cut_graph(dynamic.obstacles, dynamic.cut_planes)
+        rebuild_time += time.perf_counter() - t
+
+        ok = graphs_equal(dynamic.graph, graph)
+        failures += not ok
+        print(f"step {step}: {op:6s} obstacles={len(dynamic.obstacles)} nodes={graph.num_nodes} "
+              f"edges={graph.num_edges} {'OK' if ok else 'FAIL'}")
+
+    print(f"增量更新 {incremental_time:.3f}s，重新建图 {rebuild_time:.3f}s")
+    print("全部通过" if failures == 0 else f"{failures} 步与重新建图不一致")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    run_random_updates()
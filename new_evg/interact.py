@@ -3,14 +3,15 @@
 '''
 import numpy as np
 from shapely.geometry import LineString, Polygon
+import profiling
 
 def get_obstacle_xy_polygon(obstacle):
     x_min, y_min, _, x_max, y_max, _ = obstacle
     vertices = [
         (x_min, y_min), 
         (x_min, y_max), 
-        (x_max, y_min), 
-        (x_max, y_max)
+        (x_max, y_max), 
+        (x_max, y_min)
     ]
     return Polygon(vertices)
 
@@ -30,6 +31,7 @@ def line_intersects_2d(start, goal, obstacles):
     return intersecting_projections
 
 
+@profiling.timed('line_intersects_box')
 def line_intersects_box(p1, p2, obstacles):
     """
     判断线段是否与任何障碍物（长方体）相交。
@@ -42,70 +44,89 @@ def line_intersects_box(p1, p2, obstacles):
     返回:
         bool: 如果线段与任一障碍物相交，返回 True；否则返回 False。
     """
-    P1, P2 = np.array(p1), np.array(p2)
-    d = P2 - P1  # 线段方向向量
+    return bool(segments_intersect_boxes([p1], [p2], obstacles)[0])
 
-    box_normals = [
-        np.array([1, 0, 0]),
-        np.array([0, 1, 0]),
-        np.array([0, 0, 1])
-    ]
-
-    # 构造分离轴集合
-    axes = [d] + box_normals + [np.cross(d, n) for n in box_normals if np.linalg.norm(np.cross(d, n)) > 1e-6]
-
-    for obstacle in obstacles:
-        box_min = np.array(obstacle[:3]) + 1e-6  # 收缩边界，避免与边界相交
-        box_max = np.array(obstacle[3:6]) - 1e-6
-        box_vertices = get_box_vertices(box_min, box_max)
 
-        # 逐轴检测投影是否重叠
-        if all(projection_overlaps(P1, P2, box_vertices, axis) for axis in axes):
-            # 如果所有分离轴的投影重叠，表示穿过了长方体
-            return True
-
-    return False
-
-def get_box_vertices(box_min, box_max):
+def segments_intersect_boxes(starts, ends, obstacles, max_pairs=1_000_000, index=None):
     """
-    计算长方体的8个顶点。
-    """
-    box_vertices = [
-        [box_min[0], box_min[1], box_min[2]],
-        [box_min[0], box_min[1], box_max[2]],
-        [box_min[0], box_max[1], box_min[2]],
-        [box_min[0], box_max[1], box_max[2]],
-        [box_max[0], box_min[1], box_min[2]],
-        [box_max[0], box_min[1], box_max[2]],
-        [box_max[0], box_max[1], box_min[2]],
-        [box_max[0], box_max[1], box_max[2]]
-    ]
-    return np.array(box_vertices)
+    批量判断线段是否与任一障碍物（长方体）相交，一次向量化完成所有线段与所有障碍物的检测。
 
-def projection_overlaps(P1, P2, box_vertices, axis):
+    参数:
+        starts: array-like (N, 3)，线段起点
+        ends: array-like (N, 3)，线段终点
+        obstacles: array-like (M, 6)，每个障碍物由 (xmin, ymin, zmin, xmax, ymax, zmax) 表示
+        max_pairs: int，每批处理的 (线段, 障碍物) 对数上限，限制中间数组的内存
+        index: ObstacleGrid，基于 obstacles 建立的空间索引；给出时只检测线段经过的网格中的障碍物
+
+    返回:
+        blocked: np.ndarray (N,) bool，线段与任一障碍物相交时为 True
     """
-    检查线段和长方体在某个轴上的投影是否重叠。
+    starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+    obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    blocked = np.zeros(len(starts), dtype=bool)
+    if len(starts) == 0 or len(obstacles) == 0:
+        return blocked
+
+    box_min = obstacles[:, :3] + 1e-6  # 收缩边界，避免与边界相交
+    box_max = obstacles[:, 3:6] - 1e-6
+    profile = profiling.current()
+    profile.count('intersect.segments', len(starts))
+
+    if index is not None:
+        # 只检测空间索引给出的候选 (线段, 障碍物) 对
+        step = max(1, max_pairs // 64)
+        for s in range(0, len(starts), step):
+            seg_ids, obs_ids = index.query_segments(starts[s:s + step], ends[s:s + step])
+            seg_ids += s
+            profile.count('intersect.pairs', len(seg_ids))
+            hits = segment_box_hits(starts[seg_ids], ends[seg_ids], box_min[obs_ids], box_max[obs_ids])
+            blocked[seg_ids[hits]] = True
+        return blocked
+
+    profile.count('intersect.pairs', len(starts) * len(obstacles))
+    step = max(1, max_pairs // len(obstacles))
+    for s in range(0, len(starts), step):
+        hits = segment_box_hits(starts[s:s + step, None, :], ends[s:s + step, None, :],
+                                box_min[None, :, :], box_max[None, :, :])
+        blocked[s:s + step] = hits.any(axis=1)
+
+    return blocked
+
+
+def segment_box_hits(P1, P2, box_min, box_max, strict=True):
     """
-    axis_norm = np.linalg.norm(axis)
-    if axis_norm < 1e-6:  # 避免零向量
-        return True
-
-    axis = axis / axis_norm
+    slab 算法：逐元素判断线段与长方体（2D 时为矩形）是否相交，参数按 NumPy 规则广播。
 
-    # 计算线段的投影范围
-    line_proj = [np.dot(P1, axis), np.dot(P2, axis)]
-    # 计算长方体的投影范围
-    box_proj = [np.dot(vertex, axis) for vertex in box_vertices]
+    strict=True 时只计算穿过内部的情况：线段与长方体的交集只有一个点（擦边、触角）时不算相交，
+    与某一轴平行的线段必须严格位于该轴的 slab 内部；strict=False 时按闭集判断，接触即相交。
 
-    line_min, line_max = min(line_proj), max(line_proj)
-    box_min, box_max = min(box_proj), max(box_proj)
-
-    # 检查投影是否重叠，并确保线段不止交于边界点
-    if line_max < box_min or box_max < line_min:
-        return False  # 投影不重叠，返回 False
+    参数:
+        P1, P2: array (..., D)，线段端点
+        box_min, box_max: array (..., D)，长方体的最小/最大角点
+        strict: bool，是否排除边界接触
 
-    # 如果投影重叠，还需确保线段与长方体的交点不是单点相交
-    return not (line_min == box_min or line_max == box_max)
+    返回:
+        np.ndarray (...) bool
+    """
+    d = P2 - P1
+    parallel = d == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (box_min - P1) / d
+        t2 = (box_max - P1) / d
+    t_low = np.where(parallel, -np.inf, np.minimum(t1, t2))
+    t_high = np.where(parallel, np.inf, np.maximum(t1, t2))
+
+    t_enter = np.maximum(t_low.max(axis=-1), 0.0)
+    t_exit = np.minimum(t_high.min(axis=-1), 1.0)
+
+    if strict:
+        # 平行轴上线段必须落在 slab 内部；进入参数严格小于离开参数，排除单点接触
+        inside = np.all(~parallel | ((box_min < P1) & (P1 < box_max)), axis=-1)
+        return inside & (t_enter < t_exit)
+
+    inside = np.all(~parallel | ((box_min <= P1) & (P1 <= box_max)), axis=-1)
+    return inside & (t_enter <= t_exit)
 
 # 示例输入
 if __name__ == '__main__':
@@ -1,26 +1,21 @@
 import matplotlib.pyplot as plt
-from obstacles import load_obstacles_from_file
-from choose_obs import choosing_obstacles, obstacle_expansion
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 from corner_plot import plot_obstacles_3d
-from build_graph import build_evg_graph
+from graph_cache import cached_evg_graph
 from calculate_search import a_star_search_3d
 
 
-obstacles = load_obstacles_from_file('obstacles40.txt')
-
 start = (0, 0, 2)
 goal = (780, 780, 20)
 expansion = 2
 
-obstacles_final = choosing_obstacles(start, goal, obstacles)
-obstacles_final = obstacle_expansion(obstacles_final, expansion)
-
-nodes, edges = build_evg_graph(obstacles_final, start, goal)
-path = a_star_search_3d(start, goal, nodes, edges)
+# 筛选、扩展障碍物并建立可视图；相同的障碍物文件和参数直接从 graph_cache/ 加载
+obstacles_final, graph = cached_evg_graph('obstacles40.txt', start, goal, expansion)
+path = a_star_search_3d(start, goal, graph)
 print(path)
 
-print("顶点数量:", len(nodes))
-print("边数量:", sum(len(v) for v in edges.values()))
+print("顶点数量:", graph.num_nodes)
+print("边数量:", graph.num_edges)
 
 
 def set_axes_limits(ax, obstacles):
@@ -35,26 +30,20 @@ def set_axes_limits(ax, obstacles):
     ax.set_ylim(start[1] - 50, goal[1] + 50)
     ax.set_zlim(z_min, z_max + 20)
 
-def plot_edges_3d(ax, edges, color='blue', alpha=0.5, linewidth=0.5):
+def plot_edges_3d(ax, graph, color='blue', alpha=0.5, linewidth=0.5):
     """
     在3D图中绘制可视性图的边。
 
     参数:
         ax: matplotlib 3D axes
-        edges: dict, 可视性图的边，格式为 {node: [(neighbor, weight), ...]}
+        graph: VisibilityGraph, 可视图
         color: str, 线条颜色
         alpha: float, 线条透明度
         linewidth: float, 线条宽度
     """
-    for node, neighbors in edges.items():
-        for neighbor, _ in neighbors:
-            # 提取起点和终点
-            x_coords = [node[0], neighbor[0]]
-            y_coords = [node[1], neighbor[1]]
-            z_coords = [node[2], neighbor[2]]
-
-            # 绘制连线
-            ax.plot(x_coords, y_coords, z_coords, color=color, alpha=alpha, linewidth=linewidth)
+    # 所有边作为一个线段集合一次绘制
+    lines = Line3DCollection(graph.segments(), colors=color, alpha=alpha, linewidths=linewidth)
+    ax.add_collection3d(lines)
 
 
 def plot_path_3d(ax, path, color='red', linewidth=2, label='Optimal Path'):
@@ -83,7 +72,7 @@ ax = fig.add_subplot(111, projection='3d')
 plot_obstacles_3d(ax, obstacles_final)
 
 # 绘制可视性图的边
-plot_edges_3d(ax, edges, color='blue', alpha=0.7, linewidth=0.7)
+plot_edges_3d(ax, graph, color='blue', alpha=0.7, linewidth=0.7)
 
 plot_path_3d(ax, path, color='red', linewidth=2, label='Optimal Path')
 
@@ -1,6 +1,11 @@
 import random
 import math
+import itertools
+import json
+import struct
+import numpy as np
 from corner_plot import plot_obstacles_3d
+from spatial_index import grouped_arange
 import matplotlib.pyplot as plt
 
 total_length = 720
@@ -26,16 +31,25 @@ def distance_between_boxes(box1, box2):
     
     return math.sqrt(dist_x**2 + dist_y**2 + dist_z**2)
 
-def generate_obstacles(num_obstacles, min_distance, expansion_value):
+def generate_obstacles(num_obstacles, min_distance, expansion_value, seed=None, length=None):
+    """
+    随机生成 num_obstacles 个障碍物，任意两个障碍物之间的距离不小于 min_distance。
+
+    参数:
+        seed: int，随机数种子；给出时使用独立的随机数生成器，结果可复现且不改变全局 random 的状态
+        length: float，障碍物 x_min、y_min 的取值范围 [0, length]，默认 total_length
+    """
+    rng = random if seed is None else random.Random(seed)
+    length = total_length if length is None else length
     obstacles = []
     
     while len(obstacles) < num_obstacles:
-        x_min = round(random.uniform(0, total_length), 1)
-        y_min = round(random.uniform(0, total_length), 1)
+        x_min = round(rng.uniform(0, length), 1)
+        y_min = round(rng.uniform(0, length), 1)
         z_min = 0
-        x_max = round(x_min + random.uniform(ob_length_low, ob_length_high), 1)
-        y_max = round(y_min + random.uniform(ob_length_low, ob_length_high), 1)
-        z_max = round(z_min + random.uniform(10, 50), 1)
+        x_max = round(x_min + rng.uniform(ob_length_low, ob_length_high), 1)
+        y_max = round(y_min + rng.uniform(ob_length_low, ob_length_high), 1)
+        z_max = round(z_min + rng.uniform(10, 50), 1)
         
         new_obstacle = (x_min, y_min, z_min, x_max, y_max, z_max)
         
@@ -50,6 +64,178 @@ def generate_obstacles(num_obstacles, min_distance, expansion_value):
     
     return obstacles
 
+# generate_obstacles_fast 默认允许的最大填充率（见 obstacle_density）
+MAX_DENSITY = 0.65
+
+
+def obstacle_density(num_obstacles, min_distance, length=None):
+    """
+    估计在 [0, length] 范围内放置 num_obstacles 个、两两间距不小于 min_distance 的障碍物时的填充率：
+    每个障碍物在 xy 平面上按平均边长加间距占用面积，与可放置区域面积之比。
+    随机依次放置时，填充率越高接受率越低，超过约 0.75 后基本无法放满。
+
+    参数:
+        num_obstacles: int，障碍物数量
+        min_distance: float，最小间距
+        length: float，x_min、y_min 的取值范围，默认 total_length
+
+    返回:
+        float
+    """
+    length = total_length if length is None else length
+    spacing = max(min_distance, 0)
+    side = (ob_length_low + ob_length_high) / 2 + spacing
+    return num_obstacles * side**2 / (length + ob_length_high + spacing)**2
+
+
+def generate_obstacles_fast(num_obstacles, min_distance, seed=None, length=None, max_density=MAX_DENSITY,
+                            max_attempts=None, batch_size=1024):
+    """
+    generate_obstacles 的向量化版本，尺寸分布与间距规则（distance_between_boxes）相同：
+    按批用 NumPy 生成候选障碍物，已接受的障碍物按 x_min、y_min 存入均匀网格，
+    候选只与相邻 3×3 格中的障碍物比较；同一批中相互冲突的候选按生成顺序只保留先出现的。
+
+    参数:
+        num_obstacles: int，障碍物数量
+        min_distance: float，任意两个障碍物之间的最小距离，必须大于 0（网格每格的容量由此确定）
+        seed: int，随机数种子
+        length: float，x_min、y_min 的取值范围 [0, length]，默认 total_length
+        max_density: float，obstacle_density 的上限，超过时不生成直接报错；None 表示不检查
+        max_attempts: int，候选障碍物总数的上限，默认 max(100 * num_obstacles, 100000)
+        batch_size: int，每批候选数的下限
+
+    返回:
+        np.ndarray (num_obstacles, 6)
+
+    异常:
+        ValueError: min_distance <= 0，估计填充率超过 max_density，或生成 max_attempts 个候选后仍未放满
+    """
+    if min_distance <= 0:
+        # 间距不为正时障碍物可以重叠，同一格中的障碍物数没有上限；这种情况请使用 generate_obstacles
+        raise ValueError(f"min_distance 必须大于 0，当前为 {min_distance}")
+    length = total_length if length is None else float(length)
+    density = obstacle_density(num_obstacles, min_distance, length)
+    if max_density is not None and density > max_density:
+        raise ValueError(f"{num_obstacles} 个障碍物在边长 {length:g} 的区域内的填充率约为 {density:.3f}，"
+                         f"超过上限 {max_density}，请增大 length 或减小 min_distance")
+    if max_attempts is None:
+        max_attempts = max(100 * num_obstacles, 100000)
+
+    rng = np.random.default_rng(seed)
+    spacing = float(min_distance)
+    # 相互冲突的两个障碍物 x_min（y_min）之差小于最大边长加间距，只可能在相邻格中
+    cell = ob_length_high + spacing
+    n_cells = int(length // cell) + 1
+    # 同一格中的障碍物至少在一个方向上相距 ob_length_low + spacing / sqrt(2)，由此得到每格的容量
+    capacity = (int(cell // (ob_length_low + spacing / math.sqrt(2))) + 1)**2
+    grid = np.full((n_cells + 3, n_cells + 3, capacity), -1, dtype=np.int64)
+    counts = np.zeros((n_cells + 3, n_cells + 3), dtype=np.int64)
+
+    boxes = np.empty((num_obstacles, 6))
+    placed = attempts = 0
+    while placed < num_obstacles:
+        if attempts >= max_attempts:
+            raise ValueError(f"生成 {attempts} 个候选后只放置了 {placed}/{num_obstacles} 个障碍物"
+                             f"（估计填充率 {density:.3f}），请增大 length、减小 min_distance 或增大 max_attempts")
+        k = min(max(batch_size, 2 * (num_obstacles - placed)), max_attempts - attempts)
+        attempts += k
+        candidates = _sample_boxes(rng, k, length)
+        cx = (candidates[:, 0] // cell).astype(np.int64) + 1
+        cy = (candidates[:, 1] // cell).astype(np.int64) + 1
+
+        # 1. 与已接受障碍物的冲突
+        ok = np.ones(k, dtype=bool)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                rows, slots = np.nonzero(grid[cx + dx, cy + dy] >= 0)
+                if len(rows):
+                    others = grid[cx[rows] + dx, cy[rows] + dy, slots]
+                    ok[rows[box_gaps(candidates[rows], boxes[others]) < min_distance]] = False
+        candidates, cx, cy = candidates[ok], cx[ok], cy[ok]
+
+        # 2. 同一批候选之间的冲突：按生成顺序，与已保留的候选冲突的丢弃
+        keep = _first_compatible(candidates, cx, cy, min_distance)
+        candidates, cx, cy = candidates[keep][:num_obstacles - placed], cx[keep], cy[keep]
+        cx, cy = cx[:len(candidates)], cy[:len(candidates)]
+
+        # 3. 加入网格：同一格中的新障碍物依次占用空位
+        ids = np.arange(placed, placed + len(candidates))
+        boxes[ids] = candidates
+        key = cx * grid.shape[1] + cy
+        order = np.argsort(key, kind='stable')
+        _, group_counts = np.unique(key[order], return_counts=True)
+        rank = np.empty(len(ids), dtype=np.int64)
+        rank[order] = grouped_arange(group_counts)
+        grid[cx, cy, counts[cx, cy] + rank] = ids
+        np.add.at(counts, (cx, cy), 1)
+        placed += len(ids)
+
+    return boxes
+
+
+def box_gaps(A, B):
+    """
+    逐行计算长方体 A[i] 与 B[i] 之间的距离（与 distance_between_boxes 相同，重叠时为 0）。
+
+    参数:
+        A, B: np.ndarray (N, 6)
+
+    返回:
+        np.ndarray (N,)
+    """
+    gap = np.maximum(np.maximum(A[:, :3], B[:, :3]) - np.minimum(A[:, 3:], B[:, 3:]), 0)
+    return np.sqrt((gap**2).sum(axis=1))
+
+
+def _sample_boxes(rng, k, length):
+    """
+    生成 k 个候选障碍物，分布与 generate_obstacles 相同（坐标保留一位小数）。
+    """
+    x_min = np.round(rng.uniform(0, length, k), 1)
+    y_min = np.round(rng.uniform(0, length, k), 1)
+    x_max = np.round(x_min + rng.uniform(ob_length_low, ob_length_high, k), 1)
+    y_max = np.round(y_min + rng.uniform(ob_length_low, ob_length_high, k), 1)
+    z_max = np.round(rng.uniform(10, 50, k), 1)
+    return np.stack([x_min, y_min, np.zeros(k), x_max, y_max, z_max], axis=1)
+
+
+def _first_compatible(candidates, cx, cy, min_distance):
+    """
+    同一批候选之间的冲突检查：按顺序保留与之前保留的候选都不冲突的候选，返回保留标记。
+    """
+    m = len(candidates)
+    keep = np.ones(m, dtype=bool)
+    if m < 2:
+        return keep
+
+    # 按格排序后，用 searchsorted 找出相邻格中的候选对 (i, j)，i < j
+    width = int(cy.max()) + 2
+    key = cx * width + cy
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    pair_i, pair_j = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = key + dx * width + dy
+            lo = np.searchsorted(sorted_key, target, side='left')
+            hi = np.searchsorted(sorted_key, target, side='right')
+            i = np.repeat(np.arange(m), hi - lo)
+            j = order[np.repeat(lo, hi - lo) + grouped_arange(hi - lo)]
+            earlier = i < j
+            pair_i.append(i[earlier])
+            pair_j.append(j[earlier])
+    i, j = np.concatenate(pair_i), np.concatenate(pair_j)
+    conflict = box_gaps(candidates[i], candidates[j]) < min_distance
+    i, j = i[conflict], j[conflict]
+
+    # 冲突对很少，按 j 的顺序逐个处理
+    order = np.lexsort((i, j))
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        if keep[a]:
+            keep[b] = False
+    return keep
+
+
 def save_obstacles_to_file(obstacles, filename):
     with open(filename, 'w') as f:
         for obs in obstacles:
@@ -63,6 +249,150 @@ def load_obstacles_from_file(filename):
             obstacles.append(tuple(map(float, line.strip().split())))
     return obstacles
 
+
+# 二进制障碍物文件：
+#   文件头 32 字节（小端）：magic(8s) 版本(uint16) 浮点字节数(uint16，4 或 8) 标志(uint32，bit0 表示有编号)
+#                           障碍物数 M(uint64) 元数据长度(uint64)
+#   之后为 UTF-8 编码的 JSON 元数据，补齐到 64 字节边界；
+#   数据区为连续的 (M, 6) 浮点数组，有编号时其后紧跟 (M,) int64 编号。
+OBSTACLE_MAGIC = b'EVGOBS\x00\x00'
+OBSTACLE_VERSION = 1
+_HEADER = struct.Struct('<8sHHIQQ')
+_HAS_IDS = 1
+
+
+def _data_offset(meta_len):
+    return -(-(_HEADER.size + meta_len) // 64) * 64
+
+
+def _write_header(f, count, itemsize, has_ids, meta_bytes):
+    f.seek(0)
+    f.write(_HEADER.pack(OBSTACLE_MAGIC, OBSTACLE_VERSION, itemsize, _HAS_IDS if has_ids else 0,
+                         count, len(meta_bytes)))
+    f.write(meta_bytes)
+    f.write(b'\x00' * (_data_offset(len(meta_bytes)) - _HEADER.size - len(meta_bytes)))
+
+
+def read_obstacles_header(filename):
+    """
+    读取二进制障碍物文件的文件头。
+
+    返回:
+        dict: count 障碍物数，dtype 浮点类型，has_ids 是否有编号，meta 元数据，offset 数据区偏移
+    """
+    with open(filename, 'rb') as f:
+        raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size or raw[:8] != OBSTACLE_MAGIC:
+            raise ValueError(f"{filename} 不是二进制障碍物文件")
+        _, version, itemsize, flags, count, meta_len = _HEADER.unpack(raw)
+        if version != OBSTACLE_VERSION or itemsize not in (4, 8):
+            raise ValueError(f"{filename} 的格式版本 {version} 或浮点字节数 {itemsize} 不受支持")
+        meta = json.loads(f.read(meta_len).decode()) if meta_len else {}
+    return {
+        'count': count,
+        'dtype': np.dtype('<f4' if itemsize == 4 else '<f8'),
+        'has_ids': bool(flags & _HAS_IDS),
+        'meta': meta,
+        'offset': _data_offset(meta_len),
+    }
+
+
+def is_binary_obstacle_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read(8) == OBSTACLE_MAGIC
+
+
+def save_obstacles_binary(obstacles, filename, dtype=np.float64, ids=None, meta=None):
+    """
+    将障碍物保存为二进制文件。
+
+    参数:
+        obstacles: array-like (M, 6)，障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        filename: str，文件名
+        dtype: np.float32 或 np.float64，数据区的浮点类型
+        ids: array-like (M,)，可选的障碍物编号（如建筑物编号）
+        meta: dict，可选的元数据，以 JSON 保存
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    boxes = np.ascontiguousarray(np.asarray(obstacles, dtype=dtype).reshape(-1, 6))
+    meta_bytes = json.dumps(meta or {}).encode()
+    with open(filename, 'wb') as f:
+        _write_header(f, len(boxes), dtype.itemsize, ids is not None, meta_bytes)
+        f.write(boxes.tobytes())
+        if ids is not None:
+            f.write(np.ascontiguousarray(np.asarray(ids, dtype='<i8').reshape(len(boxes))).tobytes())
+
+
+def load_obstacles_binary(filename, mmap=True):
+    """
+    读取二进制障碍物文件。mmap=True 时用 np.memmap 只读映射数据区，不复制数据。
+
+    返回:
+        obstacles: np.ndarray (M, 6)
+        ids: np.ndarray (M,) 或 None
+        meta: dict，元数据
+    """
+    header = read_obstacles_header(filename)
+    count, dtype, offset = header['count'], header['dtype'], header['offset']
+    ids_offset = offset + count * 6 * dtype.itemsize
+
+    # np.memmap 不能映射长度为 0 的区域，空文件按普通方式读取
+    if mmap and count:
+        obstacles = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count, 6))
+        ids = None
+        if header['has_ids']:
+            ids = np.memmap(filename, dtype='<i8', mode='r', offset=ids_offset, shape=(count,))
+        return obstacles, ids, header['meta']
+
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        obstacles = np.fromfile(f, dtype=dtype, count=count * 6).reshape(count, 6)
+        ids = np.fromfile(f, dtype='<i8', count=count) if header['has_ids'] else None
+    return obstacles, ids, header['meta']
+
+
+def iter_obstacle_chunks(filename, chunk_size=65536, dtype=np.float64):
+    """
+    分块读取文本格式的障碍物文件，每次返回最多 chunk_size 行组成的 (k, 6) 数组，内存占用与文件大小无关。
+    """
+    with open(filename, 'r') as f:
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            chunk = np.loadtxt(lines, dtype=dtype, ndmin=2)
+            if chunk.size:
+                yield chunk.reshape(-1, 6)
+
+
+def convert_text_to_binary(text_file, binary_file, dtype=np.float64, meta=None, chunk_size=65536):
+    """
+    将文本格式的障碍物文件逐块转换为二进制文件，障碍物数在写完后回填到文件头。
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    meta_bytes = json.dumps(meta or {}).encode()
+    count = 0
+    with open(binary_file, 'wb') as f:
+        _write_header(f, 0, dtype.itemsize, False, meta_bytes)
+        for chunk in iter_obstacle_chunks(text_file, chunk_size):
+            f.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+            count += len(chunk)
+        _write_header(f, count, dtype.itemsize, False, meta_bytes)
+    return count
+
+
+def load_obstacles_array(filename, mmap=True):
+    """
+    读取障碍物文件为 (M, 6) 数组：二进制文件直接映射，文本文件分块解析。
+
+    返回:
+        np.ndarray (M, 6)
+    """
+    if is_binary_obstacle_file(filename):
+        return load_obstacles_binary(filename, mmap)[0]
+    chunks = list(iter_obstacle_chunks(filename))
+    return np.concatenate(chunks) if chunks else np.zeros((0, 6))
+
 # 生成或加载障碍物
 if __name__ == '__main__':
     filename = 'obstacles40.txt'
@@ -0,0 +1,195 @@
+'''
+    本文件实现了路径后处理：A* 得到的路径由角点组成，高度只能取切割平面上的值，
+    高度变化呈阶梯状，爬升航段的能耗较高。后处理分两步，所有碰撞检测都用 segments_intersect_boxes 批量完成：
+    - shortcut_path：删除多余的航点。路径上任意两个航点之间的线段一次检测完，
+      再用动态规划（能耗最小）或贪心（每次跳到最远的可见航点）选出保留的航点；
+    - smooth_altitudes：在切割平面之间连续调整每个中间航点的高度。奇数、偶数位置的航点交替更新，
+      同一组航点的所有候选高度一次完成代价计算和碰撞检测。
+    smooth_path 依次执行两步，并返回能耗节省量。能耗按飞行方向由 UAVModel.costs 计算。
+'''
+import numpy as np
+from build_graph import load, vel
+from calculate_search import get_uav_model
+from interact import segments_intersect_boxes
+from spatial_index import ObstacleGrid
+
+
+def path_energy(path, load=load, vel=vel):
+    """
+    按飞行方向计算路径的总能耗代价。
+
+    参数:
+        path: list of tuple 或 np.ndarray (L, 3)，路径节点
+        load, vel: 载重和速度，与建图时一致
+
+    返回:
+        float
+    """
+    P = np.asarray(path, dtype=float).reshape(-1, 3)
+    return float(get_uav_model(load, vel).costs(P[:-1], P[1:]).sum())
+
+
+def shortcut_path(path, obstacles, index=None, method='dp', load=load, vel=vel):
+    """
+    删除路径中多余的航点：保留的相邻航点之间的线段不与任何障碍物相交。
+
+    参数:
+        path: list of tuple，路径节点
+        obstacles: array-like (M, 6)，（扩展后的）障碍物
+        index: ObstacleGrid，基于 obstacles 建立的空间索引，默认新建
+        method: str，'dp' 在所有可行的捷径中选能耗最小的航点序列（不会比原路径差）；
+                'greedy' 从起点开始每次跳到最远的可见航点，航点最少，但能耗不一定最小
+        load, vel: 载重和速度
+
+    返回:
+        list of tuple，新的路径
+    """
+    P = np.asarray(path, dtype=float).reshape(-1, 3)
+    n = len(P)
+    if n < 3:
+        return [tuple(p) for p in P.tolist()]
+    if index is None:
+        index = ObstacleGrid(obstacles)
+
+    # 所有航点对 (i < j) 一次检测；原路径上相邻航点之间总是可行的
+    i, j = np.triu_indices(n, k=1)
+    feasible = np.zeros((n, n), dtype=bool)
+    feasible[i, j] = ~segments_intersect_boxes(P[i], P[j], obstacles, index=index)
+    feasible[np.arange(n - 1), np.arange(1, n)] = True
+
+    if method == 'greedy':
+        keep = [0]
+        while keep[-1] < n - 1:
+            keep.append(int(np.flatnonzero(feasible[keep[-1]])[-1]))
+    elif method == 'dp':
+        cost = np.full((n, n), np.inf)
+        cost[i, j] = get_uav_model(load, vel).costs(P[i], P[j])
+        cost[~feasible] = np.inf
+        best = np.full(n, np.inf)
+        best[0] = 0.0
+        parent = np.zeros(n, dtype=np.int64)
+        for k in range(1, n):
+            total = best[:k] + cost[:k, k]
+            parent[k] = np.argmin(total)
+            best[k] = total[parent[k]]
+        keep = [n - 1]
+        while keep[-1] != 0:
+            keep.append(int(parent[keep[-1]]))
+        keep.reverse()
+    else:
+        raise ValueError(f"未知的捷径方法: {method}")
+
+    return [tuple(p) for p in P[keep].tolist()]
+
+
+def smooth_altitudes(path, obstacles, index=None, z_range=None, samples=17, resolution=0.01, max_rounds=100,
+                     load=load, vel=vel):
+    """
+    连续调整中间航点的高度（水平位置不变），使路径能耗下降且不与障碍物相交。
+
+    每一轮中奇数、偶数位置的航点交替更新：固定相邻航点，在 z_range 内的均匀网格与当前高度附近的细网格中
+    选出能耗最小且两侧航段都可行的高度。没有航点得到改进时细网格的范围减半，范围小于 resolution 时结束。
+
+    参数:
+        path: list of tuple，路径节点
+        obstacles: array-like (M, 6)，（扩展后的）障碍物
+        index: ObstacleGrid，基于 obstacles 建立的空间索引，默认新建
+        z_range: tuple，航点高度的范围 (z_low, z_high)，默认为原路径的最低、最高高度
+        samples: int，均匀网格与细网格的采样数
+        resolution: float，细网格范围的下限
+        max_rounds: int，最多更新的轮数
+        load, vel: 载重和速度
+
+    返回:
+        list of tuple，新的路径
+    """
+    P = np.asarray(path, dtype=float).reshape(-1, 3).copy()
+    if len(P) < 3:
+        return [tuple(p) for p in P.tolist()]
+    if index is None:
+        index = ObstacleGrid(obstacles)
+    z_low, z_high = (P[:, 2].min(), P[:, 2].max()) if z_range is None else z_range
+    if z_high <= z_low:
+        return [tuple(p) for p in P.tolist()]
+
+    model = get_uav_model(load, vel)
+    grid = np.linspace(z_low, z_high, samples)
+    offsets = np.linspace(-1, 1, samples)
+    span = (z_high - z_low) / (samples - 1)
+
+    for _ in range(max_rounds):
+        if span < resolution:
+            break
+        improved = False
+        for first in (1, 2):
+            ks = np.arange(first, len(P) - 1, 2)
+            if len(ks) == 0:
+                continue
+            # 候选高度：当前高度、均匀网格、当前高度附近的细网格
+            z = np.concatenate([P[ks, 2:3], np.broadcast_to(grid, (len(ks), samples)),
+                                P[ks, 2:3] + span * offsets], axis=1)
+            z = np.clip(z, z_low, z_high)
+            m, c = z.shape
+            Q = np.repeat(P[ks], c, axis=0)
+            Q[:, 2] = z.ravel()
+            A = np.repeat(P[ks - 1], c, axis=0)
+            B = np.repeat(P[ks + 1], c, axis=0)
+
+            cost = (model.costs(A, Q) + model.costs(Q, B)).reshape(m, c)
+            blocked = segments_intersect_boxes(np.concatenate([A, Q]), np.concatenate([Q, B]), obstacles, index=index)
+            blocked = (blocked[:m * c] | blocked[m * c:]).reshape(m, c)
+            blocked[:, 0] = False  # 当前高度总是保留
+            cost[blocked] = np.inf
+
+            choice = np.argmin(cost, axis=1)
+            better = cost[np.arange(m), choice] < cost[:, 0] * (1 - 1e-12)
+            if better.any():
+                improved = True
+                P[ks[better], 2] = z[better, choice[better]]
+        if not improved:
+            span /= 2
+
+    return [tuple(p) for p in P.tolist()]
+
+
+def smooth_path(path, obstacles, index=None, method='dp', altitude=True, z_range=None, load=load, vel=vel):
+    """
+    路径后处理：捷径、调整高度，高度改变后可能出现新的捷径，因此最后再做一次捷径。
+
+    参数:
+        path: list of tuple，路径节点
+        obstacles: array-like (M, 6)，（扩展后的）障碍物
+        index: ObstacleGrid，基于 obstacles 建立的空间索引，默认新建
+        method: str，捷径方法，见 shortcut_path
+        altitude: bool，是否调整航点高度
+        z_range: tuple，航点高度的范围，见 smooth_altitudes
+        load, vel: 载重和速度
+
+    返回:
+        path: list of tuple，新的路径
+        report: dict，energy_before / energy_after 前后能耗，saved 节省的能耗，saved_ratio 节省比例，
+                waypoints_before / waypoints_after 前后航点数
+
+    示例:
+        path = a_star_search_3d(start, goal, graph)
+        path, report = smooth_path(path, obstacles_final)
+    """
+    obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    if index is None:
+        index = ObstacleGrid(obstacles)
+
+    smoothed = shortcut_path(path, obstacles, index, method, load, vel)
+    if altitude:
+        smoothed = smooth_altitudes(smoothed, obstacles, index, z_range, load=load, vel=vel)
+        smoothed = shortcut_path(smoothed, obstacles, index, method, load, vel)
+
+    before, after = path_energy(path, load, vel), path_energy(smoothed, load, vel)
+    report = {
+        'energy_before': before,
+        'energy_after': after,
+        'saved': before - after,
+        'saved_ratio': (before - after) / before if before > 0 else 0.0,
+        'waypoints_before': len(path),
+        'waypoints_after': len(smoothed),
+    }
+    return smoothed, report
@@ -0,0 +1,373 @@
+'''
+    本文件实现了多次查询的路径规划器 Planner：同一组障碍物上的 cut_node 可视图只建一次，
+    并按 (障碍物, 扩展量, 切割平面) 缓存；每次查询只插入起点和终点、连接到 cut_nodes，
+    搜索结束后再移除，单次查询的代价与节点数 N 成正比，而不是 N²。
+    对反复使用的终点（如同一个降落点），可以缓存反向 Dijkstra 得到的剩余代价表作为精确启发函数。
+    临时禁飞区可以通过 add_obstacle / remove_obstacle / update_obstacle 增量更新可视图（见 dynamic_graph）。
+    单次查询可以用 plan_adaptive：从起点、终点之间的窄走廊开始建图，只在需要时逐步加入障碍物。
+    多个点两两之间的代价矩阵用 cost_matrix：所有点插入同一张图，每个点做一次单源 Dijkstra。
+    分析单次规划的耗时用 profile_plan：开启 profiling 运行一次完整流程，返回各阶段的计时与计数。
+'''
+import hashlib
+import numpy as np
+import profiling
+from choose_obs import choosing_obstacles, convex_hull_2d, hull_overlaps_rects, obstacle_expansion, select_corridor
+from build_graph import build_cut_graph, build_evg_graph, connect_terminal, define_cut_planes
+from calculate_search import a_star_search_3d, cost_to_go, dijkstra_csr
+from dynamic_graph import DynamicCutGraph
+from graph_cache import CACHE_DIR, cached_cut_graph
+from interact import segment_box_hits, segments_intersect_boxes
+from spatial_index import ObstacleGrid
+from visibility_graph import VisibilityGraph
+
+# {(障碍物, 扩展量, 切割平面): (graph, checker)}
+_cut_graph_cache = {}
+
+
+def get_cut_graph(obstacles, expansion, cut_planes=None, workers=None):
+    """
+    返回扩展后障碍物的 cut_node 可视图，相同参数只构建一次。
+
+    参数:
+        obstacles: list of tuple 或 np.ndarray (M, 6)，原始障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        expansion: float，障碍物扩展值
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        workers: int，首次构建时并行计算可视性边的进程数
+
+    返回:
+        obstacles_expanded: list of tuple，扩展后的障碍物
+        graph: VisibilityGraph，cut_node 可视图
+        checker: VisibilityChecker，连接起点、终点时使用
+    """
+    obstacles_expanded = obstacle_expansion(obstacles, expansion)
+    if cut_planes is None:
+        cut_planes = define_cut_planes(obstacles_expanded)
+
+    boxes = np.ascontiguousarray(np.asarray(obstacles, dtype=float).reshape(-1, 6))
+    key = (hashlib.sha256(boxes.tobytes()).hexdigest(), float(expansion), tuple(float(z) for z in cut_planes))
+    if key not in _cut_graph_cache:
+        _cut_graph_cache[key] = build_cut_graph(obstacles_expanded, cut_planes, workers=workers)
+
+    graph, checker = _cut_graph_cache[key]
+    return obstacles_expanded, graph, checker
+
+
+class Planner:
+    """
+    在同一组障碍物上反复规划路径。
+
+    参数:
+        obstacles: list of tuple，原始障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        expansion: float，障碍物扩展值
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        workers: int，首次构建可视图时的并行进程数
+        dynamic: bool，是否在构造时就建立 DynamicCutGraph（包括不可见节点对的记录），
+                 之后的第一次 add/remove/update_obstacle 也只做增量检测；默认在第一次更新时建立
+
+    示例:
+        planner = Planner.from_file('obstacles40.txt', expansion=2)
+        for start, goal in missions:
+            path = planner.plan(start, goal)
+    """
+
+    def __init__(self, obstacles, expansion=2, cut_planes=None, workers=None, dynamic=False):
+        self._setup(expansion, cut_planes, dynamic, *get_cut_graph(obstacles, expansion, cut_planes, workers))
+
+    @classmethod
+    def from_file(cls, filename, expansion=2, cut_planes=None, workers=None, cache_dir=CACHE_DIR, dynamic=False):
+        """
+        从障碍物文件创建 Planner，可视图保存在磁盘缓存中（见 graph_cache），重启后直接映射加载。
+        """
+        planner = cls.__new__(cls)
+        planner._setup(expansion, cut_planes, dynamic,
+                       *cached_cut_graph(filename, expansion, cut_planes, workers, cache_dir))
+        return planner
+
+    def _setup(self, expansion, cut_planes, dynamic, obstacles, graph, checker):
+        self.expansion = expansion
+        self.obstacles, self.graph, self.checker = obstacles, graph, checker
+        self.cut_planes = define_cut_planes(self.obstacles) if cut_planes is None else list(cut_planes)
+        # {终点: cut_nodes 到终点的剩余代价}
+        self._goal_tables = {}
+        # 第一次增量更新时（dynamic=True 时在此）创建，更新后的可视图不再与缓存共用
+        self._dynamic = DynamicCutGraph(self.obstacles, self.cut_planes, graph, checker) if dynamic else None
+
+    def _update(self, method, *args):
+        if self._dynamic is None:
+            self._dynamic = DynamicCutGraph(self.obstacles, self.cut_planes, self.graph, self.checker)
+        result = getattr(self._dynamic, method)(*args)
+        self.obstacles = self._dynamic.obstacles
+        self.graph, self.checker = self._dynamic.graph, self._dynamic.checker
+        self._goal_tables = {}
+        return result
+
+    def add_obstacle(self, obstacle):
+        """
+        增加一个（未扩展的）障碍物，返回其编号。
+        """
+        return self._update('add_obstacle', obstacle_expansion([obstacle], self.expansion)[0])
+
+    def remove_obstacle(self, k):
+        """
+        删除编号为 k 的障碍物。
+        """
+        self._update('remove_obstacle', k)
+
+    def update_obstacle(self, k, obstacle):
+        """
+        将编号为 k 的障碍物替换为 obstacle（未扩展），编号不变。
+        """
+        self._update('update_obstacle', k, obstacle_expansion([obstacle], self.expansion)[0])
+
+    def goal_table(self, goal):
+        """
+        返回每个 cut_node 到 goal 的真实剩余代价（反向 Dijkstra），同一终点只计算一次。
+
+        参数:
+            goal: tuple，终点 (x, y, z)
+
+        返回:
+            np.ndarray (N,)，按 cut_node 编号排列，不可达为 inf
+        """
+        goal = tuple(float(c) for c in goal)
+        if goal not in self._goal_tables:
+            connect_terminal(self.graph, self.checker, goal)
+            try:
+                self._goal_tables[goal] = cost_to_go(self.graph, goal)[:self.graph.num_base_nodes]
+            finally:
+                self.graph.detach()
+        return self._goal_tables[goal]
+
+    def plan(self, start, goal, search=a_star_search_3d, exact_heuristic=False):
+        """
+        规划一条从 start 到 goal 的路径。
+
+        参数:
+            start: tuple，起点 (x, y, z)
+            goal: tuple，终点 (x, y, z)
+            search: callable，search(start, goal, graph) 形式的搜索函数
+            exact_heuristic: bool，为 True 时以 goal_table 作为启发函数传给 search（关键字参数 heuristic），
+                             适用于多次飞往同一终点的任务
+
+        返回:
+            path: list of tuple，路径节点；不可达时返回 None
+        """
+        table = self.goal_table(goal) if exact_heuristic else None
+        s = connect_terminal(self.graph, self.checker, start)
+        g = connect_terminal(self.graph, self.checker, goal)
+        try:
+            if table is None:
+                return search(start, goal, self.graph)
+
+            # 起点的剩余代价由它与 cut_nodes 的连接给出；终点为 0
+            heuristic = np.concatenate([table, [np.inf, 0.0]])
+            neighbors, weights = self.graph.neighbors(s)
+            heuristic[s] = np.min(weights + heuristic[neighbors], initial=np.inf)
+            return search(start, goal, self.graph, heuristic=heuristic)
+        finally:
+            self.graph.detach()
+
+    def cost_matrix(self, points):
+        """
+        计算 points 两两之间的最小代价矩阵：所有点一次插入同一张可视图，每个点只做一次单源 Dijkstra，
+        目标点的代价全部确定后立即停止。可视图是无向图，从第 a 个点出发时只需确定其后的点，矩阵对称。
+        与 plan 一致，给定点只与 cut_nodes 相连、不作为中间节点，costs[a, b] 等于 plan 所得路径的代价。
+
+        参数:
+            points: list of tuple，K 个点 (x, y, z)，例如仓库与配送点
+
+        返回:
+            costs: np.ndarray (K, K)，不可达为 inf，对角线为 0
+            paths: PathTable，paths[a, b] 为第 a 个点到第 b 个点的路径，取用时才回溯
+        """
+        points = [tuple(float(c) for c in p) for p in points]
+        n, k = self.graph.num_base_nodes, len(points)
+        try:
+            for point in points:
+                connect_terminal(self.graph, self.checker, point)
+            i, j, w = self.graph.edge_pairs()
+            graph = VisibilityGraph.from_pairs(self.graph.coords, i, j, w, self.graph.model)
+        finally:
+            self.graph.detach()
+
+        transit = np.arange(n + k) < n
+        costs = np.zeros((k, k))
+        preds = np.full((k, n + k), -1, dtype=np.int64)
+        for a in range(k - 1):
+            dist, preds[a] = dijkstra_csr(graph.indptr, graph.indices, graph.weights, n + a,
+                                          targets=np.arange(n + a + 1, n + k), transit=transit)
+            costs[a, a + 1:] = costs[a + 1:, a] = dist[n + a + 1:]
+        return costs, PathTable(graph.coords, preds, n)
+
+
+class PathTable:
+    """
+    Planner.cost_matrix 返回的路径表：只保存每次 Dijkstra 的父节点数组，paths[a, b] 时才回溯路径。
+    第 a 个点的搜索树包含到其后所有点的路径，paths[b, a] 由 paths[a, b] 反向得到。
+
+    参数:
+        coords: np.ndarray (N + K, 3)，节点坐标，给定点排在最后
+        preds: np.ndarray (K, N + K)，第 a 行为从第 a 个点出发的最短路径树的父节点
+        offset: int，第 0 个给定点的节点编号 N
+    """
+
+    def __init__(self, coords, preds, offset):
+        self.coords = coords
+        self.preds = preds
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.preds)
+
+    def __getitem__(self, key):
+        a, b = key
+        if a > b:
+            path = self[b, a]
+            return None if path is None else path[::-1]
+
+        source, node = self.offset + a, self.offset + b
+        path = [node]
+        while node != source:
+            node = int(self.preds[a, node])
+            if node < 0:
+                return None
+            path.append(node)
+        return [tuple(p) for p in self.coords[path[::-1]].tolist()]
+
+
+def plan_adaptive(start, goal, obstacles, margin=None, search=a_star_search_3d, cut_planes=None):
+    """
+    自适应走廊规划：先只用 select_corridor 选出的障碍物建图并搜索，再按搜索结果逐步扩大走廊，
+    新加入的障碍物通过 DynamicCutGraph 增量加入已建好的图。起点与终点之间的线段不与任何障碍物相交时
+    直接返回 [start, goal]，不建图。
+    - 找到路径时，检查路径附近（距离不超过 margin）是否有走廊外的障碍物，有则加入后重新搜索；
+      没有时路径与所有障碍物都不相交，返回该路径。
+    - 搜索失败时，将走廊（已选障碍物投影与起点、终点的凸包）向外放宽 margin，加入其中的障碍物，
+      并将 margin 加倍；没有新障碍物可加时加入全部障碍物。
+    走廊最终包含全部障碍物时结果与整张图上的搜索相同，因此只要整张图上有路径就一定能找到。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        obstacles: list of tuple 或 np.ndarray (M, 6)，（扩展后的）障碍物
+        margin: float，走廊的放宽量，默认取障碍物投影边长的中位数
+        search: callable，search(start, goal, graph) 形式的搜索函数
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes(obstacles) 给出
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None
+        info: dict，rounds 搜索次数，selected 最终使用的障碍物编号，nodes 最终图的节点数
+    """
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    index = ObstacleGrid(boxes)
+    if not segments_intersect_boxes([start], [goal], boxes, index=index)[0]:
+        return [tuple(start), tuple(goal)], {'rounds': 0, 'selected': [], 'nodes': 0}
+    if cut_planes is None:
+        cut_planes = define_cut_planes(boxes)
+    if margin is None:
+        margin = float(np.median(np.maximum(boxes[:, 3] - boxes[:, 0], boxes[:, 4] - boxes[:, 1]))) if len(boxes) else 1.0
+
+    selected = [int(k) for k in select_corridor(start, goal, boxes, index)]
+    in_corridor = np.zeros(len(boxes), dtype=bool)
+    in_corridor[selected] = True
+    dynamic = DynamicCutGraph(boxes[selected], cut_planes)
+
+    rounds = 0
+    while True:
+        rounds += 1
+        graph = dynamic.graph
+        connect_terminal(graph, dynamic.checker, start)
+        connect_terminal(graph, dynamic.checker, goal)
+        try:
+            path = search(start, goal, graph)
+        finally:
+            graph.detach()
+
+        if path is not None:
+            # 路径附近的走廊外障碍物：路径线段与放宽 margin 后的障碍物相交（闭集）
+            P = np.array(path, dtype=float)
+            candidates = [index.query_box(np.minimum(a, b) - margin, np.maximum(a, b) + margin)
+                          for a, b in zip(P[:-1], P[1:])]
+            seg_ids = np.repeat(np.arange(len(candidates)), [len(ids) for ids in candidates])
+            obs_ids = np.concatenate(candidates)
+            outside = ~in_corridor[obs_ids]
+            seg_ids, obs_ids = seg_ids[outside], obs_ids[outside]
+            near = segment_box_hits(P[:-1][seg_ids], P[1:][seg_ids],
+                                    boxes[obs_ids, :3] - margin, boxes[obs_ids, 3:] + margin, strict=False)
+            new = np.unique(obs_ids[near])
+            if len(new) == 0:
+                break
+        elif in_corridor.all():
+            break
+        else:
+            # 放宽走廊
+            rect_min, rect_max = boxes[:, [0, 1]], boxes[:, [3, 4]]
+            corners = np.concatenate([rect_min[in_corridor], rect_max[in_corridor],
+                                      np.column_stack([rect_min[in_corridor, 0], rect_max[in_corridor, 1]]),
+                                      np.column_stack([rect_max[in_corridor, 0], rect_min[in_corridor, 1]]),
+                                      [start[:2], goal[:2]]])
+            hull = convex_hull_2d(corners)
+            new = np.flatnonzero(~in_corridor & hull_overlaps_rects(hull, rect_min - margin, rect_max + margin))
+            if len(new) == 0:
+                new = np.flatnonzero(~in_corridor)
+            margin *= 2
+
+        for k in new.tolist():
+            dynamic.add_obstacle(boxes[k])
+            selected.append(k)
+        in_corridor[new] = True
+
+    return path, {'rounds': rounds, 'selected': sorted(selected), 'nodes': dynamic.graph.num_nodes}
+
+
+def cost_matrix(points, obstacles, expansion=2, cut_planes=None, workers=None):
+    """
+    计算 points 两两之间的最小代价矩阵，只建一次可视图（与 Planner 共用缓存）。
+
+    参数:
+        points: list of tuple，K 个点 (x, y, z)
+        obstacles: list of tuple 或 np.ndarray (M, 6)，原始障碍物
+        expansion: float，障碍物扩展值
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        workers: int，首次构建可视图时的并行进程数
+
+    返回:
+        costs: np.ndarray (K, K)，不可达为 inf
+        paths: PathTable，paths[a, b] 为第 a 个点到第 b 个点的路径
+
+    示例:
+        costs, paths = cost_matrix(depots + deliveries, obstacles)
+        route = paths[0, 3]
+    """
+    return Planner(obstacles, expansion, cut_planes, workers).cost_matrix(points)
+
+
+def profile_plan(start, goal, obstacles, expansion=2, cut_planes=None, search=a_star_search_3d, workers=None):
+    """
+    按 main.py 的流程（筛选障碍物、扩展、建图、搜索）规划一次，运行时开启 profiling，
+    记录各阶段与热点函数的耗时、可视性检测与搜索的计数。
+
+    参数:
+        start: tuple，起点 (x, y, z)
+        goal: tuple，终点 (x, y, z)
+        obstacles: list of tuple 或 np.ndarray (M, 6)，原始障碍物
+        expansion: float，障碍物扩展值
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出
+        search: callable，search(start, goal, graph) 形式的搜索函数
+        workers: int，并行计算可视性边的进程数（工作进程中的记录也会合并）
+
+    返回:
+        path: list of tuple，路径节点；不可达时返回 None
+        size: tuple，(节点数, 边数)
+        report: dict，见 profiling.Profile.report
+
+    示例:
+        path, (nodes, edges), report = profile_plan(start, goal, obstacles)
+        print(report['counters']['visibility.rejects_3d'])
+    """
+    with profiling.profiling() as profile:
+        with profile.timer('plan'):
+            obstacles_final = obstacle_expansion(choosing_obstacles(start, goal, obstacles), expansion)
+            graph = build_evg_graph(obstacles_final, start, goal, workers, cut_planes)
+            path = search(start, goal, graph)
+    return path, (graph.num_nodes, graph.num_edges), profile.report()
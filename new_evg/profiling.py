@@ -0,0 +1,144 @@
+'''
+    本文件实现了规划流程的可选性能记录：各阶段与热点函数的计时器、计数器（可视性检测次数、
+    2D/3D 检查排除的节点对数、搜索扩展的节点数、入堆次数、过期出队次数等）。
+    默认使用不做任何记录的 NULL_PROFILE，被记录的函数只多一次 current() 调用和空的 with 语句
+    （用 timed 装饰的函数只多一次判断）；
+    在 with profiling() as profile: 中运行时记录到 profile，结束后由 profile.report() 得到结构化报告。
+'''
+import functools
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+
+class Profile:
+    """
+    计时器与计数器的集合。
+
+    示例:
+        with profiling() as profile:
+            graph = build_evg_graph(obstacles, start, goal)
+            path = a_star_search_3d(start, goal, graph)
+        print(profile.format())
+    """
+    enabled = True
+
+    def __init__(self):
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def timer(self, name):
+        """
+        累计 with 语句块的耗时，同名计时器可以多次进入。
+        """
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - t
+            self.calls[name] += 1
+
+    def count(self, name, n=1):
+        """
+        计数器 name 加 n。
+        """
+        self.counters[name] += int(n)
+
+    def merge(self, report):
+        """
+        合并另一个 Profile 的 report()（例如并行计算时工作进程中的记录），计时器的调用次数与耗时相加。
+        """
+        for name, entry in report['timers'].items():
+            self.timers[name] += entry['seconds']
+            self.calls[name] += entry['calls']
+        for name, n in report['counters'].items():
+            self.counters[name] += n
+
+    def report(self):
+        """
+        返回结构化报告:
+            {'timers': {名称: {'seconds': 累计耗时, 'calls': 次数}}, 'counters': {名称: 计数}}
+        """
+        return {
+            'timers': {name: {'seconds': self.timers[name], 'calls': self.calls[name]} for name in sorted(self.timers)},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def format(self):
+        """
+        以文本表格输出报告，计时器按耗时从大到小排列。
+        """
+        lines = []
+        for name in sorted(self.timers, key=self.timers.get, reverse=True):
+            lines.append(f"{name:32s} {self.timers[name]:10.4f}s {self.calls[name]:8d} 次")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"{name:32s} {n:12d}")
+        return '\n'.join(lines)
+
+
+class _NullProfile:
+    """
+    不做任何记录的 Profile，关闭记录时使用。
+    """
+    enabled = False
+    _null_timer = nullcontext()
+
+    def timer(self, name):
+        return self._null_timer
+
+    def count(self, name, n=1):
+        pass
+
+    def merge(self, report):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+_active = NULL_PROFILE
+
+
+def current():
+    """
+    返回当前的 Profile，未开启记录时为 NULL_PROFILE。
+    """
+    return _active
+
+
+@contextmanager
+def profiling(profile=None):
+    """
+    在 with 语句块内开启记录。
+
+    参数:
+        profile: Profile，记录到已有的 Profile 中（例如多次运行累计），默认新建
+
+    返回:
+        Profile
+    """
+    global _active
+    previous = _active
+    _active = Profile() if profile is None else profile
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def timed(name):
+    """
+    装饰器：开启记录时累计函数的耗时与调用次数，关闭时直接调用原函数。
+
+    参数:
+        name: str，计时器名称
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active.enabled:
+                return func(*args, **kwargs)
+            with _active.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
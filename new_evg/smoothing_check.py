@@ -0,0 +1,54 @@
+'''
+    本文件是路径后处理的检查脚本：在随机地图上规划路径后用 smooth_path 处理，
+    验证新路径端点不变、每个航段都不与障碍物相交、能耗不高于原路径，并输出每条路径节省的能耗。
+    运行: python smoothing_check.py
+'''
+import random
+import numpy as np
+from obstacles import generate_obstacles, total_length
+from choose_obs import obstacle_expansion
+from build_graph import build_evg_graph
+from calculate_search import a_star_search_3d
+from interact import segments_intersect_boxes
+from path_smoothing import smooth_path
+
+
+def run_random_maps(n_maps=10, num_obstacles=20, min_distance=14, expansion=2, method='dp', seed=0):
+    """
+    在 n_maps 张随机地图上检查 smooth_path 的结果。
+    """
+    random.seed(seed)
+    failures = 0
+    total_before = total_after = 0.0
+    for k in range(n_maps):
+        obstacles = obstacle_expansion(generate_obstacles(num_obstacles, min_distance, expansion), expansion)
+        start = (round(random.uniform(-20, 0), 1), round(random.uniform(-20, 0), 1), round(random.uniform(2, 30), 1))
+        goal = (round(random.uniform(total_length, total_length + 60), 1),
+                round(random.uniform(total_length, total_length + 60), 1), round(random.uniform(2, 30), 1))
+
+        path = a_star_search_3d(start, goal, build_evg_graph(obstacles, start, goal))
+        if path is None:
+            print(f"map {k}: 不可达")
+            continue
+
+        smoothed, report = smooth_path(path, obstacles, method=method)
+        P = np.array(smoothed)
+        ok = (smoothed[0] == path[0] and smoothed[-1] == path[-1]
+              and not segments_intersect_boxes(P[:-1], P[1:], obstacles).any()
+              and report['energy_after'] <= report['energy_before'] * (1 + 1e-12))
+        failures += not ok
+        total_before += report['energy_before']
+        total_after += report['energy_after']
+
+        print(f"map {k}: waypoints {report['waypoints_before']} -> {report['waypoints_after']} "
+              f"energy {report['energy_before']:.1f} -> {report['energy_after']:.1f} "
+              f"saved {report['saved']:.1f} ({100 * report['saved_ratio']:.2f}%) {'OK' if ok else 'FAIL'}")
+
+    if total_before > 0:
+        print(f"合计节省 {total_before - total_after:.1f} ({100 * (1 - total_after / total_before):.2f}%)")
+    print("全部通过" if failures == 0 else f"{failures} 张地图未通过")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    run_random_maps()
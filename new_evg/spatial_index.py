@@ -0,0 +1,323 @@
+'''
+    本文件实现了障碍物的空间索引 ObstacleGrid：在障碍物 xy 投影上建立均匀网格，
+    线段、点、包围盒查询只返回附近网格中的候选障碍物，使可视性检测的代价
+    与局部障碍物密度相关，而不是与障碍物总数相关。
+    SegmentGrid 是反方向的索引：网格中登记线段（可视图的边），查询可能穿过某个包围盒的线段。
+'''
+import numpy as np
+
+
+def grouped_arange(counts):
+    """
+    对每组生成组内序号 0..count-1 并拼接，例如 [2, 3] -> [0, 1, 0, 1, 2]。
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(offsets, counts)
+
+
+def segment_cells(starts, ends, origin, cell_size, shape):
+    """
+    线段 xy 投影经过的全部网格（supercover）：按列遍历，每列取线段在该列内的 y 范围。
+    网格范围之外的部分不计入。
+
+    参数:
+        starts, ends: np.ndarray (N, 3)，线段端点
+        origin: np.ndarray (2,)，网格原点
+        cell_size: float，网格边长
+        shape: tuple，网格的列数和行数
+
+    返回:
+        cell_seg: np.ndarray，线段编号
+        cells: np.ndarray，对应的网格编号 (列 * 行数 + 行)
+    """
+    nx, ny = shape
+    # 转换到网格坐标系，并使线段沿 x 方向递增
+    g1 = (starts[:, :2] - origin) / cell_size
+    g2 = (ends[:, :2] - origin) / cell_size
+    swap = g1[:, 0] > g2[:, 0]
+    g1[swap], g2[swap] = g2[swap].copy(), g1[swap].copy()
+
+    # 每条线段覆盖的列
+    col_lo = np.clip(np.floor(g1[:, 0]), 0, nx - 1).astype(np.int64)
+    col_hi = np.clip(np.floor(g2[:, 0]), 0, nx - 1).astype(np.int64)
+    outside = (g2[:, 0] < 0) | (g1[:, 0] >= nx)
+    n_cols = np.where(outside, 0, col_hi - col_lo + 1)
+
+    seg = np.repeat(np.arange(len(starts)), n_cols)
+    col = col_lo[seg] + grouped_arange(n_cols)
+
+    # 线段在每一列内的 y 范围
+    x1, y1 = g1[seg, 0], g1[seg, 1]
+    x2, y2 = g2[seg, 0], g2[seg, 1]
+    xa = np.maximum(col, x1)
+    xb = np.minimum(col + 1, x2)
+    dx = x2 - x1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(dx > 0, (y2 - y1) / dx, 0.0)
+    ya = np.where(dx > 0, y1 + slope * (xa - x1), y1)
+    yb = np.where(dx > 0, y1 + slope * (xb - x1), y2)
+    row_lo = np.floor(np.minimum(ya, yb) - 1e-9)
+    row_hi = np.floor(np.maximum(ya, yb) + 1e-9)
+    keep = (row_hi >= 0) & (row_lo <= ny - 1)
+    seg, col = seg[keep], col[keep]
+    row_lo = np.clip(row_lo[keep], 0, ny - 1).astype(np.int64)
+    row_hi = np.clip(row_hi[keep], 0, ny - 1).astype(np.int64)
+
+    n_rows = row_hi - row_lo + 1
+    cell_seg = np.repeat(seg, n_rows)
+    cells = np.repeat(col * ny + row_lo, n_rows) + grouped_arange(n_rows)
+    return cell_seg, cells
+
+
+class ObstacleGrid:
+    """
+    障碍物 xy 投影上的均匀网格索引，每个网格记录与其相交的障碍物编号，
+    并保留障碍物的 z 范围用于过滤。
+
+    参数:
+        obstacles: array-like (M, 6)，障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        cell_size: float，网格边长，默认取障碍物平均边长与平均间距中的较大者
+    """
+
+    def __init__(self, obstacles, cell_size=None):
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+        boxes = self.obstacles
+
+        if len(boxes) == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0 if cell_size is None else float(cell_size)
+            self.shape = (1, 1)
+            self.cell_start = np.zeros(2, dtype=np.int64)
+            self.cell_items = np.zeros(0, dtype=np.int64)
+            return
+
+        lo = boxes[:, :2].min(axis=0)
+        hi = boxes[:, 3:5].max(axis=0)
+        if cell_size is None:
+            mean_side = np.mean(np.maximum(boxes[:, 3] - boxes[:, 0], boxes[:, 4] - boxes[:, 1]))
+            spacing = np.sqrt(np.prod(np.maximum(hi - lo, 1e-9)) / len(boxes))
+            cell_size = max(mean_side, spacing, 1e-6)
+        self.origin = lo
+        self.cell_size = float(cell_size)
+        self.shape = tuple(int(n) for n in np.floor((hi - lo) / self.cell_size) + 1)
+
+        # 每个障碍物覆盖的网格范围（略微放大，保证边界上的点也能查到）
+        c_lo = self._cell_coords(boxes[:, :2] - 1e-9)
+        c_hi = self._cell_coords(boxes[:, 3:5] + 1e-9)
+        nx_cells = c_hi[:, 0] - c_lo[:, 0] + 1
+        ny_cells = c_hi[:, 1] - c_lo[:, 1] + 1
+
+        # 展开为 (cell, obstacle) 对，再按网格排序为 CSR 结构
+        obs_ids = np.repeat(np.arange(len(boxes)), nx_cells * ny_cells)
+        local = grouped_arange(nx_cells * ny_cells)
+        ny_rep = ny_cells[obs_ids]
+        cx = c_lo[obs_ids, 0] + local // ny_rep
+        cy = c_lo[obs_ids, 1] + local % ny_rep
+        cells = cx * self.shape[1] + cy
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_items = obs_ids[order]
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def to_arrays(self):
+        """
+        返回重建索引所需的数组（不包括障碍物本身），用于保存到磁盘，见 from_arrays。
+        """
+        return {
+            'grid_params': np.array([*self.origin, self.cell_size, *self.shape], dtype=float),
+            'grid_start': self.cell_start,
+            'grid_items': self.cell_items,
+        }
+
+    @classmethod
+    def from_arrays(cls, obstacles, arrays):
+        """
+        由 to_arrays 保存的数组直接恢复索引，不需要重新划分网格。
+
+        参数:
+            obstacles: array-like (M, 6)，建立索引时的障碍物
+            arrays: dict，包含 grid_params、grid_start、grid_items
+        """
+        grid = cls.__new__(cls)
+        grid.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+        params = np.asarray(arrays['grid_params'], dtype=float)
+        grid.origin = params[:2].copy()
+        grid.cell_size = float(params[2])
+        grid.shape = (int(params[3]), int(params[4]))
+        grid.cell_start = arrays['grid_start']
+        grid.cell_items = arrays['grid_items']
+        return grid
+
+    def _cell_coords(self, xy):
+        """
+        将 xy 坐标转换为（截断到网格范围内的）网格坐标。
+        """
+        c = np.floor((np.asarray(xy, dtype=float) - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(c, 0, np.array(self.shape) - 1)
+
+    def _gather(self, cells):
+        """
+        返回一组网格中的障碍物编号（可能重复）及其对应的输入位置。
+        """
+        counts = self.cell_start[cells + 1] - self.cell_start[cells]
+        owner = np.repeat(np.arange(len(cells)), counts)
+        items = self.cell_items[np.repeat(self.cell_start[cells], counts) + grouped_arange(counts)]
+        return owner, items
+
+    def query_box(self, box_min, box_max):
+        """
+        查询与给定 3D 包围盒（闭区间）相交的障碍物。
+
+        参数:
+            box_min: array-like (3,)，包围盒最小角点
+            box_max: array-like (3,)，包围盒最大角点
+
+        返回:
+            np.ndarray，按编号升序排列的障碍物编号
+        """
+        box_min = np.asarray(box_min, dtype=float)
+        box_max = np.asarray(box_max, dtype=float)
+        if len(self.obstacles) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        c_lo = self._cell_coords(box_min[:2])
+        c_hi = self._cell_coords(box_max[:2])
+        cx, cy = np.meshgrid(np.arange(c_lo[0], c_hi[0] + 1), np.arange(c_lo[1], c_hi[1] + 1))
+        _, items = self._gather((cx * self.shape[1] + cy).ravel())
+        items = np.unique(items)
+
+        boxes = self.obstacles[items]
+        overlap = np.all((boxes[:, :3] <= box_max) & (box_min <= boxes[:, 3:6]), axis=1)
+        return items[overlap]
+
+    def query_point(self, point, epsilon=0.0):
+        """
+        查询 xy 投影（放大 epsilon）包含给定点的障碍物，忽略 z 坐标。
+
+        返回:
+            np.ndarray，按编号升序排列的障碍物编号
+        """
+        x, y = point[0], point[1]
+        return self.query_box((x - epsilon, y - epsilon, -np.inf), (x + epsilon, y + epsilon, np.inf))
+
+    def query_segments(self, starts, ends):
+        """
+        批量查询线段经过的网格中的候选障碍物。线段的 xy 投影按列遍历所经过的全部网格
+        （supercover），再用线段包围盒过滤掉 z 范围或 xy 范围不重叠的障碍物。
+
+        参数:
+            starts: array-like (N, 3)，线段起点
+            ends: array-like (N, 3)，线段终点
+
+        返回:
+            seg_ids: np.ndarray，候选对中的线段编号
+            obs_ids: np.ndarray，候选对中的障碍物编号（每个线段内不重复）
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        empty = np.zeros(0, dtype=np.int64)
+        if len(starts) == 0 or len(self.obstacles) == 0:
+            return empty, empty
+
+        cell_seg, cells = segment_cells(starts, ends, self.origin, self.cell_size, self.shape)
+        owner, obs_ids = self._gather(cells)
+        seg_ids = cell_seg[owner]
+
+        # 去除同一线段的重复候选（键基本按线段有序，排序后去重比 np.unique 快得多）
+        key = np.sort(seg_ids * len(self.obstacles) + obs_ids)
+        first = np.ones(len(key), dtype=bool)
+        first[1:] = key[1:] != key[:-1]
+        key = key[first]
+        seg_ids, obs_ids = key // len(self.obstacles), key % len(self.obstacles)
+
+        # 线段包围盒与障碍物包围盒不重叠的候选可以直接排除
+        seg_min = np.minimum(starts, ends)[seg_ids]
+        seg_max = np.maximum(starts, ends)[seg_ids]
+        boxes = self.obstacles[obs_ids]
+        overlap = np.all((boxes[:, :3] <= seg_max) & (seg_min <= boxes[:, 3:6]), axis=1)
+        return seg_ids[overlap], obs_ids[overlap]
+
+
+class SegmentGrid:
+    """
+    线段的均匀网格索引：每条线段登记到其 xy 投影经过的网格（与 ObstacleGrid.query_segments 的遍历相同），
+    按包围盒查询可能与之相交的线段。用于 DynamicCutGraph 增加障碍物时只检测可能穿过它的边。
+
+    线段只追加、不删除：每条线段带一个调用方给出的键，已经不存在的线段由调用方在查询结果中过滤，
+    失效的登记过多时由调用方重建索引。每次追加的线段按网格排序为一块，块数超过 max_chunks 时合并。
+
+    参数:
+        lo, hi: array-like (2,)，网格覆盖的 xy 范围，线段端点都应在其中（见 contains）
+        cell_size: float，网格边长
+        max_chunks: int，合并前保留的块数上限
+    """
+
+    def __init__(self, lo, hi, cell_size, max_chunks=8):
+        self.origin = np.asarray(lo, dtype=float)[:2].copy()
+        self.hi = np.asarray(hi, dtype=float)[:2].copy()
+        self.cell_size = max(float(cell_size), 1e-6)
+        self.shape = tuple(int(n) for n in np.floor(np.maximum(self.hi - self.origin, 0) / self.cell_size) + 1)
+        self.max_chunks = max_chunks
+        # [(按网格升序的网格编号, 对应的线段键)]
+        self._chunks = []
+        self.size = 0
+
+    def contains(self, points):
+        """
+        判断所有点的 xy 坐标是否都在网格覆盖范围内。
+        """
+        xy = np.asarray(points, dtype=float).reshape(-1, 3)[:, :2]
+        return bool(np.all((self.origin <= xy) & (xy <= self.hi)))
+
+    def add(self, starts, ends, keys):
+        """
+        登记一批线段。
+
+        参数:
+            starts, ends: array-like (N, 3)，线段端点
+            keys: array-like (N,) int64，线段的键
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(keys) == 0:
+            return
+        seg, cells = segment_cells(starts, ends, self.origin, self.cell_size, self.shape)
+        order = np.argsort(cells, kind='stable')
+        self._chunks.append((cells[order], keys[seg[order]]))
+        self.size += len(keys)
+
+        if len(self._chunks) > self.max_chunks:
+            cells = np.concatenate([c for c, _ in self._chunks])
+            keys = np.concatenate([k for _, k in self._chunks])
+            order = np.argsort(cells, kind='stable')
+            self._chunks = [(cells[order], keys[order])]
+
+    def query_box(self, box_min, box_max):
+        """
+        查询经过与给定包围盒 xy 投影（闭区间）相交的网格的线段。
+
+        返回:
+            np.ndarray，升序、不重复的线段键（包含调用方已经删除的线段）
+        """
+        c_lo = self._cell_coords(np.asarray(box_min, dtype=float)[:2])
+        c_hi = self._cell_coords(np.asarray(box_max, dtype=float)[:2])
+        # 每一列内的网格编号是连续的一段
+        first = np.arange(c_lo[0], c_hi[0] + 1) * self.shape[1]
+        first, last = first + c_lo[1], first + c_hi[1]
+
+        found = [np.zeros(0, dtype=np.int64)]
+        for cells, keys in self._chunks:
+            lo = np.searchsorted(cells, first, side='left')
+            hi = np.searchsorted(cells, last, side='right')
+            found.append(keys[np.repeat(lo, hi - lo) + grouped_arange(hi - lo)])
+        return np.unique(np.concatenate(found))
+
+    def _cell_coords(self, xy):
+        c = np.floor((xy - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(c, 0, np.array(self.shape) - 1)
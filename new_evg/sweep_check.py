@@ -0,0 +1,107 @@
+'''
+    本文件是旋转扫描可视性的检查脚本：在随机地图（包括障碍物互相重叠、只保留切线边的情况）上比较
+    sweep_cut_pairs 与逐对检测的 visible_cut_pairs，验证两者得到的可见节点对完全相同，并输出耗时。
+    另外验证批量 slab 检测 segments_intersect_boxes 与原来逐对的分离轴（SAT）检测结果相同，
+    以及（节点数少于 500 的地图上）多进程的 visible_cut_pairs(workers=2) 与单进程结果相同。
+    运行: python sweep_check.py
+'''
+import time
+import numpy as np
+from obstacles import generate_obstacles_fast
+from benchmark import map_length
+from choose_obs import obstacle_expansion
+from build_graph import build_cut_graph, visible_cut_pairs
+from interact import segments_intersect_boxes
+from sweep_visibility import sweep_cut_pairs
+
+
+def overlapping_obstacles(num_obstacles, seed=0):
+    """
+    生成互相重叠的障碍物（该平面退回逐对检测的情况）。
+    """
+    rng = np.random.default_rng(seed)
+    lo = rng.uniform(0, 200, (num_obstacles, 2))
+    size = rng.uniform(10, 40, (num_obstacles, 2))
+    height = rng.uniform(10, 50, num_obstacles)
+    return np.column_stack([lo, np.zeros(num_obstacles), lo + size, height])
+
+
+def sat_blocked(p1, p2, obstacles):
+    """
+    原来逐对、逐个障碍物的分离轴（SAT）检测，作为 segments_intersect_boxes 的参照：
+    线段与收缩后的长方体在每条分离轴上的投影都重叠、且不只在端点处接触时相交。
+    """
+    P1, P2 = np.array(p1, dtype=float), np.array(p2, dtype=float)
+    d = P2 - P1
+    normals = list(np.eye(3))
+    axes = [d] + normals + [np.cross(d, n) for n in normals if np.linalg.norm(np.cross(d, n)) > 1e-6]
+    axes = [axis / np.linalg.norm(axis) for axis in axes if np.linalg.norm(axis) >= 1e-6]
+
+    for obstacle in obstacles:
+        box_min = np.array(obstacle[:3]) + 1e-6
+        box_max = np.array(obstacle[3:6]) - 1e-6
+        vertices = [np.array([x, y, z]) for x in (box_min[0], box_max[0])
+                    for y in (box_min[1], box_max[1]) for z in (box_min[2], box_max[2])]
+        overlaps = True
+        for axis in axes:
+            line = [np.dot(P1, axis), np.dot(P2, axis)]
+            box = [np.dot(vertex, axis) for vertex in vertices]
+            line_min, line_max, lo, hi = min(line), max(line), min(box), max(box)
+            if line_max < lo or hi < line_min or line_min == lo or line_max == hi:
+                overlaps = False
+                break
+        if overlaps:
+            return True
+    return False
+
+
+def check_kernel(checker, n_pairs=1500, seed=0):
+    """
+    随机抽取 cut_node 节点对，比较 segments_intersect_boxes 与 sat_blocked 的 3D 相交结果。
+    """
+    rng = np.random.default_rng(seed)
+    i, j = rng.integers(0, checker.n_cut, (2, n_pairs))
+    P1, P2 = checker.coords[i], checker.coords[j]
+    blocked = segments_intersect_boxes(P1, P2, checker.obstacles)
+    expected = np.array([sat_blocked(a, b, checker.obstacles) for a, b in zip(P1, P2)])
+    return np.array_equal(blocked, expected), int(expected.sum())
+
+
+def run_random_maps(sizes=(20, 40, 80, 150), min_distance=14, expansion=2, seed=0):
+    """
+    对每个障碍物数量生成一张地图，比较两种方法的结果。
+    """
+    cases = [(f"{m} 个障碍物", generate_obstacles_fast(m, min_distance, seed=seed + k, length=map_length(m, min_distance)),
+              False) for k, m in enumerate(sizes)]
+    cases += [("重叠障碍物", overlapping_obstacles(30, seed), False),
+              (f"{sizes[0]} 个障碍物 tangent_only", generate_obstacles_fast(sizes[0], min_distance, seed=seed,
+                                                                          length=map_length(sizes[0], min_distance)), True)]
+
+    _, checker = build_cut_graph(obstacle_expansion(cases[0][1], expansion))
+    ok, n_blocked = check_kernel(checker)
+    failures = 0 if ok else 1
+    print(f"slab 与 SAT: blocked={n_blocked} {'OK' if ok else 'FAIL'}")
+
+    for name, obstacles, tangent_only in cases:
+        _, checker = build_cut_graph(obstacle_expansion(obstacles, expansion), tangent_only=tangent_only)
+        t = time.perf_counter()
+        i, j = visible_cut_pairs(checker)
+        pairs_time = time.perf_counter() - t
+        t = time.perf_counter()
+        a, b = sweep_cut_pairs(checker)
+        sweep_time = time.perf_counter() - t
+
+        ok = np.array_equal(i, a) and np.array_equal(j, b)
+        if checker.n_cut < 500:
+            parallel_i, parallel_j = visible_cut_pairs(checker, workers=2)
+            ok = ok and np.array_equal(i, parallel_i) and np.array_equal(j, parallel_j)
+        failures += not ok
+        print(f"{name}: nodes={checker.n_cut} edges={len(i)} pairs {pairs_time:.2f}s sweep {sweep_time:.2f}s "
+              f"{'OK' if ok else 'FAIL'}")
+
+    print("全部通过" if failures == 0 else f"{failures} 张地图未通过")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    run_random_maps()
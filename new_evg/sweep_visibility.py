@@ -0,0 +1,260 @@
+'''
+    本文件实现了切割平面内的旋转扫描（rotational plane sweep，Lee 算法）可视性算法。
+    同一切割平面上的节点之间的线段是水平的，只可能被在该高度上存在的障碍物挡住，问题退化为矩形间的 2D 可视性：
+    对平面上的每个节点，将其余节点和障碍物的极角区间端点排序后扫描一周，扫描线经过的障碍物按沿扫描线的距离
+    保存在有序表中。平面上的障碍物互不相交时，这一顺序在扫描过程中不变，插入时只需在当前扫描线上二分比较；
+    每个目标只检测表中最近的、扫描线穿过其内部的障碍物。
+    极角、事件排序等与扫描顺序无关的计算对整个平面的所有节点一次向量化完成，逐个事件的 Python 循环只做
+    有序表的插入、删除和最近障碍物的检测。
+    平面上的障碍物相交时顺序可能改变，该平面退回逐对检测；不同平面之间的节点对仍由 VisibilityChecker 做 3D 检查。
+'''
+import math
+import numpy as np
+from interact import segment_box_hits
+
+# 插入时在当前扫描线上比较距离，障碍物放宽这一量，避免扫描线恰好经过角点时因舍入误差错过
+RAY_TOLERANCE = 1e-9
+
+
+def sweep_cut_pairs(checker):
+    """
+    计算 cut_nodes 之间所有可见的节点对 (i < j)，结果与 build_graph.visible_cut_pairs 相同：
+    同一平面上的节点对用旋转扫描做 3D 检查，不同平面之间的节点对用 checker.visible。
+
+    参数:
+        checker: VisibilityChecker
+
+    返回:
+        i, j: np.ndarray，可见节点对的编号，按行优先排列
+    """
+    n = checker.n_cut
+    coords = checker.coords[:n]
+    i, j = np.triu_indices(n, k=1)
+    same_plane = coords[i, 2] == coords[j, 2]
+
+    # 不同平面之间的节点对
+    cross = ~same_plane
+    visible = np.zeros(len(i), dtype=bool)
+    visible[cross] = checker.visible(i[cross], j[cross])
+
+    # 同一平面上的节点对：先做局部检查，再逐个平面扫描
+    candidates = np.flatnonzero(same_plane)
+    candidates = candidates[checker.local_visible(i[candidates], j[candidates])]
+    boxes = checker.obstacles
+    box_min = boxes[:, :3] + 1e-6  # 与 segments_intersect_boxes 相同的收缩
+    box_max = boxes[:, 3:6] - 1e-6
+
+    for z in np.unique(coords[i[candidates], 2]):
+        on_plane = candidates[coords[i[candidates], 2] == z]
+        # 平行于 z 轴的水平线段只可能与 z 方向严格包含该高度的障碍物相交
+        active = np.flatnonzero((box_min[:, 2] < z) & (z < box_max[:, 2]))
+        P1, P2 = coords[i[on_plane]], coords[j[on_plane]]
+        if rectangles_overlap(box_min[active, :2], box_max[active, :2]):
+            hits = segment_box_hits(P1[:, None, :], P2[:, None, :], box_min[active][None], box_max[active][None])
+            visible[on_plane] = ~hits.any(axis=1)
+        else:
+            visible[on_plane] = sweep_plane(P1, P2, box_min[active], box_max[active])
+
+    return i[visible], j[visible]
+
+
+def rectangles_overlap(rect_min, rect_max, block=256):
+    """
+    判断一组矩形（闭集）中是否有两个相交，按块两两比较，限制中间数组的大小。
+    """
+    for s in range(0, len(rect_min), block):
+        a_min, a_max = rect_min[s:s + block, None, :], rect_max[s:s + block, None, :]
+        overlap = np.all((a_min <= rect_max[None, s + 1:]) & (rect_min[None, s + 1:] <= a_max), axis=-1)
+        # 只看 b > a 的矩形对
+        if np.triu(overlap, k=0).any():
+            return True
+    return False
+
+
+def sweep_plane(origins, targets, box_min, box_max):
+    """
+    同一平面上的旋转扫描：判断每条水平线段 origins[p] -> targets[p] 是否穿过某个障碍物内部。
+    起点相同的线段由一次扫描完成；障碍物的 xy 投影（闭集）应互不相交，
+    起点落在某个障碍物投影上时该起点的线段退回逐对检测。
+
+    参数:
+        origins: np.ndarray (P, 3)，扫描中心（起点相同的线段应相邻）
+        targets: np.ndarray (P, 3)，目标点（与起点同高）
+        box_min, box_max: np.ndarray (M, 3)，（已收缩的）障碍物角点
+
+    返回:
+        np.ndarray (P,) bool，线段不与任何障碍物相交时为 True
+    """
+    visible = np.ones(len(origins), dtype=bool)
+    m = len(box_min)
+    if m == 0 or len(origins) == 0:
+        return visible
+
+    # 每个起点一行
+    first = np.flatnonzero(np.any(origins[1:, :2] != origins[:-1, :2], axis=1)) + 1
+    row = np.zeros(len(origins), dtype=np.int64)
+    row[first] = 1
+    row = np.cumsum(row)
+    origin = origins[np.concatenate(([0], first)), :2]
+    ox, oy = origin[:, 0:1], origin[:, 1:2]
+    x0, y0, x1, y1 = box_min[:, 0], box_min[:, 1], box_max[:, 0], box_max[:, 1]
+
+    # 起点落在障碍物投影上：逐对检测
+    inside = np.any((x0 <= ox) & (ox <= x1) & (y0 <= oy) & (oy <= y1), axis=1)
+    fallback = np.flatnonzero(inside[row])
+    if len(fallback):
+        hits = segment_box_hits(origins[fallback, None, :], targets[fallback, None, :], box_min[None], box_max[None])
+        visible[fallback] = ~hits.any(axis=1)
+    rows = np.flatnonzero(~inside)
+    if len(rows) == 0:
+        return visible
+    ox, oy = ox[rows], oy[rows]
+
+    # 每个障碍物的极角区间 [lo, hi]：以中心方向为参考，四个角点的相对极角都在 (-π, π) 内
+    cx, cy = np.stack([x0, x1, x1, x0], axis=1), np.stack([y0, y0, y1, y1], axis=1)
+    center = np.arctan2((y0 + y1) / 2 - oy, (x0 + x1) / 2 - ox)
+    relative = np.angle(np.exp(1j * (np.arctan2(cy[None] - oy[..., None], cx[None] - ox[..., None])
+                                     - center[..., None])))
+    lo = center + relative.min(axis=2)
+    hi = center + relative.max(axis=2)
+
+    # 跨过 ±π 的区间拆成两段：扫描开始时（极角 -π）插入，另一端在 (-π, π] 内
+    wrap_low, wrap_high = lo < -math.pi, hi > math.pi
+    lo[wrap_low] += 2 * math.pi
+    hi[wrap_high] -= 2 * math.pi
+    wrap = wrap_low | wrap_high
+
+    pairs = np.flatnonzero(~inside[row])
+    local_row = np.searchsorted(rows, row[pairs])
+    dx = targets[pairs, 0] - origin[row[pairs], 0]
+    dy = targets[pairs, 1] - origin[row[pairs], 1]
+    target_angle = np.arctan2(dy, dx)
+
+    # 极角区间内没有目标的障碍物不影响任何检测，也不改变其余障碍物的先后顺序，不参与扫描。
+    # 目标按 (起点, 极角) 排序，键 row * 8 + (angle + π) 使不同起点的极角范围互不重叠
+    target_key = np.sort(local_row * 8 + (target_angle + math.pi))
+    base = np.arange(len(rows))[:, None] * 8 + math.pi
+
+    def count(a, b):
+        return np.searchsorted(target_key, base + b, side='right') - np.searchsorted(target_key, base + a)
+
+    covered = np.where(wrap, count(-math.pi, hi) + count(lo, math.pi), count(lo, hi)) > 0
+    obstacle_row, obstacle_ref = np.nonzero(covered)
+    wrapped = wrap[covered]
+
+    # 事件：区间结束(0)、目标(1)、区间开始(2)。同一极角时先删除、再检测、后插入，
+    # 这一极角上只擦过障碍物边界的线段不会被判为相交。所有起点的事件一起按 (起点, 极角, 类型) 排序
+    n_obs = len(obstacle_ref)
+    start_angle = np.concatenate([lo[covered], np.full(wrapped.sum(), -math.pi)])
+    event_row = np.concatenate([obstacle_row, local_row, obstacle_row, obstacle_row[wrapped]])
+    angle = np.concatenate([hi[covered], target_angle, start_angle])
+    kind = np.repeat([0, 1, 2], [n_obs, len(pairs), len(start_angle)])
+    ref = np.concatenate([obstacle_ref, pairs, obstacle_ref, obstacle_ref[wrapped]])
+    # 插入事件给出扫描线方向，目标事件给出线段方向
+    u = np.concatenate([np.zeros(n_obs), dx, np.cos(start_angle)])
+    v = np.concatenate([np.zeros(n_obs), dy, np.sin(start_angle)])
+    order = np.lexsort((kind, angle, event_row))
+
+    # 插入比较用放宽的矩形，目标检测用原矩形（与 segment_box_hits(strict=True) 相同）
+    wide = ((x0 - RAY_TOLERANCE).tolist(), (y0 - RAY_TOLERANCE).tolist(),
+            (x1 + RAY_TOLERANCE).tolist(), (y1 + RAY_TOLERANCE).tolist())
+    rects = (x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist())
+    result = _sweep_events(event_row[order].tolist(), kind[order].tolist(), ref[order].tolist(),
+                           u[order].tolist(), v[order].tolist(), ox.ravel().tolist(), oy.ravel().tolist(),
+                           wide, rects)
+    visible[result] = False
+    return visible
+
+
+def _sweep_events(rows, kinds, refs, us, vs, origin_x, origin_y, wide, rects):
+    """
+    按排好序的事件逐个扫描，返回被挡住的线段编号。active 为当前扫描线经过的障碍物，按沿扫描线的距离排列。
+    每次插入在当前扫描线上二分查找 O(log M) 次 _ray_entry；删除是列表的按值删除，
+    扫描线同时经过的障碍物只有少数几个，这比维护平衡树的 Python 代码更快。
+    """
+    wx0, wy0, wx1, wy1 = wide
+    rx0, ry0, rx1, ry1 = rects
+    blocked = []
+    current, active = -1, []
+    ox = oy = 0.0
+    for r, kind, k, u, v in zip(rows, kinds, refs, us, vs):
+        if r != current:
+            current, active = r, []
+            ox, oy = origin_x[r], origin_y[r]
+        if kind == 0:
+            active.remove(k)
+        elif kind == 2:
+            key = _ray_entry(ox, oy, u, v, wx0[k], wy0[k], wx1[k], wy1[k])
+            lo, hi = 0, len(active)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                b = active[mid]
+                if _ray_entry(ox, oy, u, v, wx0[b], wy0[b], wx1[b], wy1[b]) < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            active.insert(lo, k)
+        else:
+            # 从最近的障碍物开始，第一个被线段所在直线穿过内部的障碍物决定是否可见
+            for b in active:
+                enter, leave = _segment_interval(ox, oy, u, v, rx0[b], ry0[b], rx1[b], ry1[b])
+                if enter < leave:
+                    if enter < 1.0:
+                        blocked.append(k)
+                    break
+    return blocked
+
+
+def _ray_entry(ox, oy, c, s, x0, y0, x1, y1):
+    """
+    射线 (ox, oy) + t (c, s) 进入闭矩形 [x0, x1] × [y0, y1]（已放宽 RAY_TOLERANCE）时的参数 t，不相交时为 inf。
+    扫描中每次插入都要调用 O(log M) 次，因此展开写成标量运算。
+    """
+    if c != 0:
+        tx0, tx1 = (x0 - ox) / c, (x1 - ox) / c
+        if tx0 > tx1:
+            tx0, tx1 = tx1, tx0
+    elif x0 <= ox <= x1:
+        tx0, tx1 = -math.inf, math.inf
+    else:
+        return math.inf
+    if s != 0:
+        ty0, ty1 = (y0 - oy) / s, (y1 - oy) / s
+        if ty0 > ty1:
+            ty0, ty1 = ty1, ty0
+    elif y0 <= oy <= y1:
+        ty0, ty1 = -math.inf, math.inf
+    else:
+        return math.inf
+    enter = tx0 if tx0 > ty0 else ty0
+    leave = tx1 if tx1 < ty1 else ty1
+    if enter < 0:
+        enter = 0.0
+    return enter if enter <= leave else math.inf
+
+
+def _segment_interval(ox, oy, dx, dy, x0, y0, x1, y1):
+    """
+    直线 (ox, oy) + t (dx, dy) 穿过开矩形 (x0, x1) × (y0, y1) 内部的参数区间 (enter, leave)，
+    只擦过边界或不相交时 enter >= leave。
+    与 segment_box_hits(strict=True) 相同：与某一轴平行时必须严格位于该轴的 slab 内部。
+    """
+    if dx != 0:
+        tx0, tx1 = (x0 - ox) / dx, (x1 - ox) / dx
+        if tx0 > tx1:
+            tx0, tx1 = tx1, tx0
+    elif x0 < ox < x1:
+        tx0, tx1 = -math.inf, math.inf
+    else:
+        return math.inf, -math.inf
+    if dy != 0:
+        ty0, ty1 = (y0 - oy) / dy, (y1 - oy) / dy
+        if ty0 > ty1:
+            ty0, ty1 = ty1, ty0
+    elif y0 < oy < y1:
+        ty0, ty1 = -math.inf, math.inf
+    else:
+        return math.inf, -math.inf
+    enter = tx0 if tx0 > ty0 else ty0
+    leave = tx1 if tx1 < ty1 else ty1
+    return (enter if enter > 0.0 else 0.0), leave
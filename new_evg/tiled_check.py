@@ -0,0 +1,152 @@
+'''
+    本文件是分块规划的检查脚本：在随机地图上比较 TiledPlanner 与整张图上的 Planner，
+    验证 generate_obstacles_fast 生成的障碍物两两间距不小于 min_distance、min_distance <= 0 时报 ValueError，
+    障碍物经二进制文件保存、读取（以及文本转二进制）后不变，
+    ObstacleTileFile.query 与逐个判断的结果相同、分块路径端点正确且不与障碍物相交、
+    规划过程中保留的分块数的峰值不超过 max_tiles，
+    分块路径的代价（与规划器相同的载重、速度）不超过整张图最优代价的 1 + COST_TOLERANCE 倍，并输出两者的代价与耗时。
+    运行: python tiled_check.py
+'''
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from obstacles import (generate_obstacles_fast, box_gaps, save_obstacles_binary, load_obstacles_binary,
+                       save_obstacles_to_file, convert_text_to_binary, load_obstacles_array)
+from benchmark import map_length
+from choose_obs import obstacle_expansion
+from build_graph import load, vel
+from calculate_search import calculate_costs
+from interact import segments_intersect_boxes
+from planner import Planner
+from tiled_planner import ObstacleTileFile, TiledPlanner, save_obstacle_tiles
+
+# 分块路径必须经过沿分块边界等间距分布的入口节点（HPA* 的近似），代价允许比整张图上的最优路径高出的比例。
+# 默认入口节点间距（tile_size / 8）下，随机地图上观察到的超出比例在 2% ~ 7.5% 之间
+COST_TOLERANCE = 0.1
+
+
+def check_queries(store, obstacles, n_queries=200, seed=0):
+    """
+    随机矩形上比较 ObstacleTileFile.query 与逐个判断的结果。
+    """
+    rng = np.random.default_rng(seed)
+    lo, hi = store.bounds[:2], store.bounds[3:5]
+    for _ in range(n_queries):
+        a = rng.uniform(lo - 100, hi + 100)
+        b = a + rng.uniform(0, (hi - lo) / 3)
+        _, ids = store.query(a, b)
+        expected = np.flatnonzero((obstacles[:, 0] <= b[0]) & (obstacles[:, 3] >= a[0])
+                                  & (obstacles[:, 1] <= b[1]) & (obstacles[:, 4] >= a[1]))
+        if not np.array_equal(np.sort(ids), expected):
+            return False
+    return True
+
+
+def check_generation(obstacles, min_distance, sizes=(1000,), seed=0):
+    """
+    检查 generate_obstacles_fast 生成的障碍物（包括检查用的地图与更密的地图）两两间距不小于 min_distance，
+    且 min_distance <= 0 时报 ValueError。
+    """
+    maps = [obstacles] + [generate_obstacles_fast(m, min_distance, seed=seed + k, length=map_length(m, min_distance))
+                          for k, m in enumerate(sizes, 1)]
+    for boxes in maps:
+        i, j = np.triu_indices(len(boxes), 1)
+        if box_gaps(boxes[i], boxes[j]).min() < min_distance:
+            return False
+    for bad in (0, -1):
+        try:
+            generate_obstacles_fast(10, bad, seed=seed)
+        except ValueError:
+            continue
+        return False
+    return True
+
+
+def check_binary(obstacles, tmp):
+    """
+    比较障碍物经二进制文件保存、读取（mmap 与否）以及文本转二进制后的数组、编号与元数据。
+    """
+    ids = np.arange(len(obstacles)) * 7 + 3
+    meta = {'source': 'tiled_check', 'count': len(obstacles)}
+    filename = os.path.join(tmp, 'obstacles.bin')
+    save_obstacles_binary(obstacles, filename, ids=ids, meta=meta)
+    for mmap in (True, False):
+        boxes, loaded_ids, loaded_meta = load_obstacles_binary(filename, mmap)
+        if not (np.array_equal(boxes, obstacles) and np.array_equal(loaded_ids, ids) and loaded_meta == meta):
+            return False
+
+    # 文本文件只保留一位小数，先取整到一位小数再比较
+    text_file, converted = os.path.join(tmp, 'obstacles.txt'), os.path.join(tmp, 'converted.bin')
+    save_obstacles_to_file(obstacles, text_file)
+    count = convert_text_to_binary(text_file, converted, meta=meta, chunk_size=17)
+    return count == len(obstacles) and np.allclose(load_obstacles_array(converted), np.round(obstacles, 1))
+
+
+def run_random_maps(n_queries=4, num_obstacles=120, min_distance=14, expansion=2, tile_size=400, max_tiles=4,
+                    seed=0):
+    """
+    在一张随机地图上检查 n_queries 次分块规划。
+    """
+    random.seed(seed)
+    length = map_length(num_obstacles, min_distance)
+    obstacles = generate_obstacles_fast(num_obstacles, min_distance, seed=seed, length=length)
+    expanded = obstacle_expansion(obstacles, expansion)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'tiles.bin')
+        save_obstacle_tiles(obstacles, filename, cell_size=tile_size)
+        store = ObstacleTileFile(filename)
+        generation_ok = check_generation(obstacles, min_distance)
+        print("generate " + ("OK" if generation_ok else "FAIL"))
+        binary_ok = check_binary(obstacles, tmp)
+        print("binary " + ("OK" if binary_ok else "FAIL"))
+        query_ok = check_queries(store, obstacles)
+        print("query " + ("OK" if query_ok else "FAIL"))
+        failures = (not generation_ok) + (not binary_ok) + (not query_ok)
+
+        tiled = TiledPlanner(store, expansion, max_tiles=max_tiles)
+        t = time.perf_counter()
+        planner = Planner(obstacles, expansion)
+        print(f"整张图建图 {time.perf_counter() - t:.2f}s")
+
+        for k in range(n_queries):
+            start = (round(random.uniform(-20, 0), 1), round(random.uniform(-20, 0), 1), round(random.uniform(2, 30), 1))
+            goal = (round(random.uniform(length, length + 60), 1),
+                    round(random.uniform(length, length + 60), 1), round(random.uniform(2, 30), 1))
+            if k % 2:
+                start, goal = (start[0], goal[1], start[2]), (goal[0], start[1], goal[2])
+
+            t = time.perf_counter()
+            path, info = tiled.plan(start, goal)
+            tiled_time = time.perf_counter() - t
+            t = time.perf_counter()
+            reference = planner.plan(start, goal)
+            full_time = time.perf_counter() - t
+
+            if path is None or reference is None:
+                ok = path is None and reference is None
+                print(f"query {k}: 不可达 {'OK' if ok else 'FAIL'}")
+                failures += not ok
+                continue
+
+            P, Q = np.array(path), np.array(reference)
+            cost = calculate_costs(P[:-1], P[1:], load, vel).sum()
+            best = calculate_costs(Q[:-1], Q[1:], load, vel).sum()
+            ok = (path[0] == start and path[-1] == goal and not segments_intersect_boxes(P[:-1], P[1:], expanded).any()
+                  and cost <= best * (1 + COST_TOLERANCE) and info['peak_resident'] <= max_tiles
+                  and len(tiled.resident_tiles) <= max_tiles)
+            failures += not ok
+            print(f"query {k}: cost {cost:.1f} / {best:.1f} (x{cost / best:.4f}) "
+                  f"tiles {len(set(info['tiles']))} used {info['tiles_used']} built {info['tiles_built']} "
+                  f"peak {info['peak_resident']} "
+                  f"expanded {info['expanded']} "
+                  f"time {tiled_time:.2f}s / {full_time:.2f}s {'OK' if ok else 'FAIL'}")
+
+    print("全部通过" if failures == 0 else f"{failures} 项未通过")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    run_random_maps()
@@ -0,0 +1,546 @@
+'''
+    本文件实现了大范围地图上的分块路径规划 TiledPlanner：地图划分为边长 tile_size 的方形分块，
+    每个分块只用与其范围（向外放宽 overlap）相交的障碍物建可视图，节点为范围内的 cut_nodes
+    和分块四条边上的入口节点（portal），相邻分块通过共用的入口节点连接。搜索按 HPA* 的方式分两层：
+    - 上层在入口节点组成的抽象图上做 A*，两个入口节点之间的抽象边代价为同一分块内的最小代价，
+      展开入口节点时才在其所在的分块上做一次 Dijkstra；
+    - 上层路径确定后，逐段在对应分块内回溯出完整路径。
+    分块的可视图在用到时才建立，任何时候最多保留 max_tiles 个，超过时按 LRU 移除（正在展开或回溯的分块除外），
+    可视图的内存占用与地图大小无关。上层抽象图（入口节点之间的代价）占用很小，分块的可视图移除后仍然保留，
+    之后回溯路径时需要的分块再重新建立。
+    障碍物用 save_obstacle_tiles 按网格排序保存，ObstacleTileFile 映射文件后只读取分块所需网格中的障碍物。
+    入口节点只位于切割平面高度、沿边界等间距分布，分块之间的路径必须经过入口节点，所得路径是近似最优的。
+'''
+import heapq
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+import profiling
+from obstacles import load_obstacles_binary, save_obstacles_binary
+from choose_obs import obstacle_expansion
+from build_graph import (VisibilityChecker, define_cut_planes, generate_vertices, load, owner_matrix, vel,
+                         visible_cut_pairs)
+from calculate_search import calculate_costs, dijkstra_csr, get_uav_model
+from interact import segments_intersect_boxes
+from spatial_index import ObstacleGrid, grouped_arange
+from visibility_graph import VisibilityGraph
+
+
+def save_obstacle_tiles(obstacles, filename, cell_size=1000.0, dtype=np.float64):
+    """
+    将障碍物按 (x_min, y_min) 所在的网格排序后保存为二进制障碍物文件（见 obstacles.save_obstacles_binary），
+    网格参数和每个网格在文件中的起始位置保存在元数据 'tiles' 中，障碍物的原始编号保存为编号。
+
+    参数:
+        obstacles: array-like (M, 6)，障碍物 (x_min, y_min, z_min, x_max, y_max, z_max)
+        filename: str，文件名
+        cell_size: float，网格边长
+        dtype: np.float32 或 np.float64，数据区的浮点类型
+
+    返回:
+        int，障碍物数
+
+    示例:
+        save_obstacle_tiles(load_obstacles_array('city.bin'), 'city_tiles.bin', cell_size=1000)
+        planner = TiledPlanner('city_tiles.bin')
+    """
+    boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+    if len(boxes):
+        origin = boxes[:, :2].min(axis=0)
+        cells_xy = np.floor((boxes[:, :2] - origin) / cell_size).astype(np.int64)
+        shape = cells_xy.max(axis=0) + 1
+        cells = cells_xy[:, 0] * shape[1] + cells_xy[:, 1]
+        max_size = (boxes[:, 3:5] - boxes[:, :2]).max(axis=0)
+        bounds = np.concatenate([boxes[:, :3].min(axis=0), boxes[:, 3:].max(axis=0)])
+    else:
+        origin, shape, cells = np.zeros(2), np.ones(2, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        max_size, bounds = np.zeros(2), np.zeros(6)
+
+    order = np.argsort(cells, kind='stable')
+    counts = np.bincount(cells, minlength=int(np.prod(shape)))
+    meta = {'tiles': {
+        'cell_size': float(cell_size),
+        'origin': origin.tolist(),
+        'shape': [int(n) for n in shape],
+        'cell_start': np.concatenate(([0], np.cumsum(counts))).tolist(),
+        'max_size': max_size.tolist(),
+        'bounds': bounds.tolist(),
+    }}
+    save_obstacles_binary(boxes[order], filename, dtype, ids=order, meta=meta)
+    return len(boxes)
+
+
+class ObstacleTileFile:
+    """
+    按需读取 save_obstacle_tiles 保存的障碍物文件：数据区只读映射，
+    query 只读取与查询范围相关的网格中的障碍物。
+
+    参数:
+        filename: str，save_obstacle_tiles 保存的文件
+        mmap: bool，是否映射文件（False 时一次读入内存）
+
+    属性:
+        cell_size: float，网格边长
+        bounds: np.ndarray (6,)，所有障碍物的包围盒
+    """
+
+    def __init__(self, filename, mmap=True):
+        self.obstacles, self.ids, meta = load_obstacles_binary(filename, mmap)
+        if 'tiles' not in meta:
+            raise ValueError(f"{filename} 不是由 save_obstacle_tiles 保存的文件")
+        tiles = meta['tiles']
+        self.cell_size = tiles['cell_size']
+        self.origin = np.array(tiles['origin'], dtype=float)
+        self.shape = tuple(tiles['shape'])
+        self.cell_start = np.array(tiles['cell_start'], dtype=np.int64)
+        self.max_size = np.array(tiles['max_size'], dtype=float)
+        self.bounds = np.array(tiles['bounds'], dtype=float)
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def query(self, xy_min, xy_max):
+        """
+        返回 xy 投影与矩形 [xy_min, xy_max]（闭集）相交的障碍物。
+
+        返回:
+            obstacles: np.ndarray (k, 6)
+            ids: np.ndarray (k,)，障碍物的原始编号
+        """
+        xy_min = np.asarray(xy_min, dtype=float)
+        xy_max = np.asarray(xy_max, dtype=float)
+        # 按 (x_min, y_min) 分格，与矩形相交的障碍物的 x_min 在 [x_lo - 最大边长, x_hi] 内
+        lo = np.floor((xy_min - self.max_size - self.origin) / self.cell_size).astype(np.int64)
+        hi = np.floor((xy_max - self.origin) / self.cell_size).astype(np.int64)
+        lo, hi = np.maximum(lo, 0), np.minimum(hi, np.array(self.shape) - 1)
+        if len(self.obstacles) == 0 or np.any(lo > hi):
+            return np.zeros((0, 6)), np.zeros(0, dtype=np.int64)
+
+        # 同一列 (cx) 中 cy 连续的网格在文件中也是连续的
+        rows = np.arange(lo[0], hi[0] + 1) * self.shape[1]
+        first = self.cell_start[rows + lo[1]]
+        last = self.cell_start[rows + hi[1] + 1]
+        items = np.repeat(first, last - first) + grouped_arange(last - first)
+
+        boxes = np.asarray(self.obstacles[items], dtype=float).reshape(-1, 6)
+        keep = ((boxes[:, 0] <= xy_max[0]) & (boxes[:, 3] >= xy_min[0])
+                & (boxes[:, 1] <= xy_max[1]) & (boxes[:, 4] >= xy_min[1]))
+        ids = items if self.ids is None else np.asarray(self.ids[items])
+        return boxes[keep], ids[keep]
+
+
+class Tile:
+    """
+    一个分块的可视图，由 TiledPlanner 建立。
+
+    属性:
+        key: tuple，分块编号 (ix, iy)
+        graph: VisibilityGraph，前 n_cut 个节点为 cut_nodes，其后为入口节点
+        checker: VisibilityChecker，连接起点、终点时使用
+        obstacles: np.ndarray (M, 6)，与分块范围相交的（扩展后的）障碍物
+        portals: dict，{入口节点: 节点编号}
+        portal_tiles: dict，{入口节点: 入口节点所在的两个分块编号}
+    """
+
+    def __init__(self, key, graph, checker, obstacles, index, portals, portal_tiles):
+        self.key = key
+        self.graph = graph
+        self.checker = checker
+        self.obstacles = obstacles
+        self.index = index
+        self.portals = portals
+        self.portal_tiles = portal_tiles
+        self._portal_ids = np.array(list(portals.values()), dtype=np.int64)
+
+    def portal_costs(self, portal):
+        """
+        返回从入口节点 portal 出发、在本分块内到其他入口节点的最小代价。
+
+        返回:
+            dict，{入口节点: 代价}，不可达的入口节点不在其中
+        """
+        graph = self.graph
+        dist, _ = dijkstra_csr(graph.indptr, graph.indices, graph.weights, self.portals[portal],
+                               targets=self._portal_ids)
+        return {p: float(dist[k]) for p, k in self.portals.items() if p != portal and dist[k] < np.inf}
+
+    def with_terminals(self, points):
+        """
+        将起点、终点等插入分块的可视图，连接到可见的 cut_nodes（规则同 connect_terminal）、
+        入口节点和之前插入的点，返回新的 CSR 可视图，分块自身的可视图不变。
+
+        返回:
+            graph: VisibilityGraph
+            ids: list of int，各点在 graph 中的编号
+            transit: np.ndarray bool，插入的点不作为中间节点（见 dijkstra_csr）
+        """
+        graph = self.graph
+        try:
+            ids = [self._attach(point) for point in points]
+            i, j, w = graph.edge_pairs()
+            extended = VisibilityGraph.from_pairs(graph.coords, i, j, w, graph.model)
+        finally:
+            graph.detach()
+        transit = np.arange(extended.num_nodes) < graph.num_base_nodes
+        return extended, ids, transit
+
+    def _attach(self, point):
+        graph = self.graph
+        point = tuple(float(c) for c in point)
+        n_cut = self.checker.n_cut
+        neighbors = [np.flatnonzero(self.checker.visible_from(point)) if n_cut else np.zeros(0, dtype=np.int64)]
+        others = np.arange(n_cut, graph.num_nodes)
+        if len(others):
+            P = graph.coords[others]
+            free = ~segments_intersect_boxes(np.broadcast_to(point, P.shape), P, self.obstacles, index=self.index)
+            neighbors.append(others[free])
+        neighbors = np.concatenate(neighbors)
+        weights = calculate_costs(np.broadcast_to(point, (len(neighbors), 3)), graph.coords[neighbors], load, vel)
+        return graph.attach(point, neighbors, weights)
+
+
+class TiledPlanner:
+    """
+    在 save_obstacle_tiles 保存的大范围地图上分块规划路径。
+
+    分块网格覆盖所有障碍物的包围盒并向外多留一个分块，使路径可以从地图边缘绕行；
+    起点、终点必须位于这一范围内。
+
+    参数:
+        obstacles: str 或 ObstacleTileFile，save_obstacle_tiles 保存的障碍物文件（原始障碍物）
+        expansion: float，障碍物扩展值
+        tile_size: float，分块边长，默认为文件的网格边长
+        overlap: float，分块范围向外放宽的距离，默认 tile_size / 10；
+                 放宽范围内的 cut_nodes 也加入分块的可视图，经过分块边界附近的路径不必绕到入口节点
+        portal_spacing: float，入口节点沿边界的间距，默认 tile_size / 8
+        cut_planes: list of float，切割平面高度列表，默认由 define_cut_planes 给出（固定高度）
+        max_tiles: int，最多同时保留的分块可视图数（规划过程中也不超过）
+        method: str，cut_nodes 间可视性的计算方法（见 visible_cut_pairs）
+
+    示例:
+        planner = TiledPlanner('city_tiles.bin', expansion=2, max_tiles=16)
+        path, info = planner.plan(start, goal)
+    """
+
+    def __init__(self, obstacles, expansion=2, tile_size=None, overlap=None, portal_spacing=None, cut_planes=None,
+                 max_tiles=16, method='pairs'):
+        self.store = obstacles if isinstance(obstacles, ObstacleTileFile) else ObstacleTileFile(obstacles)
+        self.expansion = expansion
+        self.tile_size = float(self.store.cell_size if tile_size is None else tile_size)
+        self.overlap = self.tile_size / 10 if overlap is None else float(overlap)
+        spacing = self.tile_size / 8 if portal_spacing is None else portal_spacing
+        self.portals_per_side = max(1, int(round(self.tile_size / spacing)))
+        self.cut_planes = define_cut_planes([]) if cut_planes is None else list(cut_planes)
+        self.max_tiles = max(1, int(max_tiles))
+        self.method = method
+        self.model = get_uav_model(load, vel)
+
+        lo = self.store.bounds[:2] - expansion
+        hi = self.store.bounds[3:5] + expansion
+        self.origin = lo - self.tile_size
+        self.shape = tuple(int(n) for n in np.floor((hi - self.origin) / self.tile_size) + 2)
+
+        self._tiles = OrderedDict()
+        # 上层抽象图：{分块: {入口节点: {入口节点: 代价}}}，{入口节点: 所在的两个分块}，分块的可视图移除后仍保留
+        self._rows = {}
+        self._portal_tiles = {}
+        # 正在展开或回溯的分块（当前这一段用到的分块），不会被移除
+        self._pinned = set()
+        # 本次规划中用到的分块，以及保留分块数的峰值
+        self._used = set()
+        self._peak = 0
+        self.stats = {'tiles_built': 0, 'tiles_evicted': 0, 'peak_resident': 0}
+
+    def tile_key(self, point):
+        """
+        返回点所在分块的编号 (ix, iy)，不在分块网格内时抛出 ValueError。
+        """
+        key = tuple(int(k) for k in np.floor((np.asarray(point[:2], dtype=float) - self.origin) / self.tile_size))
+        if not (0 <= key[0] < self.shape[0] and 0 <= key[1] < self.shape[1]):
+            raise ValueError(f"点 {tuple(point)} 不在分块网格范围内")
+        return key
+
+    def _coord(self, axis, k):
+        # 分块边界坐标：相邻分块用同一表达式计算，共用的入口节点坐标完全相同
+        return float(self.origin[axis] + k * self.tile_size)
+
+    def tile(self, key):
+        """
+        返回编号为 key 的分块，没有保留时新建（之前移除过的分块重新建立）。
+        新建前先按 LRU 移除分块，使保留的分块数（包括新建的分块）不超过 max_tiles。
+        """
+        tile = self._tiles.get(key)
+        if tile is None:
+            self._evict(self.max_tiles - 1)
+            with profiling.current().timer('tiled.build_tile'):
+                tile = self._build_tile(key)
+            self._tiles[key] = tile
+            self._portal_tiles.update(tile.portal_tiles)
+            self.stats['tiles_built'] += 1
+        else:
+            self._tiles.move_to_end(key)
+        self._used.add(key)
+        self._peak = max(self._peak, len(self._tiles))
+        self.stats['peak_resident'] = max(self.stats['peak_resident'], len(self._tiles))
+        return tile
+
+    def _evict(self, limit):
+        """
+        按 LRU 移除分块的可视图直到不超过 limit 个，跳过正在展开或回溯的分块。上层抽象图保留。
+        """
+        excess = len(self._tiles) - limit
+        if excess <= 0:
+            return
+        for key in [k for k in self._tiles if k not in self._pinned][:excess]:
+            del self._tiles[key]
+            self.stats['tiles_evicted'] += 1
+
+    def portal_costs(self, key, portal, prefetch=()):
+        """
+        返回分块 key 内从入口节点 portal 到其他入口节点的最小代价（上层抽象图的边）。
+        每行只计算一次，分块的可视图移除后仍然保留，已有的行不需要重建分块。
+        需要用到分块的可视图时，prefetch 中属于该分块的入口节点（例如上层搜索 OPEN 中的节点）的行一并计算，
+        避免分块被移除后很快又为它们重新建立。
+        """
+        rows = self._rows.setdefault(key, {})
+        if portal not in rows:
+            with self._using(key) as tile:
+                for p in [portal] + [p for p in prefetch if p in tile.portals and p not in rows]:
+                    rows[p] = tile.portal_costs(p)
+        else:
+            self._used.add(key)
+        return rows[portal]
+
+    @contextmanager
+    def _using(self, key):
+        """
+        取得分块 key 用于当前这一段的展开或回溯，期间只有这一个分块不会被移除。
+        """
+        self._pinned = {key}
+        try:
+            yield self.tile(key)
+        finally:
+            self._pinned = set()
+
+    @property
+    def resident_tiles(self):
+        """
+        当前保留的分块编号，按最近使用的顺序排列。
+        """
+        return list(self._tiles)
+
+    def _build_tile(self, key):
+        ix, iy = key
+        core_lo = np.array([self._coord(0, ix), self._coord(1, iy)])
+        core_hi = np.array([self._coord(0, ix + 1), self._coord(1, iy + 1)])
+        lo, hi = core_lo - self.overlap, core_hi + self.overlap
+
+        raw, _ = self.store.query(lo - self.expansion, hi + self.expansion)
+        obstacles = obstacle_expansion(raw, self.expansion)
+        index = ObstacleGrid(obstacles)
+
+        # 范围内的 cut_nodes：范围是凸的，节点之间的线段不会离开范围，与之相交的障碍物都已读入
+        owners = generate_vertices(obstacles, self.cut_planes, index=index)
+        cut_nodes = sorted(node for node in owners
+                           if lo[0] <= node[0] <= hi[0] and lo[1] <= node[1] <= hi[1])
+        portals, portal_tiles = self._portals(key, obstacles)
+        n_cut, nodes = len(cut_nodes), cut_nodes + portals
+        coords = np.array(nodes, dtype=float).reshape(-1, 3)
+        checker = VisibilityChecker(coords, owner_matrix(nodes, owners), obstacles, n_cut, index=index)
+
+        pairs = [visible_cut_pairs(checker, method=self.method)] if n_cut > 1 else []
+        # 入口节点与 cut_nodes 按起点、终点的规则连接，入口节点之间只做 3D 相交检测
+        if n_cut:
+            for k, portal in enumerate(portals):
+                visible = np.flatnonzero(checker.visible_from(portal))
+                pairs.append((visible, np.full(len(visible), n_cut + k)))
+        a, b = np.triu_indices(len(portals), k=1)
+        free = ~segments_intersect_boxes(coords[n_cut + a], coords[n_cut + b], obstacles, index=index)
+        pairs.append((n_cut + a[free], n_cut + b[free]))
+
+        i = np.concatenate([p[0] for p in pairs]).astype(np.int64)
+        j = np.concatenate([p[1] for p in pairs]).astype(np.int64)
+        weights = calculate_costs(coords[i], coords[j], load, vel)
+        graph = VisibilityGraph.from_pairs(coords, i, j, weights, self.model)
+        profiling.current().count('tiled.tile_nodes', len(coords))
+
+        portal_ids = {portal: n_cut + k for k, portal in enumerate(portals)}
+        return Tile(key, graph, checker, obstacles, index, portal_ids, portal_tiles)
+
+    def _portals(self, key, obstacles):
+        """
+        分块四条边上的入口节点：每个切割平面上沿边等间距分布，去掉落在障碍物内部的点；
+        与网格外相邻的边上没有入口节点。
+        """
+        ix, iy = key
+        n = self.portals_per_side
+        offsets = (np.arange(n) + 0.5) * self.tile_size / n
+        x0, y0 = self._coord(0, ix), self._coord(1, iy)
+
+        points, tiles = [], []
+        sides = [
+            (ix > 0, self._coord(0, ix), None, ((ix - 1, iy), key)),
+            (ix + 1 < self.shape[0], self._coord(0, ix + 1), None, (key, (ix + 1, iy))),
+            (iy > 0, None, self._coord(1, iy), ((ix, iy - 1), key)),
+            (iy + 1 < self.shape[1], None, self._coord(1, iy + 1), (key, (ix, iy + 1))),
+        ]
+        for exists, x, y, pair in sides:
+            if not exists:
+                continue
+            for z in self.cut_planes:
+                for t in offsets.tolist():
+                    points.append((x, y0 + t, float(z)) if x is not None else (x0 + t, y, float(z)))
+                    tiles.append(pair)
+
+        P = np.array(points, dtype=float).reshape(-1, 3)
+        boxes = np.asarray(obstacles, dtype=float).reshape(-1, 6)
+        if len(P) and len(boxes):
+            inside = (boxes[None, :, :3] < P[:, None, :]) & (P[:, None, :] < boxes[None, :, 3:])
+            keep = ~inside.all(axis=2).any(axis=1)
+        else:
+            keep = np.ones(len(P), dtype=bool)
+
+        portals = [p for p, k in zip(points, keep) if k]
+        portal_tiles = {p: pair for p, pair, k in zip(points, tiles, keep) if k}
+        return portals, portal_tiles
+
+    def plan(self, start, goal):
+        """
+        分块规划一条从 start 到 goal 的路径。
+
+        参数:
+            start: tuple，起点 (x, y, z)
+            goal: tuple，终点 (x, y, z)
+
+        返回:
+            path: list of tuple，路径节点；不可达时返回 None
+            info: dict，cost 路径代价（按图中的边权重），expanded 上层搜索展开的节点数，
+                  tiles 路径经过的分块，tiles_used 本次用到的分块数，tiles_built 本次新建的分块数
+                  （包括移除后重新建立的），peak_resident 本次规划中保留分块数的峰值，resident 结束时保留的分块数
+        """
+        start = tuple(float(c) for c in start)
+        goal = tuple(float(c) for c in goal)
+        start_key, goal_key = self.tile_key(start), self.tile_key(goal)
+        built = self.stats['tiles_built']
+        self._used = set()
+        self._peak = len(self._tiles)
+        path, info = self._plan(start, goal, start_key, goal_key)
+        info['tiles_used'] = len(self._used)
+        info['tiles_built'] = self.stats['tiles_built'] - built
+        info['peak_resident'] = self._peak
+        info['resident'] = len(self._tiles)
+        return path, info
+
+    def _plan(self, start, goal, start_key, goal_key):
+        profile = profiling.current()
+        with profile.timer('tiled.search'):
+            start_edges, goal_edges = self._terminal_edges(start, goal, start_key, goal_key)
+            parent, expanded = self._abstract_search(start, goal, goal_key, start_edges, goal_edges)
+        profile.count('tiled.expanded', expanded)
+
+        info = {'cost': None, 'expanded': expanded, 'tiles': [], 'resident': 0}
+        path = None
+        if goal in parent:
+            with profile.timer('tiled.refine'):
+                legs = []
+                node = goal
+                while parent[node] is not None:
+                    previous, key = parent[node]
+                    legs.append((previous, node, key))
+                    node = previous
+                legs.reverse()
+                path, cost = [start], 0.0
+                for u, v, key in legs:
+                    leg, leg_cost = self._refine(u, v, key)
+                    path.extend(leg[1:])
+                    cost += leg_cost
+            info['cost'] = cost
+            info['tiles'] = [key for _, _, key in legs]
+        return path, info
+
+    def _terminal_edges(self, start, goal, start_key, goal_key):
+        """
+        起点到所在分块的入口节点（以及同一分块内的终点）、所在分块的入口节点到终点的代价。
+        """
+        same = start_key == goal_key
+        with self._using(start_key) as tile:
+            graph, ids, transit = tile.with_terminals([start, goal] if same else [start])
+            dist, _ = dijkstra_csr(graph.indptr, graph.indices, graph.weights, ids[0], transit=transit)
+            start_edges = {p: float(dist[k]) for p, k in tile.portals.items() if dist[k] < np.inf}
+        if same and dist[ids[1]] < np.inf:
+            start_edges[goal] = float(dist[ids[1]])
+
+        with self._using(goal_key) as tile:
+            graph, ids, transit = tile.with_terminals([goal])
+            dist, _ = dijkstra_csr(graph.indptr, graph.indices, graph.weights, ids[0], transit=transit)
+            goal_edges = {p: float(dist[k]) for p, k in tile.portals.items() if dist[k] < np.inf}
+        return start_edges, goal_edges
+
+    def _abstract_search(self, start, goal, goal_key, start_edges, goal_edges):
+        """
+        上层 A*：节点为起点、终点和入口节点，展开入口节点时读取其所在两个分块内的代价。
+
+        返回:
+            parent: dict，{节点: (父节点, 抽象边所在的分块)}，起点为 None
+            expanded: int，展开的节点数
+        """
+        start_key = self.tile_key(start)
+        h = {}
+
+        def heuristic(node):
+            if node not in h:
+                h[node] = float(self.model.lower_bounds([node], goal)[0])
+            return h[node]
+
+        g = {start: 0.0}
+        parent = {start: None}
+        closed = set()
+        open_heap = [(heuristic(start), 0.0, start)]
+        expanded = 0
+
+        while open_heap:
+            _, cost, current = heapq.heappop(open_heap)
+            if current in closed or cost > g[current]:
+                continue
+            closed.add(current)
+            expanded += 1
+            if current == goal:
+                return parent, expanded
+
+            if current == start:
+                edges = [(node, c, start_key) for node, c in start_edges.items()]
+            else:
+                edges = []
+                frontier = [node for node in g if node not in closed]
+                for key in self._portal_tiles[current]:
+                    edges += [(node, c, key) for node, c in self.portal_costs(key, current, frontier).items()]
+                if current in goal_edges:
+                    edges.append((goal, goal_edges[current], goal_key))
+
+            for node, c, key in edges:
+                new_cost = cost + c
+                if node not in closed and new_cost < g.get(node, np.inf):
+                    g[node] = new_cost
+                    parent[node] = (current, key)
+                    heapq.heappush(open_heap, (new_cost + heuristic(node), new_cost, node))
+
+        return {}, expanded
+
+    def _refine(self, u, v, key):
+        """
+        在分块 key 内回溯 u -> v 的最短路径（u、v 为入口节点或起点、终点）；分块已被移除时重新建立。
+        """
+        with self._using(key) as tile:
+            terminals = [p for p in (u, v) if p not in tile.portals]
+            graph, ids, transit = tile.with_terminals(terminals)
+            lookup = dict(zip(terminals, ids))
+            source = tile.portals[u] if u in tile.portals else lookup[u]
+            target = tile.portals[v] if v in tile.portals else lookup[v]
+
+        dist, pred = dijkstra_csr(graph.indptr, graph.indices, graph.weights, source, targets=[target],
+                                  transit=transit)
+        nodes = [target]
+        while nodes[-1] != source:
+            nodes.append(int(pred[nodes[-1]]))
+        nodes.reverse()
+        return [tuple(p) for p in graph.coords[nodes].tolist()], float(dist[target])
@@ -0,0 +1,186 @@
+'''
+    本文件实现了数组形式的可视图 VisibilityGraph：节点坐标保存为 (N, 3) 数组，
+    邻接关系保存为 CSR 结构 (indptr, indices, weights)，搜索和绘图直接使用节点编号，
+    坐标与编号之间的映射只在接口处使用。
+    CSR 部分建好后不再修改；查询时的起点、终点通过 attach 临时插入，用完后 detach 移除。
+'''
+import numpy as np
+
+
+class VisibilityGraph:
+    """
+    CSR 形式的无向可视图。
+
+    参数:
+        coords: array-like (N, 3)，节点坐标
+        indptr: array-like (N + 1,)，节点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]
+        indices: array-like (E,)，邻居编号（每条无向边在两端各出现一次）
+        weights: array-like (E,)，与 indices 对应的边权重
+        model: UAVModel，计算边权重所用的能耗模型，搜索时据此构造启发函数
+
+    属性:
+        pruned_edges: int，建图时被切线检查排除的节点对数（见 build_graph.wedge_blocked）
+    """
+
+    def __init__(self, coords, indptr, indices, weights, model=None):
+        self.base_coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=float)
+        self.model = model
+        self.pruned_edges = 0
+        self._index = None
+
+        # 临时插入的节点：坐标列表，以及 {节点: ([邻居], [权重])} 形式的附加邻接表
+        self._extra_coords = []
+        self._extra_adj = {}
+        self._coords = self.base_coords
+
+    @classmethod
+    def from_pairs(cls, coords, i, j, weights, model=None):
+        """
+        由无向边列表构建可视图。
+
+        参数:
+            coords: array-like (N, 3)，节点坐标
+            i, j: array-like (E,)，每条无向边两端的节点编号
+            weights: array-like (E,)，边权重
+            model: UAVModel，计算边权重所用的能耗模型
+
+        返回:
+            VisibilityGraph
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        weights = np.asarray(weights, dtype=float)
+
+        # 每条无向边按两个方向各存一次，并按 (起点, 终点) 排序
+        src = np.concatenate([i, j])
+        dst = np.concatenate([j, i])
+        w = np.concatenate([weights, weights])
+        order = np.lexsort((dst, src))
+
+        counts = np.bincount(src, minlength=len(coords))
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        return cls(coords, indptr, dst[order], w[order], model)
+
+    def __len__(self):
+        return self.num_nodes
+
+    def __contains__(self, node):
+        node = tuple(node)
+        return node in self._node_index() or node in self._extra_coords
+
+    @property
+    def coords(self):
+        """
+        所有节点的坐标 (N, 3)，包括临时插入的节点。
+        """
+        return self._coords
+
+    @property
+    def num_base_nodes(self):
+        return len(self.base_coords)
+
+    @property
+    def num_nodes(self):
+        return len(self.base_coords) + len(self._extra_coords)
+
+    @property
+    def num_edges(self):
+        """
+        邻接表中的边数（每条无向边计两次，与 sum(len(v) for v in edges.values()) 一致）。
+        """
+        return len(self.indices) + sum(len(ids) for ids, _ in self._extra_adj.values())
+
+    def _node_index(self):
+        if self._index is None:
+            self._index = {node: k for k, node in enumerate(map(tuple, self.base_coords.tolist()))}
+        return self._index
+
+    def attach(self, point, neighbors, weights):
+        """
+        临时插入一个节点并将其与 CSR 部分中的节点相连。
+
+        参数:
+            point: tuple，节点坐标 (x, y, z)
+            neighbors: array-like，相邻的节点编号
+            weights: array-like，对应的边权重
+
+        返回:
+            int，新节点的编号
+        """
+        k = self.num_nodes
+        neighbors = [int(n) for n in neighbors]
+        weights = [float(w) for w in weights]
+
+        self._extra_coords.append(tuple(float(c) for c in point))
+        self._extra_adj[k] = (neighbors, weights)
+        for n, w in zip(neighbors, weights):
+            ids, ws = self._extra_adj.setdefault(n, ([], []))
+            ids.append(k)
+            ws.append(w)
+
+        self._coords = np.vstack([self.base_coords, np.array(self._extra_coords)])
+        return k
+
+    def detach(self):
+        """
+        移除所有临时插入的节点及其边。
+        """
+        self._extra_coords = []
+        self._extra_adj = {}
+        self._coords = self.base_coords
+
+    def index_of(self, node):
+        """
+        返回坐标为 node 的节点编号，不存在时抛出 KeyError。
+        """
+        node = tuple(node)
+        for offset, point in enumerate(self._extra_coords):
+            if point == node:
+                return self.num_base_nodes + offset
+        return self._node_index()[node]
+
+    def node(self, k):
+        """
+        返回编号为 k 的节点坐标 (x, y, z)。
+        """
+        return tuple(self.coords[k].tolist())
+
+    def neighbors(self, k):
+        """
+        返回节点 k 的邻居编号及对应的边权重。
+        """
+        extra = self._extra_adj.get(k)
+        if k >= self.num_base_nodes:
+            return np.array(extra[0], dtype=np.int32), np.array(extra[1])
+
+        lo, hi = self.indptr[k], self.indptr[k + 1]
+        if extra is None:
+            return self.indices[lo:hi], self.weights[lo:hi]
+        return (np.concatenate([self.indices[lo:hi], np.array(extra[0], dtype=np.int32)]),
+                np.concatenate([self.weights[lo:hi], extra[1]]))
+
+    def edge_pairs(self):
+        """
+        返回每条无向边（i < j）的两端编号及权重，包括临时插入节点的边。
+        """
+        src = np.repeat(np.arange(self.num_base_nodes), np.diff(self.indptr))
+        upper = src < self.indices
+        i, j, w = src[upper], self.indices[upper].astype(np.int64), self.weights[upper]
+
+        extra = [(k, n, x) for k, (ids, ws) in self._extra_adj.items() if k >= self.num_base_nodes
+                 for n, x in zip(ids, ws) if n < k]
+        if extra:
+            k, n, x = (np.array(col) for col in zip(*extra))
+            i, j, w = np.concatenate([i, n]), np.concatenate([j, k]), np.concatenate([w, x])
+        return i, j, w
+
+    def segments(self):
+        """
+        返回所有无向边的端点坐标，形状为 (E, 2, 3)，用于绘图。
+        """
+        i, j, _ = self.edge_pairs()
+        return np.stack([self.coords[i], self.coords[j]], axis=1)